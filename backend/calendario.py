@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Calendário de dias úteis (segunda a sexta, exceto feriados).
+#
+# Os dias úteis de um intervalo de anos ficam num array ordenado de ordinais
+# (date.toordinal()); somar, subtrair e contar dias úteis viram buscas binárias
+# (bisect) nesse array, em vez de andar dia a dia. Feriados nacionais são
+# calculados (inclusive os móveis, a partir da Páscoa); feriados municipais ou
+# pontos facultativos entram como `feriados_extras` (cadastrados no Mongo).
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import MAXYEAR, MINYEAR, date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+DataOuDatetime = Union[date, datetime]
+Cobertura = Tuple[int, int, List[int]]  # (ano_inicio, ano_fim, ordinais dos dias úteis)
+
+FERIADOS_NACIONAIS_FIXOS = {
+    (1, 1): "Confraternização Universal",
+    (4, 21): "Tiradentes",
+    (5, 1): "Dia do Trabalho",
+    (9, 7): "Independência do Brasil",
+    (10, 12): "Nossa Senhora Aparecida",
+    (11, 2): "Finados",
+    (11, 15): "Proclamação da República",
+    (12, 25): "Natal",
+}
+
+def pascoa(ano: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+def feriados_nacionais(ano: int) -> Dict[date, str]:
+    """Feriados nacionais do ano, incluindo Carnaval, Sexta-feira Santa e Corpus Christi."""
+    feriados = {date(ano, mes, dia): nome for (mes, dia), nome in FERIADOS_NACIONAIS_FIXOS.items()}
+    if ano >= 2024:
+        feriados[date(ano, 11, 20)] = "Dia Nacional de Zumbi e da Consciência Negra"
+    p = pascoa(ano)
+    feriados[p - timedelta(days=48)] = "Carnaval"
+    feriados[p - timedelta(days=47)] = "Carnaval"
+    feriados[p - timedelta(days=2)] = "Sexta-feira Santa"
+    feriados[p + timedelta(days=60)] = "Corpus Christi"
+    return feriados
+
+def _dia(valor: DataOuDatetime) -> date:
+    return valor.date() if isinstance(valor, datetime) else valor
+
+def _mesmo_tipo(original: DataOuDatetime, dia: date) -> DataOuDatetime:
+    """Devolve `dia` como datetime (mesma hora e fuso de `original`) quando `original` é datetime."""
+    if isinstance(original, datetime):
+        return datetime.combine(dia, original.timetz())
+    return dia
+
+class CalendarioDiasUteis:
+    """
+    Aritmética de dias úteis por bisect sobre os ordinais precomputados.
+    O intervalo de anos coberto cresce sob demanda quando uma data cai fora dele.
+
+    O calendário é compartilhado entre as threads dos endpoints: o intervalo e os
+    ordinais ficam numa única tupla, trocada inteira (sob lock) ao crescer; cada
+    operação lê a tupla uma vez e faz todas as buscas nela.
+    """
+
+    def __init__(
+        self,
+        feriados_extras: Optional[Dict[date, str]] = None,
+        ano_inicio: int = 2000,
+        ano_fim: Optional[int] = None,
+        nacionais: bool = True,
+    ):
+        self.feriados_extras: Dict[date, str] = dict(feriados_extras or {})
+        self.nacionais = nacionais
+        self._lock = threading.Lock()
+        self._cobertura: Cobertura = self._construir(ano_inicio, ano_fim or date.today().year + 5)
+
+    def _construir(self, ano_inicio: int, ano_fim: int) -> Cobertura:
+        ano_inicio, ano_fim = max(ano_inicio, MINYEAR), min(ano_fim, MAXYEAR)
+        nao_uteis = set()
+        for ano in range(ano_inicio, ano_fim + 1):
+            nao_uteis.update(d.toordinal() for d in self.feriados(ano))
+        inicio = date(ano_inicio, 1, 1).toordinal()
+        fim = date(ano_fim, 12, 31).toordinal()
+        # 1º/01/0001 (ordinal 1) é segunda-feira: (ordinal - 1) % 7 == weekday()
+        ordinais = [o for o in range(inicio, fim + 1) if (o - 1) % 7 < 5 and o not in nao_uteis]
+        return ano_inicio, ano_fim, ordinais
+
+    def _ampliar(self, ano_inicio: int, ano_fim: int) -> Cobertura:
+        """Estende a cobertura para incluir [ano_inicio, ano_fim] e devolve a nova tupla."""
+        with self._lock:
+            atual_ini, atual_fim, _ = self._cobertura
+            ano_inicio, ano_fim = max(min(ano_inicio, atual_ini), MINYEAR), min(max(ano_fim, atual_fim), MAXYEAR)
+            if (ano_inicio, ano_fim) != (atual_ini, atual_fim):
+                self._cobertura = self._construir(ano_inicio, ano_fim)
+            return self._cobertura
+
+    def _cobrir(self, *ordinais: int) -> Cobertura:
+        cobertura = self._cobertura
+        anos = [date.fromordinal(min(max(o, 1), date.max.toordinal())).year for o in ordinais]
+        if min(anos) < cobertura[0] or max(anos) > cobertura[1]:
+            cobertura = self._ampliar(min(anos) - 1, max(anos) + 1)
+        return cobertura
+
+    def feriados(self, ano: int) -> Dict[date, str]:
+        """Feriados do ano (nacionais + extras); os extras prevalecem na descrição."""
+        feriados = feriados_nacionais(ano) if self.nacionais else {}
+        feriados.update({d: nome for d, nome in self.feriados_extras.items() if d.year == ano})
+        return feriados
+
+    def eh_dia_util(self, dia: DataOuDatetime) -> bool:
+        o = _dia(dia).toordinal()
+        _, _, ordinais = self._cobrir(o)
+        i = bisect_left(ordinais, o)
+        return i < len(ordinais) and ordinais[i] == o
+
+    def contar(self, inicio: DataOuDatetime, fim: DataOuDatetime) -> int:
+        """Dias úteis de `inicio` (inclusive) até `fim` (exclusive); 0 se fim <= inicio."""
+        o_ini, o_fim = _dia(inicio).toordinal(), _dia(fim).toordinal()
+        if o_fim <= o_ini:
+            return 0
+        _, _, ordinais = self._cobrir(o_ini, o_fim)
+        return bisect_left(ordinais, o_fim) - bisect_left(ordinais, o_ini)
+
+    def subtrair(self, referencia: DataOuDatetime, dias_uteis: int) -> DataOuDatetime:
+        """O `dias_uteis`-ésimo dia útil antes de `referencia` (que não conta)."""
+        if dias_uteis <= 0:
+            return referencia
+        o = _dia(referencia).toordinal()
+        ano_inicio, ano_fim, ordinais = self._cobrir(o)
+        i = bisect_left(ordinais, o) - dias_uteis
+        while i < 0:
+            if ano_inicio == MINYEAR:
+                raise OverflowError("data fora do calendário")
+            ano_inicio, ano_fim, ordinais = self._ampliar(ano_inicio - 1 - (-i) // 250, ano_fim)
+            i = bisect_left(ordinais, o) - dias_uteis
+        return _mesmo_tipo(referencia, date.fromordinal(ordinais[i]))
+
+    def somar(self, referencia: DataOuDatetime, dias_uteis: int) -> DataOuDatetime:
+        """O `dias_uteis`-ésimo dia útil depois de `referencia` (que não conta)."""
+        if dias_uteis <= 0:
+            return referencia
+        o = _dia(referencia).toordinal()
+        ano_inicio, ano_fim, ordinais = self._cobrir(o)
+        i = bisect_right(ordinais, o) + dias_uteis - 1
+        while i >= len(ordinais):
+            if ano_fim == MAXYEAR:
+                raise OverflowError("data fora do calendário")
+            ano_inicio, ano_fim, ordinais = self._ampliar(ano_inicio, ano_fim + 1 + (i - len(ordinais) + 1) // 250)
+            i = bisect_right(ordinais, o) + dias_uteis - 1
+        return _mesmo_tipo(referencia, date.fromordinal(ordinais[i]))
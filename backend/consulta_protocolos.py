@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Compilador de consultas de protocolos.
+#
+# Um FiltroProtocolos (o que a busca, a exportação e os filtros salvos recebem)
+# vira uma ConsultaCompilada: o filtro Mongo e o índice a usar como hint. A
+# escolha do índice segue a seletividade esperada de cada campo (número e CPF
+# primeiro, depois categoria/status com data, depois só data), sempre entre os
+# índices compostos criados em create_indexes(). Sem dependência de FastAPI ou
+# do banco: erros de validação saem como FiltroInvalido (ValueError).
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+Indice = Tuple[Tuple[str, int], ...]
+
+# Índices de `protocolos` usados como hint (especificação de chaves, não nome)
+INDICE_NUMERO: Indice = (("numero", 1),)
+INDICE_CPF: Indice = (("cpf", 1),)
+INDICE_CATEGORIA_STATUS_DATA: Indice = (("categoria", 1), ("status", 1), ("data_criacao_dt", -1))
+INDICE_CATEGORIA_DATA: Indice = (("categoria", 1), ("data_criacao_dt", -1))
+INDICE_STATUS_DATA: Indice = (("status", 1), ("data_criacao_dt", -1))
+INDICE_DATA: Indice = (("data_criacao_dt", 1),)
+
+# Campo de ordenação -> índice que já entrega a ordem quando não há filtro melhor
+INDICES_ORDENACAO: Dict[str, Indice] = {
+    "data_criacao_dt": INDICE_DATA,
+    "numero": INDICE_NUMERO,
+    "cpf": INDICE_CPF,
+}
+
+CAMPOS_BUSCA_TEXTO = ("nome_requerente", "titulo", "outras_infos", "nome_parte_ato", "numero")
+CATEGORIAS_ALIAS = {"IDT": "RTD"}
+
+class FiltroInvalido(ValueError):
+    pass
+
+def _digitos(valor: Optional[str]) -> str:
+    return re.sub(r"\D", "", str(valor or ""))
+
+def _lista(valores: Optional[Iterable[Any]]) -> Tuple[str, ...]:
+    if valores is None:
+        return ()
+    if isinstance(valores, str):
+        valores = [valores]
+    return tuple(dict.fromkeys(str(v).strip() for v in valores if v is not None and str(v).strip()))
+
+@dataclass(frozen=True)
+class FiltroProtocolos:
+    """Filtros da busca de protocolos, já normalizados (dígitos, listas sem repetição, IDT -> RTD)."""
+    numero: str = ""
+    cpf: str = ""
+    status: Tuple[str, ...] = ()
+    categoria: Tuple[str, ...] = ()
+    q: str = ""
+    data_inicio: str = ""
+    data_fim: str = ""
+
+    @classmethod
+    def criar(
+        cls,
+        numero: Optional[str] = None,
+        cpf: Optional[str] = None,
+        status: Optional[Iterable[str]] = None,
+        categoria: Optional[Iterable[str]] = None,
+        q: Optional[str] = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+    ) -> "FiltroProtocolos":
+        categorias = tuple(dict.fromkeys(CATEGORIAS_ALIAS.get(c, c) for c in _lista(categoria)))
+        return cls(
+            numero=_digitos(numero),
+            cpf=_digitos(cpf),
+            status=_lista(status),
+            categoria=categorias,
+            q=(q or "").strip(),
+            data_inicio=(data_inicio or "").strip(),
+            data_fim=(data_fim or "").strip(),
+        )
+
+    @classmethod
+    def de_dict(cls, dados: Mapping[str, Any]) -> "FiltroProtocolos":
+        """Monta o filtro a partir de um dict (ex.: filtro salvo); chaves desconhecidas são erro."""
+        desconhecidas = sorted(set(dados) - set(cls.__dataclass_fields__))
+        if desconhecidas:
+            raise FiltroInvalido(f"Campo de filtro desconhecido: {desconhecidas}")
+        return cls.criar(**dados)
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Forma canônica (só campos preenchidos), adequada para persistir."""
+        out: Dict[str, Any] = {}
+        for nome in self.__dataclass_fields__:
+            valor = getattr(self, nome)
+            if valor:
+                out[nome] = list(valor) if isinstance(valor, tuple) else valor
+        return out
+
+@dataclass(frozen=True)
+class ConsultaCompilada:
+    filtro: Dict[str, Any] = field(default_factory=dict)
+    hint: Optional[Indice] = None
+
+    @property
+    def hint_lista(self) -> Optional[List[Tuple[str, int]]]:
+        return list(self.hint) if self.hint else None
+
+def _intervalo_datas(data_inicio: str, data_fim: str) -> Dict[str, Any]:
+    cond: Dict[str, Any] = {}
+    try:
+        if data_inicio:
+            cond["$gte"] = datetime.strptime(data_inicio, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        if data_fim:
+            fim = datetime.strptime(data_fim, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            cond["$lte"] = fim + timedelta(days=1) - timedelta(seconds=1)
+    except ValueError:
+        raise FiltroInvalido("Data inválida. Use YYYY-MM-DD.")
+    return cond
+
+def escolher_indice(spec: FiltroProtocolos, campo_ordem: str = "data_criacao_dt") -> Optional[Indice]:
+    """Índice mais seletivo para o filtro; sem filtro indexável, o da ordenação (se houver)."""
+    if spec.numero:
+        return INDICE_NUMERO
+    if spec.cpf:
+        return INDICE_CPF
+    if spec.categoria:
+        return INDICE_CATEGORIA_STATUS_DATA if spec.status else INDICE_CATEGORIA_DATA
+    if spec.status:
+        return INDICE_STATUS_DATA
+    if spec.data_inicio or spec.data_fim:
+        return INDICE_DATA
+    if spec.q.isdigit() and len(spec.q) <= 10:
+        return INDICE_NUMERO
+    return INDICES_ORDENACAO.get(campo_ordem)
+
+def compilar_consulta(
+    spec: FiltroProtocolos,
+    status_validos: Iterable[str],
+    categorias_validas: Iterable[str],
+    campo_ordem: str = "data_criacao_dt",
+) -> ConsultaCompilada:
+    """Traduz o filtro para a consulta Mongo da busca de protocolos e escolhe o hint."""
+    filtros: List[Dict[str, Any]] = []
+    if spec.numero:
+        filtros.append({"numero": spec.numero})
+    if spec.cpf:
+        filtros.append({"cpf": spec.cpf})
+    if spec.status:
+        invalido = [s for s in spec.status if s not in set(status_validos)]
+        if invalido:
+            raise FiltroInvalido(f"Status inválido: {invalido}")
+        filtros.append({"status": spec.status[0]} if len(spec.status) == 1 else {"status": {"$in": list(spec.status)}})
+    if spec.categoria:
+        invalido = [c for c in spec.categoria if c not in set(categorias_validas)]
+        if invalido:
+            raise FiltroInvalido(f"Categoria inválida: {invalido}")
+        filtros.append({"categoria": {"$in": list(spec.categoria)}})
+    if spec.q:
+        if spec.q.isdigit() and len(spec.q) <= 10:
+            filtros.append({"numero": {"$regex": re.escape(spec.q)}})
+        else:
+            re_obj = {"$regex": re.escape(spec.q), "$options": "i"}
+            filtros.append({"$or": [{c: re_obj} for c in CAMPOS_BUSCA_TEXTO]})
+    filtro: Dict[str, Any] = {}
+    if filtros:
+        filtro = filtros[0] if len(filtros) == 1 else {"$and": filtros}
+    if spec.data_inicio or spec.data_fim:
+        filtro["data_criacao_dt"] = _intervalo_datas(spec.data_inicio, spec.data_fim)
+    return ConsultaCompilada(filtro=filtro, hint=escolher_indice(spec, campo_ordem))
@@ -1,22 +1,186 @@
+# -*- coding: utf-8 -*-
+# Camada de acesso a dados (repositório) sobre o MongoDB.
+#
+# Um DBConnection por (URI, banco) por processo: DBConnection.compartilhada()
+# devolve sempre a mesma instância, então endpoints e jobs usam um único
+# MongoClient (um pool, os mesmos listeners de métricas). Leituras de muitos
+# documentos saem como geradores sobre o cursor, com projeção; listas só em
+# consultas limitadas (páginas). Para testes, DBConnection.em_memoria() monta
+# a mesma interface sobre um mongomock, injetável via app.dependency_overrides.
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
 from pymongo import MongoClient
+from pymongo.collection import Collection
+
+LOTE_CURSOR = 1000  # Documentos por lote do cursor nas varreduras
+
+# Campos internos que as listagens de protocolos não devolvem
+PROJECAO_PROTOCOLO_LISTAGEM: Dict[str, int] = {
+    "historico_alteracoes": 0,
+    "data_criacao_dt": 0,
+    "data_retirada_dt": 0,
+    "exig1_data_retirada_dt": 0,
+    "exig1_data_reapresentacao_dt": 0,
+    "exig2_data_retirada_dt": 0,
+    "exig2_data_reapresentacao_dt": 0,
+    "exig3_data_retirada_dt": 0,
+    "exig3_data_reapresentacao_dt": 0,
+}
+
+Ordem = Sequence[Tuple[str, int]]
+Hint = Optional[Sequence[Tuple[str, int]]]
 
 class DBConnection:
-    def __init__(self, uri="mongodb://localhost:27017/", db_name="protocolos_db"):
-        self.client = MongoClient(uri)
+    _compartilhadas: Dict[Tuple[str, str], "DBConnection"] = {}
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        uri: str = "mongodb://localhost:27017/",
+        db_name: str = "protocolos_db",
+        client: Optional[Any] = None,
+        **opcoes_cliente: Any,
+    ):
+        # Sem `client`, cria um preguiçoso (connect=False): nada de E/S no construtor
+        self.client = client if client is not None else MongoClient(uri, connect=False, **opcoes_cliente)
         self.db = self.client[db_name]
-        self.protocolos = self.db["protocolos"]
-        self.usuarios = self.db["usuarios"]
+        self.protocolos: Collection = self.db["protocolos"]
+        self.usuarios: Collection = self.db["usuarios"]
+        self.filtros: Collection = self.db["filtros"]
+        self.notificacoes: Collection = self.db["notificacoes"]
+        self.categorias: Collection = self.db["categorias"]
+        self.protocolos_excluidos: Collection = self.db["protocolos_excluidos"]
+        self.requerentes: Collection = self.db["requerentes"]
+        self.requerentes_sync: Collection = self.db["requerentes_sync"]
+        self.idempotencia: Collection = self.db["idempotencia"]
+        self.execucoes_jobs: Collection = self.db["execucoes_jobs"]
+        self.lideranca: Collection = self.db["lideranca"]
+        self.feriados: Collection = self.db["feriados"]
+        self.esquema: Collection = self.db["esquema"]
+
+    @classmethod
+    def compartilhada(
+        cls,
+        uri: str,
+        db_name: str,
+        fabrica_cliente: Optional[Callable[[str], Any]] = None,
+    ) -> "DBConnection":
+        """Instância única do processo para (uri, db_name); `fabrica_cliente` cria o client na primeira vez."""
+        chave = (uri, db_name)
+        with cls._lock:
+            repo = cls._compartilhadas.get(chave)
+            if repo is None:
+                client = fabrica_cliente(uri) if fabrica_cliente else None
+                repo = cls._compartilhadas[chave] = cls(uri, db_name, client=client)
+            return repo
+
+    @classmethod
+    def em_memoria(cls, db_name: str = "protocolos_db_teste") -> "DBConnection":
+        """Repositório isolado sobre mongomock (dublê para testes)."""
+        import mongomock  # type: ignore
+        return cls("mongomock://localhost", db_name, client=mongomock.MongoClient())
+
+    def ping(self) -> None:
+        self.client.admin.command("ping")
+
+    # --- Protocolos ---
+    def iterar_protocolos(
+        self,
+        filtro: Optional[Dict[str, Any]] = None,
+        projecao: Optional[Dict[str, int]] = None,
+        ordem: Optional[Ordem] = None,
+        hint: Hint = None,
+        batch_size: int = LOTE_CURSOR,
+    ) -> Iterator[Dict[str, Any]]:
+        """Gera os protocolos do filtro direto do cursor, sem montar a lista inteira."""
+        cursor = self.protocolos.find(filtro or {}, projecao, batch_size=batch_size)
+        if ordem:
+            cursor = cursor.sort(list(ordem))
+        if hint:
+            cursor = cursor.hint(list(hint))
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    # Nome antigo; agora um gerador (antes fazia list(find()) sem limite)
+    buscar_protocolos = iterar_protocolos
+
+    def pagina_protocolos(
+        self,
+        filtro: Dict[str, Any],
+        limite: int,
+        skip: int = 0,
+        projecao: Optional[Dict[str, int]] = None,
+        ordem: Optional[Ordem] = None,
+        hint: Hint = None,
+    ) -> List[Dict[str, Any]]:
+        cursor = self.protocolos.find(filtro, projecao)
+        if ordem:
+            cursor = cursor.sort(list(ordem))
+        if hint:
+            cursor = cursor.hint(list(hint))
+        return list(cursor.skip(skip).limit(limite))
+
+    def contar_protocolos(self, filtro: Dict[str, Any], hint: Hint = None) -> int:
+        if hint:
+            return self.protocolos.count_documents(filtro, hint=list(hint))
+        return self.protocolos.count_documents(filtro)
+
+    def protocolo_por_id(self, protocolo_id: ObjectId, projecao: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        return self.protocolos.find_one({"_id": protocolo_id}, projecao)
+
+    def protocolo_por_numero(self, numero: str, projecao: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        return self.protocolos.find_one({"numero": numero}, projecao)
+
+    def salvar_protocolo(self, dados: Dict[str, Any]) -> str:
+        return str(self.protocolos.insert_one(dados).inserted_id)
+
+    def editar_protocolo(
+        self,
+        protocolo_id: ObjectId,
+        novos_dados: Dict[str, Any],
+        remover: Optional[Dict[str, Any]] = None,
+        adicionar: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """$set/$unset/$push num único update; devolve quantos protocolos casaram (0 = não existe)."""
+        atualizacao: Dict[str, Any] = {}
+        if novos_dados:
+            atualizacao["$set"] = novos_dados
+        if remover:
+            atualizacao["$unset"] = remover
+        if adicionar:
+            atualizacao["$push"] = adicionar
+        return self.protocolos.update_one({"_id": protocolo_id}, atualizacao).matched_count
+
+    def excluir_protocolo(self, protocolo_id: ObjectId) -> int:
+        return self.protocolos.delete_one({"_id": protocolo_id}).deleted_count
+
+    def registrar_exclusao(self, dados: Dict[str, Any]) -> ObjectId:
+        """Trilha de auditoria da exclusão definitiva (gravada antes de apagar o protocolo)."""
+        return self.protocolos_excluidos.insert_one(dados).inserted_id
 
-    def salvar_protocolo(self, dados):
-        return self.protocolos.insert_one(dados)
+    def remover_registro_exclusao(self, registro_id: ObjectId) -> int:
+        return self.protocolos_excluidos.delete_one({"_id": registro_id}).deleted_count
 
-    def buscar_protocolos(self, filtro=None):
-        return list(self.protocolos.find(filtro or {}))
+    # --- Categorias ---
+    def nomes_categorias(self) -> List[str]:
+        return [n for n in self.categorias.distinct("nome") if n]
 
-    def editar_protocolo(self, protocolo_id, novos_dados):
-        return self.protocolos.update_one({"_id": protocolo_id}, {"$set": novos_dados})
+    def slas_categorias(self) -> Dict[str, int]:
+        """SLA (dias úteis) das categorias que definem um; as demais usam o padrão."""
+        return {
+            c["nome"]: int(c["sla_dias_uteis"])
+            for c in self.categorias.find({"sla_dias_uteis": {"$gt": 0}}, {"nome": 1, "sla_dias_uteis": 1})
+        }
 
-    def excluir_protocolo(self, protocolo_id):
-        return self.protocolos.delete_one({"_id": protocolo_id})
+    # --- Usuários ---
+    def usuario_por_nome(self, usuario: str, projecao: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        return self.usuarios.find_one({"usuario": usuario}, projecao)
 
-    # Métodos para usuários podem ser adicionados aqui
\ No newline at end of file
+    def nomes_admins(self) -> Iterator[str]:
+        for u in self.usuarios.find({"tipo": "admin"}, {"usuario": 1}):
+            if u.get("usuario"):
+                yield u["usuario"]
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Índices gerenciados por arquivo (indices.json).
+#
+# Cada coleção listada no arquivo tem seus índices declarados ali; a
+# sincronização cria os que faltam, recria os que mudaram de opções (ex.: um
+# índice comum que virou parcial) e, com "remover_nao_listados", remove os que
+# saíram do arquivo. Para remover um índice sem uso basta apagá-lo do arquivo.
+# A recriação nunca deixa a coleção sem o índice: o novo é construído ao lado do
+# antigo sob o nome alternativo (nome + "__novo", ou o nome original se o atual já
+# for o alternativo) e fica com ele; o MongoDB não aceita dois índices iguais com
+# nomes diferentes, então não há renomeação no fim. Índices únicos nunca são
+# removidos automaticamente, e uma troca que o servidor não aceita lado a lado
+# (mesmas chaves, opções conflitantes) também fica para intervenção manual: os
+# dois casos saem em "manuais".
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+INDICES_SPEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indices.json")
+OPCOES_COMPARADAS = ("unique", "partialFilterExpression", "expireAfterSeconds", "sparse")
+SUFIXO_TEMPORARIO = "__novo"
+CODIGOS_CONFLITO_INDICE = {85, 86}  # IndexOptionsConflict, IndexKeySpecsConflict
+
+Chaves = Tuple[Tuple[str, int], ...]
+
+@dataclass(frozen=True)
+class EspecIndice:
+    chaves: Chaves
+    nome: str
+    opcoes: Dict[str, Any] = field(default_factory=dict)
+    descricao: str = ""
+
+@dataclass(frozen=True)
+class EspecColecao:
+    indices: Tuple[EspecIndice, ...]
+    remover_nao_listados: bool = False
+
+def assinatura_especificacao(caminho: str = INDICES_SPEC_PATH) -> str:
+    """Hash do arquivo de índices; muda quando qualquer índice é incluído, alterado ou removido."""
+    with open(caminho, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def nome_padrao(chaves: Chaves) -> str:
+    """Mesmo nome que o MongoDB gera (campo_direção unidos por "_")."""
+    return "_".join(f"{campo}_{direcao}" for campo, direcao in chaves)
+
+def carregar_especificacao(caminho: str = INDICES_SPEC_PATH) -> Dict[str, EspecColecao]:
+    with open(caminho, encoding="utf-8") as f:
+        dados = json.load(f)
+    out: Dict[str, EspecColecao] = {}
+    for colecao, spec in dados.get("colecoes", {}).items():
+        indices = []
+        for item in spec.get("indices", []):
+            chaves: Chaves = tuple((str(c), int(d)) for c, d in item["chaves"])
+            opcoes = {k: item[k] for k in OPCOES_COMPARADAS if k in item}
+            indices.append(EspecIndice(chaves, item.get("nome") or nome_padrao(chaves), opcoes, item.get("descricao", "")))
+        out[colecao] = EspecColecao(tuple(indices), bool(spec.get("remover_nao_listados", False)))
+    return out
+
+def chaves_indice(info: Dict[str, Any]) -> Chaves:
+    return tuple((campo, int(direcao)) for campo, direcao in info["key"])
+
+def _igual(espec: EspecIndice, info: Dict[str, Any]) -> bool:
+    if chaves_indice(info) != espec.chaves:
+        return False
+    return all(espec.opcoes.get(k) == info.get(k) for k in OPCOES_COMPARADAS if k in espec.opcoes or info.get(k))
+
+def nomes_aceitos(indice: EspecIndice) -> Tuple[str, str]:
+    """Nomes sob os quais o índice pode estar: o do arquivo e o alternativo da última troca."""
+    return indice.nome, indice.nome + SUFIXO_TEMPORARIO
+
+def nome_vigente(indice: EspecIndice, existentes: Dict[str, Any]) -> Optional[str]:
+    """Nome sob o qual o índice existe hoje (o que já segue o arquivo, se houver dois)."""
+    nomes = [n for n in nomes_aceitos(indice) if n in existentes]
+    iguais = [n for n in nomes if _igual(indice, existentes[n])]
+    return (iguais or nomes or [None])[0]
+
+def _recriar(colecao: Collection, indice: EspecIndice, atual: str, existentes: Dict[str, Any]) -> str:
+    """Troca um índice cujas opções mudaram: constrói o novo sob o outro nome e só então remove o antigo."""
+    principal, alternativo = nomes_aceitos(indice)
+    destino = alternativo if atual == principal else principal
+    if destino in existentes:  # Sobra de uma troca interrompida, com a definição antiga
+        colecao.drop_index(destino)
+    # Se falhar (ex.: duplicatas para um unique), o índice antigo continua lá
+    colecao.create_index(list(indice.chaves), name=destino, **indice.opcoes)
+    colecao.drop_index(atual)
+    return destino
+
+def sincronizar_indices(colecao: Collection, espec: EspecColecao) -> Dict[str, List[str]]:
+    """
+    Aplica a especificação à coleção; erros de um índice não impedem os demais.
+    "erros" são falhas a tentar de novo; "manuais", mudanças que a sincronização não faz sozinha.
+    """
+    relatorio: Dict[str, List[str]] = {
+        "criados": [], "recriados": [], "removidos": [], "mantidos": [], "manuais": [], "erros": []
+    }
+    existentes = colecao.index_information()
+    vigentes = set()
+    for indice in espec.indices:
+        atual = nome_vigente(indice, existentes)
+        try:
+            if atual is not None and _igual(indice, existentes[atual]):
+                relatorio["mantidos"].append(indice.nome)
+                vigentes.add(atual)
+                continue
+            if atual is None:
+                colecao.create_index(list(indice.chaves), name=indice.nome, **indice.opcoes)
+                relatorio["criados"].append(indice.nome)
+                vigentes.add(indice.nome)
+            elif existentes[atual].get("unique"):
+                relatorio["manuais"].append(f"{indice.nome}: índice único com outra definição; recrie manualmente")
+                vigentes.add(atual)
+            else:
+                vigentes.add(_recriar(colecao, indice, atual, existentes))
+                relatorio["recriados"].append(indice.nome)
+        except OperationFailure as e:
+            vigentes.add(atual)
+            if e.code in CODIGOS_CONFLITO_INDICE:
+                relatorio["manuais"].append(f"{indice.nome}: não dá para construir o novo ao lado do antigo ({e}); recrie manualmente")
+            else:
+                relatorio["erros"].append(f"{indice.nome}: {e}")
+        except Exception as e:
+            vigentes.add(atual)
+            relatorio["erros"].append(f"{indice.nome}: {e}")
+    atuais = colecao.index_information()  # Já com as trocas feitas acima
+    for indice in espec.indices:
+        # Par de uma troca interrompida: sobrou ao lado do vigente, com a definição antiga
+        for nome in nomes_aceitos(indice):
+            if nome in atuais and nome not in vigentes and not atuais[nome].get("unique"):
+                try:
+                    colecao.drop_index(nome)
+                    relatorio["removidos"].append(nome)
+                except Exception as e:
+                    relatorio["erros"].append(f"{nome}: {e}")
+    if espec.remover_nao_listados:
+        atuais = colecao.index_information()
+        for nome in atuais:
+            if nome == "_id_" or nome in vigentes:
+                continue
+            # Nomes alternativos nunca saem aqui: podem ser de uma troca de outra instância
+            if nome.endswith(SUFIXO_TEMPORARIO):
+                if nome[:-len(SUFIXO_TEMPORARIO)] not in {i.nome for i in espec.indices}:
+                    relatorio["manuais"].append(f"{nome}: índice de troca fora do arquivo; remova manualmente")
+                continue
+            if atuais[nome].get("unique"):
+                relatorio["manuais"].append(f"{nome}: índice único fora do arquivo; remova manualmente")
+                continue
+            try:
+                colecao.drop_index(nome)
+                relatorio["removidos"].append(nome)
+            except Exception as e:
+                relatorio["erros"].append(f"{nome}: {e}")
+    return relatorio
+
+def estagios_plano(plano: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str]]]:
+    """(estágio, índice) de cada nó do plano de execução do explain."""
+    yield plano.get("stage", ""), plano.get("indexName")
+    for chave in ("inputStage", "queryPlan"):
+        if chave in plano:
+            yield from estagios_plano(plano[chave])
+    for sub in plano.get("inputStages", []):
+        yield from estagios_plano(sub)
@@ -4,10 +4,13 @@ import time
 import os
 import base64
 import secrets
+import random
 import hashlib
 import hmac
 import logging
 import asyncio
+import socket
+import threading
 import csv
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any, Tuple
@@ -15,7 +18,9 @@ from contextlib import asynccontextmanager
 import re
 import json
 from functools import lru_cache
+from collections import OrderedDict
 import io
+import unicodedata
 import zipfile
 from io import BytesIO
 from datetime import datetime as _dt
@@ -27,26 +32,68 @@ except ImportError:
 from bson import ObjectId
 from bson.json_util import dumps as bson_dumps, loads as bson_loads
 from fastapi import FastAPI, HTTPException, Query, Body, Request, Depends, UploadFile, File, status
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field, field_validator, ValidationError
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator, ValidationError
 from pymongo import MongoClient, errors
 from pymongo.collection import Collection
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+try:
+    from .calendario import CalendarioDiasUteis, feriados_nacionais
+    from .exportacao import cursor_exportacao, resposta_csv, resposta_xlsx, xlsx_disponivel
+    from .consulta_protocolos import ConsultaCompilada, FiltroInvalido, FiltroProtocolos, compilar_consulta
+    from .indices import assinatura_especificacao, carregar_especificacao, chaves_indice, estagios_plano, nome_vigente, nomes_aceitos, sincronizar_indices
+    from .metricas_mongo import MetricasMongo
+    from .db_connection import DBConnection, PROJECAO_PROTOCOLO_LISTAGEM
+except ImportError:
+    from calendario import CalendarioDiasUteis, feriados_nacionais
+    from exportacao import cursor_exportacao, resposta_csv, resposta_xlsx, xlsx_disponivel
+    from consulta_protocolos import ConsultaCompilada, FiltroInvalido, FiltroProtocolos, compilar_consulta
+    from indices import assinatura_especificacao, carregar_especificacao, chaves_indice, estagios_plano, nome_vigente, nomes_aceitos, sincronizar_indices
+    from metricas_mongo import MetricasMongo
+    from db_connection import DBConnection, PROJECAO_PROTOCOLO_LISTAGEM
 
 # ====================== [BLOCO 2: CONFIGURAÇÃO DE LOGGING] ======================
+LOG_FILE = os.getenv("LOG_FILE", "app.log")  # Os testes apontam para um arquivo temporário
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('app.log'),
+        logging.FileHandler(LOG_FILE),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
 # ====================== [BLOCO 3: CONEXÃO E INICIALIZAÇÃO MONGODB] ======================
-def criar_cliente_mongodb(uri: str, max_retries=30, delay=2):
+# O cliente é criado sem conectar (connect=False): importar o módulo não faz E/S
+# e a primeira operação é que abre a conexão. No startup, aguardar_conexao_mongodb()
+# testa o servidor com backoff exponencial e jitter, sem travar o event loop.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 3000
+MONGO_BACKOFF_BASE_SECONDS = 0.5
+MONGO_BACKOFF_MAX_SECONDS = 30.0
+MONGO_BACKOFF_MAX_EXPOENTE = 16  # 0.5 * 2^16 já passa muito do teto
+# Pool por processo. Endpoints síncronos rodam no threadpool do FastAPI (40
+# threads) e os jobs em threads próprias, então o máximo padrão fica acima disso;
+# com vários workers, some os pools ao dimensionar o servidor.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))     # Fecha conexões ociosas há 5 min
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))  # Espera máx. por conexão livre
+
+# Métricas de pool e de comandos (veja /api/admin/mongo/metricas)
+metricas_mongo = MetricasMongo()
+
+def opcoes_pool_mongodb() -> Dict[str, Any]:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
+def criar_cliente_mongodb(uri: str):
     if uri.startswith("mongomock://"):
         try:
             import mongomock  # type: ignore
@@ -54,16 +101,22 @@ def criar_cliente_mongodb(uri: str, max_retries=30, delay=2):
             raise Exception("Para usar mongomock, instale com: pip install mongomock") from e
         logger.info("[MongoDB] Usando mongomock (memória)")
         return mongomock.MongoClient()
-    for attempt in range(1, max_retries + 1):
-        try:
-            client = MongoClient(uri, serverSelectionTimeoutMS=3000)
-            client.admin.command('ping')
-            logger.info(f"[MongoDB] Conectado na tentativa {attempt}")
-            return client
-        except errors.ServerSelectionTimeoutError as e:
-            logger.warning(f"[MongoDB] Falha ao conectar (tentativa {attempt}/{max_retries}): {e}")
-            time.sleep(delay)
-    raise Exception(f"Não foi possível conectar ao MongoDB após {max_retries} tentativas.")
+    return MongoClient(
+        uri,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connect=False,
+        event_listeners=[metricas_mongo],
+        **opcoes_pool_mongodb()
+    )
+
+def espera_backoff(
+    tentativa: int,
+    base: float = MONGO_BACKOFF_BASE_SECONDS,
+    teto: float = MONGO_BACKOFF_MAX_SECONDS
+) -> float:
+    """Espera antes da próxima tentativa: "full jitter", uniforme em [0, min(teto, base * 2^tentativa)]."""
+    # Expoente limitado: sem isso 2^tentativa estoura o float numa queda longa (~1000 tentativas)
+    return random.uniform(0, min(teto, base * (2 ** min(max(0, tentativa), MONGO_BACKOFF_MAX_EXPOENTE))))
 
 # ====================== [BLOCO 4: MODELOS E VALIDAÇÕES] ======================
 def apenas_digitos(s: str) -> str:
@@ -82,14 +135,27 @@ def validar_cpf(cpf: str) -> bool:
     return cpf[-2:] == f"{d1}{d2}"
 
 DEFAULT_CATEGORIAS = {"RGI", "RCPN", "RCPJ", "RTD", "PROTESTO", "NOTAS"}
+ALLOWED_STATUS = {"Pendente", "Em andamento", "Concluído", "Exigência", "EXCLUIDO"}
+CATEGORIAS_CACHE_TTL_SECONDS = 30  # Alterações feitas em outros workers aparecem em até 30s
 
-def get_allowed_categorias() -> set:
+@lru_cache(maxsize=8)  # Por (repositório, janela): o compartilhado e os injetados nos testes
+def _categorias_permitidas(repo: DBConnection, janela: int) -> frozenset:
+    return frozenset(DEFAULT_CATEGORIAS) | frozenset(repo.nomes_categorias())
+
+def get_allowed_categorias(repo: Optional[DBConnection] = None) -> frozenset:
+    """Categorias válidas (padrão + cadastradas), em cache por CATEGORIAS_CACHE_TTL_SECONDS."""
     try:
-        names = categorias_coll.distinct("nome")
-        dyn = set([n for n in names if n])
-        return set(DEFAULT_CATEGORIAS) | dyn
+        return _categorias_permitidas(repo or repositorio, int(time.time() // CATEGORIAS_CACHE_TTL_SECONDS))
     except Exception:
-        return set(DEFAULT_CATEGORIAS)
+        return frozenset(DEFAULT_CATEGORIAS)
+
+def normalizar_categoria(categoria: str) -> str:
+    c = str(categoria or "").strip()
+    return "RTD" if c == "IDT" else c
+
+def parse_data_iso(valor: str) -> datetime:
+    """Converte 'YYYY-MM-DD' em datetime UTC à meia-noite (ValueError se inválida)."""
+    return datetime.strptime(valor, "%Y-%m-%d").replace(tzinfo=timezone.utc)
 
 class ProtocoloModel(BaseModel):
     numero: str = Field(..., min_length=5, max_length=10, description="Número do protocolo, 5-10 dígitos numéricos.")
@@ -125,6 +191,9 @@ class ProtocoloModel(BaseModel):
     exig3_data_retirada: str = Field(default="", max_length=10)
     exig3_reapresentada_por: str = Field(default="", max_length=60)
     exig3_data_reapresentacao: str = Field(default="", max_length=10)
+
+    # Preenchido uma única vez na validação; evita reconverter a data no endpoint
+    _data_criacao_dt: Optional[datetime] = PrivateAttr(default=None)
     
     @field_validator('numero')
     @classmethod
@@ -136,40 +205,45 @@ class ProtocoloModel(BaseModel):
     @field_validator('cpf')
     @classmethod
     def cpf_valido(cls, v, info):
-        # Allow empty CPF when sem_cpf flag is True
-        if info.data.get('sem_cpf', False) and not v:
-            return v
-        if not validar_cpf(v):
+        # CPF vazio é aceito quando sem_cpf=True; nesse caso o CPF é sempre descartado
+        sem_cpf = info.data.get('sem_cpf', False)
+        if sem_cpf and not v:
+            return ""
+        cpf = apenas_digitos(v)
+        if not validar_cpf(cpf):
             raise ValueError("CPF inválido. Informe um CPF válido.")
-        return v
+        return "" if sem_cpf else cpf
     
     @field_validator('status')
     @classmethod
     def status_valido(cls, v):
-        allowed = {"Pendente", "Em andamento", "Concluído", "Exigência", "EXCLUIDO"}
-        if v not in allowed:
+        v = v.strip()
+        if v not in ALLOWED_STATUS:
             raise ValueError("Status inválido.")
         return v
     
     @field_validator('categoria')
     @classmethod
     def categoria_valida(cls, v):
-        allowed = get_allowed_categorias()
-        if v not in allowed:
+        v = normalizar_categoria(v)
+        if v not in get_allowed_categorias():
             raise ValueError("Categoria inválida.")
         return v
     
-    @field_validator('data_criacao')
-    @classmethod
-    def data_criacao_valida(cls, v):
+    @model_validator(mode='after')
+    def data_criacao_valida(self):
         try:
-            data = datetime.strptime(v, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-            agora = datetime.now(timezone.utc)
-            if data > agora:
-                raise ValueError("Data não pode ser futura")
-            return v
+            data = parse_data_iso(self.data_criacao)
         except ValueError:
             raise ValueError("Data inválida. Use YYYY-MM-DD.")
+        if data > datetime.now(timezone.utc):
+            raise ValueError("Data não pode ser futura.")
+        self._data_criacao_dt = data
+        return self
+
+    @property
+    def data_criacao_dt(self) -> datetime:
+        return self._data_criacao_dt
 
 class UsuarioModel(BaseModel):
     usuario: str
@@ -179,6 +253,7 @@ class UsuarioModel(BaseModel):
 class CategoriaModel(BaseModel):
     nome: str = Field(..., min_length=1, max_length=60)
     descricao: Optional[str] = Field(default="", max_length=240)
+    sla_dias_uteis: Optional[int] = Field(default=None, ge=1, le=365, description="Prazo em dias úteis; vazio usa o padrão")
 
     @field_validator('nome')
     @classmethod
@@ -188,51 +263,238 @@ class CategoriaModel(BaseModel):
             raise ValueError("Nome inválido")
         return v2
 
+class FeriadoModel(BaseModel):
+    data: str = Field(..., description="Data do feriado, YYYY-MM-DD")
+    descricao: str = Field(default="", max_length=120)
+
+    @field_validator('data')
+    @classmethod
+    def data_valida(cls, v):
+        v2 = v.strip()
+        try:
+            parse_data_iso(v2)
+        except ValueError:
+            raise ValueError("Data inválida. Use YYYY-MM-DD.")
+        return v2
+
 # ====================== [BLOCO 5: CONFIGURAÇÃO DO BANCO E ÍNDICES] ======================
+IDEMPOTENCIA_TTL_SECONDS = 24 * 3600  # Por quanto tempo uma Idempotency-Key guarda a resposta original
+EXECUCOES_JOBS_TTL_SECONDS = 90 * 24 * 3600  # Retenção dos relatórios de execução dos jobs
+NOTIFICACOES_LIDAS_RETENCAO_DIAS = int(os.getenv("NOTIFICACOES_LIDAS_RETENCAO_DIAS", "90"))  # Lidas expiram após N dias
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "protocolos_db")
-client = criar_cliente_mongodb(MONGO_URL)
-db = client[DB_NAME]
-protocolos_coll: Collection = db["protocolos"]
-usuarios_coll: Collection = db["usuarios"]
-filtros_coll: Collection = db["filtros"]
-notificacoes_coll: Collection = db["notificacoes"]
-categorias_coll: Collection = db["categorias"]
-protocolos_excluidos_coll: Collection = db["protocolos_excluidos"]
+ESPEC_INDICES = carregar_especificacao()  # backend/indices.json
+# Repositório único do processo (db_connection.py): um MongoClient compartilhado
+# por endpoints e jobs. Os *_coll abaixo são as coleções dele, para o código
+# que ainda acessa as coleções diretamente.
+repositorio = DBConnection.compartilhada(MONGO_URL, DB_NAME, fabrica_cliente=criar_cliente_mongodb)
+client = repositorio.client
+db = repositorio.db
+protocolos_coll: Collection = repositorio.protocolos
+usuarios_coll: Collection = repositorio.usuarios
+filtros_coll: Collection = repositorio.filtros
+notificacoes_coll: Collection = repositorio.notificacoes
+categorias_coll: Collection = repositorio.categorias
+protocolos_excluidos_coll: Collection = repositorio.protocolos_excluidos
+requerentes_coll: Collection = repositorio.requerentes
+requerentes_sync_coll: Collection = repositorio.requerentes_sync
+idempotencia_coll: Collection = repositorio.idempotencia
+execucoes_jobs_coll: Collection = repositorio.execucoes_jobs
+lideranca_coll: Collection = repositorio.lideranca
+feriados_coll: Collection = repositorio.feriados
+esquema_coll: Collection = repositorio.esquema
+
+def obter_repositorio() -> DBConnection:
+    """Dependência dos endpoints; testes trocam por DBConnection.em_memoria() via app.dependency_overrides."""
+    return repositorio
+
+# Estado da etapa de inicialização do esquema (índices, migrações, admin padrão).
+# Ela roda em background no líder (BLOCO 7); create_indexes() só anota a etapa
+# corrente aqui, para o /api/health mostrar o progresso. A assinatura só é gravada
+# quando tudo foi aplicado; até a primeira execução completa, /api/health/ready dá 503.
+ESQUEMA_VERSAO = 2  # Incrementar quando mudar índice fora de indices.json ou migração
+ESQUEMA_ASSINATURA = f"{ESQUEMA_VERSAO}:{assinatura_especificacao()}"
+ESQUEMA_ETAPAS = (
+    "usuarios", "protocolos", "categorias", "requerentes", "requerentes_sync", "idempotencia",
+    "execucoes_jobs", "notificacoes", "protocolos_excluidos", "feriados", "lideranca", "filtros",
+    "admin_padrao",
+)
+_esquema_estado: Dict[str, Any] = {
+    "estado": "pendente",  # pendente | aguardando_lider | indexando | pronto | erro
+    "etapa": None,
+    "etapas_concluidas": 0,
+    "etapas_total": len(ESQUEMA_ETAPAS),
+    "inicio": None,
+    "fim": None,
+    "erro": None,
+}
+
+def _etapa_esquema(nome: str) -> None:
+    _esquema_estado["etapa"] = nome
+    _esquema_estado["etapas_concluidas"] = ESQUEMA_ETAPAS.index(nome)
+
+def migrar_datas_notificacoes() -> int:
+    """
+    Preenche data_criacao_dt das notificações antigas a partir do horário do ObjectId
+    e lida_em_dt das já lidas, para que entrem na retenção (índice TTL).
+    """
+    notificacoes_coll.update_many(
+        {"lida": True, "lida_em_dt": {"$exists": False}},
+        {"$set": {"lida_em_dt": datetime.now(timezone.utc)}}
+    )
+    ops = [
+        UpdateOne({"_id": d["_id"]}, {"$set": {"data_criacao_dt": d["_id"].generation_time}})
+        for d in notificacoes_coll.find({"data_criacao_dt": {"$exists": False}}, {"_id": 1})
+        if isinstance(d["_id"], ObjectId)
+    ]
+    if not ops:
+        return 0
+    return notificacoes_coll.bulk_write(ops, ordered=False).modified_count
+
+def migrar_resumo_auditoria() -> int:
+    """Copia para o topo dos registros antigos os campos de resumo que hoje ficam só no snapshot."""
+    return protocolos_excluidos_coll.update_many(
+        {"status_original": {"$exists": False}},
+        [{"$set": {
+            "categoria": {"$ifNull": ["$protocolo_original.categoria", ""]},
+            "status_original": {"$ifNull": ["$protocolo_original.status", ""]},
+            "data_criacao": {"$ifNull": ["$protocolo_original.data_criacao", ""]},
+            "responsavel": {"$ifNull": ["$protocolo_original.responsavel", ""]},
+            "titulo": {"$ifNull": ["$protocolo_original.titulo", ""]},
+        }}]
+    ).modified_count
+
+def _falha(erros: List[str], msg: str) -> None:
+    logger.warning(msg)
+    erros.append(msg)
+
+def _sincronizar_colecao(colecao: Collection, nome: str, erros: List[str]) -> None:
+    """Aplica a parte de indices.json da coleção; falhas vão para `erros`, pendências manuais só para o log."""
+    try:
+        relatorio = sincronizar_indices(colecao, ESPEC_INDICES[nome])
+        for erro in relatorio["erros"]:
+            _falha(erros, f"[MongoDB] Aviso ao sincronizar índice de {nome}: {erro}")
+        for pendencia in relatorio["manuais"]:
+            # Tentar de novo não resolve: fica no log e no consultor de índices
+            logger.warning(f"[MongoDB] Índice de {nome} exige ação manual: {pendencia}")
+        if relatorio["criados"] or relatorio["recriados"] or relatorio["removidos"]:
+            logger.info(
+                f"[MongoDB] Índices de {nome}: criados={relatorio['criados']} "
+                f"recriados={relatorio['recriados']} removidos={relatorio['removidos']}"
+            )
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao sincronizar índices de {nome}: {e}")
 
-def create_indexes():
+def create_indexes() -> List[str]:
+    """Cria/sincroniza índices e roda as migrações; devolve as falhas (lista vazia = tudo aplicado)."""
+    erros: List[str] = []
+    _etapa_esquema("usuarios")
     try:
         usuarios_coll.create_index("usuario", unique=True)
     except Exception as e:
-        logger.warning(f"[MongoDB] Aviso ao criar índice de usuário: {e}")
+        _falha(erros, f"[MongoDB] Aviso ao criar índice de usuário: {e}")
+    _etapa_esquema("protocolos")
+    # Índices de `protocolos` vêm do arquivo gerenciado indices.json (veja indices.py)
+    _sincronizar_colecao(protocolos_coll, "protocolos", erros)
     try:
-        protocolos_coll.create_index("numero", unique=True)
+        # `atrasado` deixou de ser gravado (o atraso sai de prazo_dt); remove o campo antigo
+        protocolos_coll.update_many({"atrasado": {"$exists": True}}, {"$unset": {"atrasado": ""}})
     except Exception as e:
-        logger.warning(f"[MongoDB] Aviso ao criar índice de protocolo.numero: {e}")
-    try:
-        protocolos_coll.create_index([("cpf", 1)])
-        protocolos_coll.create_index([("status", 1)])
-        protocolos_coll.create_index([("categoria", 1)])
-        protocolos_coll.create_index([("data_criacao_dt", 1)])
-        protocolos_coll.create_index([("data_retirada_dt", 1)])
-        protocolos_coll.create_index([("nome_parte_ato", 1)])
-        protocolos_coll.create_index([("exig1_data_retirada_dt", 1)])
-        protocolos_coll.create_index([("exig1_data_reapresentacao_dt", 1)])
-        protocolos_coll.create_index([("exig2_data_retirada_dt", 1)])
-        protocolos_coll.create_index([("exig2_data_reapresentacao_dt", 1)])
-        protocolos_coll.create_index([("exig3_data_retirada_dt", 1)])
-        protocolos_coll.create_index([("exig3_data_reapresentacao_dt", 1)])
-        protocolos_coll.create_index([("data_concluido_dt", 1)])
-        protocolos_coll.create_index([("categoria", 1), ("status", 1), ("data_criacao_dt", -1)])
-        protocolos_coll.create_index([("status", 1), ("data_criacao_dt", -1)])
-        protocolos_coll.create_index([("categoria", 1), ("data_criacao_dt", -1)])
-    except Exception as e:
-        logger.warning(f"[MongoDB] Aviso ao criar índices auxiliares: {e}")
+        _falha(erros, f"[MongoDB] Aviso ao remover o campo atrasado dos protocolos: {e}")
 
+    _etapa_esquema("categorias")
     try:
         categorias_coll.create_index("nome", unique=True)
     except Exception as e:
-        logger.warning(f"[MongoDB] Aviso ao criar índice de categorias: {e}")
+        _falha(erros, f"[MongoDB] Aviso ao criar índice de categorias: {e}")
+
+    _etapa_esquema("requerentes")
+    try:
+        requerentes_coll.create_index("cpf", unique=True)
+        requerentes_coll.create_index([("nome_busca", 1), ("total_protocolos", -1)])
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índice de requerentes: {e}")
+
+    _etapa_esquema("requerentes_sync")
+    try:
+        requerentes_sync_coll.create_index("cpf", unique=True)
+        requerentes_sync_coll.create_index([("status", 1), ("enfileirado_dt", 1)])
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índices da fila de requerentes: {e}")
+
+    _etapa_esquema("idempotencia")
+    try:
+        idempotencia_coll.create_index("criado_dt", expireAfterSeconds=IDEMPOTENCIA_TTL_SECONDS)
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índice TTL de idempotência: {e}")
+
+    _etapa_esquema("execucoes_jobs")
+    try:
+        execucoes_jobs_coll.create_index([("job", 1), ("inicio_dt", -1)])
+        execucoes_jobs_coll.create_index("inicio_dt", expireAfterSeconds=EXECUCOES_JOBS_TTL_SECONDS)
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índices de execuções de jobs: {e}")
+
+    _etapa_esquema("notificacoes")
+    try:
+        # Uma notificação por usuário/tipo/dia; só vale para notificações diárias (com "dia")
+        notificacoes_coll.create_index(
+            [("usuario", 1), ("tipo", 1), ("dia", 1)],
+            unique=True,
+            partialFilterExpression={"dia": {"$exists": True}}
+        )
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índice de notificações diárias: {e}")
+
+    try:
+        # Listagem paginada por usuário (com ou sem filtro de lida) e contador de não lidas
+        notificacoes_coll.create_index([("usuario", 1), ("lida", 1), ("data_criacao_dt", -1), ("_id", -1)])
+        notificacoes_coll.create_index([("usuario", 1), ("data_criacao_dt", -1), ("_id", -1)])
+        migrar_datas_notificacoes()
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índices de listagem de notificações: {e}")
+
+    try:
+        # Retenção: notificação lida há mais de N dias é removida pelo próprio Mongo
+        notificacoes_coll.create_index(
+            "lida_em_dt",
+            expireAfterSeconds=NOTIFICACOES_LIDAS_RETENCAO_DIAS * 24 * 3600,
+            partialFilterExpression={"lida": True}
+        )
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índice TTL de notificações lidas: {e}")
+
+    _etapa_esquema("protocolos_excluidos")
+    try:
+        # Antes do índice coberto: registros antigos ganham os campos de resumo que ele guarda
+        migrar_resumo_auditoria()
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao migrar o resumo da auditoria de exclusões: {e}")
+    # Auditoria de exclusões: períodos, admin e número, sempre ordenados por data (indices.json)
+    _sincronizar_colecao(protocolos_excluidos_coll, "protocolos_excluidos", erros)
+
+    _etapa_esquema("feriados")
+    try:
+        feriados_coll.create_index("data", unique=True)
+        feriados_coll.create_index("ano")
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índices de feriados: {e}")
+
+    _etapa_esquema("lideranca")
+    try:
+        # Lease vencido e não renovado é removido pelo próprio Mongo
+        lideranca_coll.create_index("expira_dt", expireAfterSeconds=0)
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índice TTL de liderança: {e}")
+
+    _etapa_esquema("filtros")
+    try:
+        # Listagem "meus filtros" e fila da recontagem periódica (BLOCO 7.8)
+        filtros_coll.create_index([("usuario", 1), ("data_atualizacao", -1)])
+        filtros_coll.create_index([("total_atualizado_dt", 1)])
+    except Exception as e:
+        _falha(erros, f"[MongoDB] Aviso ao criar índices de filtros salvos: {e}")
+    return erros
 
 # ====================== [BLOCO 6: GESTÃO DE SENHAS] ======================
 PBKDF2_ALG = "pbkdf2_sha256"
@@ -287,9 +549,104 @@ def is_status_concluido(status: str) -> bool:
     """Check if status is 'concluído' (case-insensitive)"""
     return (status or "").strip().lower() in {"concluído", "concluido"}
 
+def as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """O PyMongo devolve datetimes sem fuso por padrão; normaliza para UTC."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
 # ====================== [BLOCO 7: INICIALIZAÇÃO] ======================
-create_indexes()
-inicializa_admin()
+# Nada de banco no import: índices, migrações e admin padrão rodam na etapa de
+# inicialização do esquema, disparada pelo lifespan em background. Só o líder
+# (BLOCO 7.5.1) executa; a assinatura aplicada fica em `esquema`, então um
+# restart com a mesma versão e o mesmo indices.json não reconstrói nada. Os
+# demais workers esperam a assinatura aparecer. Enquanto isso a aplicação já
+# atende e o /api/health responde "indexing".
+ESQUEMA_ESPERA_SECONDS = 2
+
+_conexao_estado: Dict[str, Any] = {"conectado": False, "tentativas": 0, "ultimo_erro": None, "conectado_em": None}
+
+def ping_mongodb() -> Tuple[bool, str]:
+    try:
+        repositorio.ping()
+        return True, "ok"
+    except Exception as e:
+        return False, f"mongo error: {str(e)}"
+
+async def aguardar_conexao_mongodb(max_tentativas: Optional[int] = None) -> bool:
+    """Pinga o Mongo até responder, com backoff exponencial e jitter entre as tentativas."""
+    tentativa = 0
+    while True:
+        ok, msg = await asyncio.to_thread(ping_mongodb)
+        _conexao_estado["tentativas"] = tentativa + 1
+        if ok:
+            _conexao_estado.update(conectado=True, ultimo_erro=None, conectado_em=datetime.now(timezone.utc))
+            logger.info(f"[MongoDB] Conectado na tentativa {tentativa + 1}")
+            return True
+        _conexao_estado.update(conectado=False, ultimo_erro=msg)
+        if max_tentativas and tentativa + 1 >= max_tentativas:
+            return False
+        espera = espera_backoff(tentativa)
+        logger.warning(f"[MongoDB] Falha ao conectar (tentativa {tentativa + 1}): {msg}; nova tentativa em {espera:.1f}s")
+        await asyncio.sleep(espera)
+        tentativa += 1
+
+def esquema_atualizado() -> bool:
+    doc = esquema_coll.find_one({"_id": "esquema"}, {"assinatura": 1})
+    return bool(doc and doc.get("assinatura") == ESQUEMA_ASSINATURA)
+
+def executar_inicializacao_esquema(forcar: bool = False) -> Dict[str, Any]:
+    inicio = datetime.now(timezone.utc)
+    _esquema_estado.update(estado="indexando", etapa=None, etapas_concluidas=0, inicio=inicio, fim=None, erro=None)
+    relatorio: Dict[str, Any] = {"status": "ok", "assinatura": ESQUEMA_ASSINATURA, "indices_aplicados": False}
+    try:
+        if forcar or not esquema_atualizado():
+            erros = create_indexes()
+            if erros:
+                # Sem gravar a assinatura: o líder tenta de novo (e o próximo start também)
+                raise RuntimeError(f"{len(erros)} falha(s) ao aplicar índices/migrações: " + "; ".join(erros))
+            esquema_coll.update_one(
+                {"_id": "esquema"},
+                {"$set": {"assinatura": ESQUEMA_ASSINATURA, "versao": ESQUEMA_VERSAO,
+                          "aplicado_dt": datetime.now(timezone.utc), "instancia": INSTANCIA_ID}},
+                upsert=True
+            )
+            relatorio["indices_aplicados"] = True
+        _etapa_esquema("admin_padrao")
+        inicializa_admin()
+        _esquema_estado.update(estado="pronto", etapa=None, etapas_concluidas=len(ESQUEMA_ETAPAS))
+    except Exception as e:
+        logger.error(f"[Esquema] Falha na inicialização do esquema: {e}")
+        _esquema_estado.update(estado="erro", erro=str(e))
+        relatorio["status"] = "erro"
+        relatorio["erro"] = str(e)
+    _esquema_estado["fim"] = datetime.now(timezone.utc)
+    return registrar_execucao_job("inicializacao_esquema", inicio, relatorio)
+
+async def inicializacao_esquema_task():
+    """Aplica o esquema no líder; nos demais workers, só acompanha até ele ficar pronto."""
+    await aguardar_conexao_mongodb()
+    while True:
+        try:
+            if sou_lider():
+                relatorio = await asyncio.to_thread(executar_inicializacao_esquema)
+                if relatorio["status"] == "ok":
+                    logger.info(f"[Esquema] Pronto ({relatorio['duracao_ms']} ms, índices aplicados: {relatorio['indices_aplicados']})")
+                    return
+                await asyncio.sleep(ERROR_RETRY_INTERVAL_SECONDS)
+                continue
+            if await asyncio.to_thread(esquema_atualizado):
+                _esquema_estado.update(estado="pronto", etapa=None, etapas_concluidas=len(ESQUEMA_ETAPAS),
+                                       fim=datetime.now(timezone.utc))
+                return
+            _esquema_estado["estado"] = "aguardando_lider"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Esquema] Erro ao acompanhar a inicialização: {e}")
+        await asyncio.sleep(ESQUEMA_ESPERA_SECONDS)
 
 # ====================== [BLOCO 7.5: AUTOMATIC DAILY NOTIFICATION SYSTEM] ======================
 # Constants for automatic notification system
@@ -298,110 +655,159 @@ NOTIFICATION_CHECK_HOUR_UTC = 8     # Hour (UTC) when automatic checks should ru
 NOTIFICATION_CHECK_INTERVAL_SECONDS = 3600  # Check every hour (3600 seconds)
 ERROR_RETRY_INTERVAL_SECONDS = 60   # Wait 60 seconds before retrying after an error
 
-async def verificar_atrasos_automatico():
+def registrar_execucao_job(job: str, inicio: datetime, relatorio: Dict[str, Any]) -> Dict[str, Any]:
+    """Grava em `execucoes_jobs` o relatório de uma execução (duração, contadores, erro)."""
+    fim = datetime.now(timezone.utc)
+    doc = {
+        "job": job,
+        "inicio_dt": inicio,
+        "fim_dt": fim,
+        "duracao_ms": round((fim - inicio).total_seconds() * 1000, 1),
+        **relatorio,
+    }
+    try:
+        execucoes_jobs_coll.insert_one(doc)
+    except Exception as e:
+        logger.warning(f"[Jobs] Falha ao registrar execução de {job}: {e}")
+    doc.pop("_id", None)
+    return doc
+
+def notificar_admins_atrasos(
+    admin_names: List[str], mensagem: str, agora: datetime, repo: Optional[DBConnection] = None
+) -> Tuple[int, int]:
     """
-    Função automática que verifica atrasos diariamente sem necessidade de autenticação.
-    É executada por uma task assíncrona em background uma vez por dia.
+    Cria o alerta de atrasos do dia para cada admin com um único bulk_write de upserts.
+    O índice único (usuario, tipo, dia) garante no máximo um alerta por admin por dia,
+    mesmo com execuções concorrentes. Retorna (criadas, ignoradas).
+    """
+    if not admin_names:
+        return 0, 0
+    dia = agora.strftime("%Y-%m-%d")
+    criado_em = now_str()
+    ops = [
+        UpdateOne(
+            {"usuario": admin_user, "tipo": "alerta_atrasos", "dia": dia},
+            {"$setOnInsert": {
+                "mensagem": mensagem,
+                "lida": False,
+                "data_criacao": criado_em,
+                "data_criacao_dt": agora
+            }},
+            upsert=True
+        )
+        for admin_user in admin_names
+    ]
+    try:
+        upserted = (repo or repositorio).notificacoes.bulk_write(ops, ordered=False).upserted_ids or {}
+    except errors.BulkWriteError as e:
+        # Upsert concorrente do mesmo (usuario, tipo, dia): o índice único recusa a duplicata
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+    for idx, oid in upserted.items():
+        publicar_notificacao({
+            "_id": oid, "usuario": admin_names[idx], "tipo": "alerta_atrasos", "dia": dia,
+            "mensagem": mensagem, "lida": False, "data_criacao": criado_em, "data_criacao_dt": agora
+        })
+    criadas = len(upserted)
+    return criadas, len(admin_names) - criadas
+
+def executar_verificacao_atrasos() -> Dict[str, Any]:
+    """
+    Verificação de atrasos (síncrona, usa PyMongo bloqueante).
+    Deve rodar fora do event loop; veja verificar_atrasos_automatico.
     
     Regras de negócio:
-    - Verifica protocolos com status 'Em andamento' com mais de 30 dias úteis
+    - Verifica protocolos com status 'Em andamento' com prazo (SLA da categoria) vencido
     - Cria notificações para todos os usuários administradores
     - Respeita limite de uma notificação por dia por admin (anti-spam)
     """
+    inicio = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    relatorio: Dict[str, Any] = {"status": "ok", "atrasados": 0, "notificacoes_criadas": 0, "ignoradas": 0}
     try:
         logger.info("[AutoNotif] Executando verificação automática de atrasos...")
-        agora = datetime.now(timezone.utc)
-        limiar_30_uteis = subtract_business_days(agora, 30)
-
-        filtro = {
-            "status": "Em andamento",
-            "data_criacao_dt": {"$lte": limiar_30_uteis},
-        }
+        agora = inicio
 
-        atrasados = list(protocolos_coll.find(
-            filtro,
-            {"numero": 1, "categoria": 1, "nome_requerente": 1, "data_criacao": 1}
-        ))
-        total_atrasados = len(atrasados)
+        total_atrasados, numeros = resumo_atrasados(filtro_atrasados(agora))
+        relatorio["atrasados"] = total_atrasados
+        relatorio["consulta_ms"] = round((time.perf_counter() - t0) * 1000, 1)
 
         if total_atrasados == 0:
             logger.info("[AutoNotif] Nenhum protocolo em atraso encontrado.")
-            return
+            return registrar_execucao_job("verificar_atrasos", inicio, relatorio)
 
         # Admins que recebem
-        admins = list(usuarios_coll.find({"tipo": "admin"}, {"usuario": 1}))
-        admin_names = [a.get("usuario") for a in admins if a.get("usuario")]
+        admin_names = list(repositorio.nomes_admins())
 
         if not admin_names:
             logger.warning("[AutoNotif] Nenhum administrador encontrado para notificar.")
-            return
+            return registrar_execucao_job("verificar_atrasos", inicio, relatorio)
 
         # Mensagem resumo
-        lista_nums = ", ".join([p.get("numero", "") for p in atrasados[:MAX_PROTOCOLS_IN_NOTIFICATION] if p.get("numero")])
+        lista_nums = ", ".join(numeros)
         sufixo = f" (e mais {total_atrasados - MAX_PROTOCOLS_IN_NOTIFICATION})" if total_atrasados > MAX_PROTOCOLS_IN_NOTIFICATION else ""
-        msg = f"⚠️ Verificação automática: {total_atrasados} protocolo(s) 'Em andamento' com +30 dias úteis. Exemplos: {lista_nums}{sufixo}"
+        msg = f"⚠️ Verificação automática: {total_atrasados} protocolo(s) 'Em andamento' com prazo vencido. Exemplos: {lista_nums}{sufixo}"
 
-        # Janela do "dia atual UTC"
-        inicio_dia = agora.replace(hour=0, minute=0, second=0, microsecond=0)
-        fim_dia = inicio_dia + timedelta(days=1)
+        created, skipped = notificar_admins_atrasos(admin_names, msg, agora)
 
-        created = 0
-        skipped = 0
+        relatorio["notificacoes_criadas"] = created
+        relatorio["ignoradas"] = skipped
+        logger.info(f"[AutoNotif] Concluído. Atrasados: {total_atrasados}, Notificações criadas: {created}, Ignoradas: {skipped}")
+    except Exception as e:
+        logger.error(f"[AutoNotif] Erro ao verificar atrasos: {e}")
+        relatorio["status"] = "erro"
+        relatorio["erro"] = str(e)
+    return registrar_execucao_job("verificar_atrasos", inicio, relatorio)
 
-        for admin_user in admin_names:
-            ja_hoje = notificacoes_coll.find_one({
-                "usuario": admin_user,
-                "tipo": "alerta_atrasos",
-                "data_criacao_dt": {"$gte": inicio_dia, "$lt": fim_dia}
-            })
+async def verificar_atrasos_automatico():
+    """
+    Verificação automática diária de atrasos, sem necessidade de autenticação.
+    O trabalho (PyMongo bloqueante) roda em uma thread para não travar o event loop.
+    """
+    return await asyncio.to_thread(executar_verificacao_atrasos)
 
-            if ja_hoje:
-                skipped += 1
-                continue
+def solicitar_job(job: str, motivo: str) -> None:
+    """Pede ao líder uma execução extra do job na próxima volta do loop (ex.: feriados mudaram)."""
+    execucoes_jobs_coll.insert_one({"job": job, "status": "solicitado", "inicio_dt": datetime.now(timezone.utc), "motivo": motivo})
 
-            notificacoes_coll.insert_one({
-                "usuario": admin_user,
-                "mensagem": msg,
-                "tipo": "alerta_atrasos",
-                "lida": False,
-                "data_criacao": now_str(),
-                "data_criacao_dt": agora
-            })
-            created += 1
+def job_solicitado(job: str) -> bool:
+    """Há pedido mais recente que a última execução (a execução grava o próprio início)."""
+    ultimo = execucoes_jobs_coll.find_one({"job": job}, {"status": 1}, sort=[("inicio_dt", DESCENDING)])
+    return bool(ultimo and ultimo.get("status") == "solicitado")
 
-        logger.info(f"[AutoNotif] Concluído. Atrasados: {total_atrasados}, Notificações criadas: {created}, Ignoradas: {skipped}")
-    except Exception as e:
-        logger.error(f"[AutoNotif] Erro ao verificar atrasos: {e}")
+def job_executado_hoje(job: str, agora: Optional[datetime] = None) -> bool:
+    """Indica se já existe execução bem-sucedida do job no dia UTC corrente (em qualquer processo)."""
+    agora = agora or datetime.now(timezone.utc)
+    inicio_dia = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    return execucoes_jobs_coll.find_one(
+        {"job": job, "status": "ok", "inicio_dt": {"$gte": inicio_dia}}, {"_id": 1}
+    ) is not None
 
 async def daily_notification_task():
     """
     Task assíncrona que executa a verificação de atrasos uma vez por dia.
-    Verifica a cada hora se já é um novo dia UTC e ainda não executou hoje.
-    Executa imediatamente na primeira vez se já passou do horário configurado.
+    Só o processo líder (veja BLOCO 7.5.1) executa; os demais apenas aguardam
+    para assumir caso o líder caia. O controle de "já executou hoje" fica no
+    Mongo (execucoes_jobs), então um novo líder não repete a execução do dia.
     """
-    last_run_date = None
-    
-    # Check immediately on startup if it's already past the configured hour
-    agora = datetime.now(timezone.utc)
-    hoje = agora.date()
-    if agora.hour >= NOTIFICATION_CHECK_HOUR_UTC:
-        await verificar_atrasos_automatico()
-        last_run_date = hoje
-        logger.info(f"[AutoNotif] Próxima execução agendada para {hoje + timedelta(days=1)}")
-    
     while True:
         try:
-            await asyncio.sleep(NOTIFICATION_CHECK_INTERVAL_SECONDS)  # Verifica periodicamente
+            if not sou_lider():
+                await asyncio.sleep(LIDER_HEARTBEAT_SECONDS)
+                continue
             agora = datetime.now(timezone.utc)
-            hoje = agora.date()
-            
-            # Se é um novo dia e ainda não executamos hoje
-            if last_run_date != hoje:
-                # Executar às hora configurada (ou na primeira verificação do dia após essa hora)
-                if agora.hour >= NOTIFICATION_CHECK_HOUR_UTC:
-                    await verificar_atrasos_automatico()
-                    last_run_date = hoje
-                    logger.info(f"[AutoNotif] Próxima execução agendada para {hoje + timedelta(days=1)}")
+            # Aging recalculado na primeira volta de cada dia e quando pedido (ex.: feriados mudaram)
+            if not await asyncio.to_thread(job_executado_hoje, "aging_protocolos", agora) or \
+                    await asyncio.to_thread(job_solicitado, "aging_protocolos"):
+                await asyncio.to_thread(executar_aging_protocolos)
+            # Executar na hora configurada (ou na primeira verificação do dia após essa hora)
+            if agora.hour >= NOTIFICATION_CHECK_HOUR_UTC and not await asyncio.to_thread(
+                job_executado_hoje, "verificar_atrasos", agora
+            ):
+                await verificar_atrasos_automatico()
+                logger.info(f"[AutoNotif] Próxima execução agendada para {agora.date() + timedelta(days=1)}")
+            await asyncio.sleep(NOTIFICATION_CHECK_INTERVAL_SECONDS)  # Verifica periodicamente
         except asyncio.CancelledError:
             logger.info("[AutoNotif] Task de notificações automáticas cancelada.")
             raise  # Re-raise to properly propagate cancellation
@@ -409,22 +815,630 @@ async def daily_notification_task():
             logger.error(f"[AutoNotif] Erro no loop de notificações: {e}")
             await asyncio.sleep(ERROR_RETRY_INTERVAL_SECONDS)  # Espera antes de tentar novamente
 
+# ====================== [BLOCO 7.5.1: LIDERANÇA ENTRE WORKERS (LEASE NO MONGO)] ======================
+# Cada worker uvicorn/instância roda o lifespan; para que os jobs agendados
+# rodem uma única vez, apenas o dono do lease em `lideranca` os executa.
+# O líder renova o lease a cada LIDER_HEARTBEAT_SECONDS; se o processo morrer,
+# o lease vence em LIDER_LEASE_SECONDS e outro worker assume.
+LIDER_LEASE_SECONDS = 30
+LIDER_HEARTBEAT_SECONDS = 10
+LIDER_LEASE_NOME = "agendador"
+INSTANCIA_ID = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+_lideranca_estado: Dict[str, Any] = {"lider": False, "valido_ate": 0.0}
+
+def tentar_lideranca(nome: str = LIDER_LEASE_NOME, instancia: str = INSTANCIA_ID) -> bool:
+    """Adquire ou renova o lease. Retorna True se `instancia` é o líder."""
+    agora = datetime.now(timezone.utc)
+    try:
+        doc = lideranca_coll.find_one_and_update(
+            {"_id": nome, "$or": [{"dono": instancia}, {"expira_dt": {"$lt": agora}}]},
+            {"$set": {
+                "dono": instancia,
+                "expira_dt": agora + timedelta(seconds=LIDER_LEASE_SECONDS),
+                "renovado_dt": agora,
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except errors.DuplicateKeyError:
+        # Lease existe, não venceu e pertence a outro processo
+        return False
+    return bool(doc and doc.get("dono") == instancia)
+
+def liberar_lideranca(nome: str = LIDER_LEASE_NOME, instancia: str = INSTANCIA_ID) -> None:
+    lideranca_coll.delete_one({"_id": nome, "dono": instancia})
+
+def sou_lider() -> bool:
+    # Sem renovação bem-sucedida dentro do prazo do lease o processo deixa de se considerar líder
+    return _lideranca_estado["lider"] and time.monotonic() < _lideranca_estado["valido_ate"]
+
+async def lideranca_heartbeat_task():
+    """Mantém (ou disputa) o lease de liderança enquanto a aplicação estiver no ar."""
+    try:
+        while True:
+            try:
+                inicio = time.monotonic()
+                lider = await asyncio.to_thread(tentar_lideranca)
+                if lider != _lideranca_estado["lider"]:
+                    logger.info(f"[Lider] {INSTANCIA_ID} {'assumiu' if lider else 'não é mais'} a liderança dos jobs agendados")
+                _lideranca_estado["lider"] = lider
+                _lideranca_estado["valido_ate"] = inicio + LIDER_LEASE_SECONDS if lider else 0.0
+            except Exception as e:
+                logger.error(f"[Lider] Erro ao renovar lease: {e}")
+            await asyncio.sleep(LIDER_HEARTBEAT_SECONDS)
+    except asyncio.CancelledError:
+        if _lideranca_estado["lider"]:
+            _lideranca_estado["lider"] = False
+            try:
+                await asyncio.to_thread(liberar_lideranca)
+            except Exception:
+                pass
+        raise
+
+# ====================== [BLOCO 7.5.2: PRAZOS (SLA) E AGING DOS PROTOCOLOS] ======================
+# Cada protocolo guarda `prazo_dt` = data de criação + SLA da categoria em dias
+# úteis (categorias.sla_dias_uteis, padrão PRAZO_ATRASO_DIAS_UTEIS). Ele é gravado
+# na inclusão, na edição de data/categoria e quando o SLA ou os feriados mudam;
+# "em atraso" é a consulta indexada filtro_atrasados() (prazo_dt <= agora).
+# Os protocolos "Em andamento" também guardam `dias_uteis_em_aberto` e
+# `faixa_aging`, recalculados uma vez por dia pelo líder. As faixas medem só a
+# idade (dias úteis desde a criação), iguais para todas as categorias; se está
+# atrasado depende do SLA da categoria e sai sempre de prazo_dt.
+PRAZO_ATRASO_DIAS_UTEIS = 30
+AGING_STATUS = "Em andamento"
+STATUS_ENCERRADOS = ("Concluído", "EXCLUIDO")  # Os demais têm prazo_dt mantido em dia
+FAIXAS_AGING = ((10, "0-10"), (20, "11-20"), (29, "21-29"))
+FAIXA_AGING_ULTIMA = "30+"  # Idade, não atraso: com SLA maior que 30 o protocolo ainda está no prazo
+AGING_CAMPOS = ("dias_uteis_em_aberto", "faixa_aging")
+
+@lru_cache(maxsize=8)
+def _slas_categorias(repo: DBConnection, janela: int) -> Dict[str, int]:
+    return repo.slas_categorias()
+
+def sla_categoria(categoria: Optional[str], repo: Optional[DBConnection] = None) -> int:
+    """SLA da categoria em dias úteis (cache de CATEGORIAS_CACHE_TTL_SECONDS)."""
+    slas = _slas_categorias(repo or repositorio, int(time.time() // CATEGORIAS_CACHE_TTL_SECONDS))
+    return slas.get(categoria or "", PRAZO_ATRASO_DIAS_UTEIS)
+
+def calcular_prazo(
+    data_criacao_dt: Optional[datetime], categoria: Optional[str], repo: Optional[DBConnection] = None
+) -> Optional[datetime]:
+    if not isinstance(data_criacao_dt, datetime):
+        return None
+    return add_business_days(as_utc(data_criacao_dt), sla_categoria(categoria, repo))
+
+def filtro_atrasados(agora: Optional[datetime] = None, categoria: Optional[str] = None) -> Dict[str, Any]:
+    """Protocolos em andamento com prazo vencido (índice parcial (prazo_dt, categoria))."""
+    filtro: Dict[str, Any] = {"status": AGING_STATUS, "prazo_dt": {"$lte": agora or datetime.now(timezone.utc)}}
+    if categoria:
+        filtro["categoria"] = categoria
+    return filtro
+
+def resumo_atrasados(
+    filtro: Dict[str, Any], limite: int = MAX_PROTOCOLS_IN_NOTIFICATION, repo: Optional[DBConnection] = None
+) -> Tuple[int, List[str]]:
+    """Total de atrasados + os primeiros `limite` números (só o campo numero, sem trazer todos os documentos)."""
+    repo = repo or repositorio
+    total = repo.contar_protocolos(filtro)
+    if total == 0:
+        return 0, []
+    exemplos = repo.pagina_protocolos(filtro, limite=limite, projecao={"numero": 1, "_id": 0})
+    return total, [p["numero"] for p in exemplos if p.get("numero")]
+
+def filtro_abertos(**extra: Any) -> Dict[str, Any]:
+    return {"status": {"$nin": list(STATUS_ENCERRADOS)}, **extra}
+
+def recalcular_prazos(filtro: Dict[str, Any]) -> int:
+    """Regrava prazo_dt dos protocolos do filtro: um update_many por (categoria, data de criação)."""
+    atualizados = 0
+    for categoria in protocolos_coll.distinct("categoria", filtro):
+        sla = sla_categoria(categoria)
+        filtro_cat = {**filtro, "categoria": categoria}
+        for d in protocolos_coll.distinct("data_criacao_dt", filtro_cat):
+            if isinstance(d, datetime):
+                atualizados += protocolos_coll.update_many(
+                    {**filtro_cat, "data_criacao_dt": d},
+                    {"$set": {"prazo_dt": add_business_days(as_utc(d), sla)}}
+                ).modified_count
+    return atualizados
+
+def faixa_aging(dias: int) -> str:
+    for limite, nome in FAIXAS_AGING:
+        if dias <= limite:
+            return nome
+    return FAIXA_AGING_ULTIMA
+
+def campos_aging(data_criacao_dt: Optional[datetime], status: str, agora: Optional[datetime] = None) -> Dict[str, Any]:
+    """Campos de aging para $set; vazio quando o protocolo não está em andamento (devem ser removidos)."""
+    if (status or "").strip() != AGING_STATUS or not isinstance(data_criacao_dt, datetime):
+        return {}
+    agora = agora or datetime.now(timezone.utc)
+    dias = contar_dias_uteis(as_utc(data_criacao_dt), agora)
+    return {
+        "dias_uteis_em_aberto": dias,
+        "faixa_aging": faixa_aging(dias)
+    }
+
+def atualizar_aging_protocolos(agora: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Recalcula o aging de todos os protocolos em andamento com poucas escritas:
+    o nº de dias úteis depende só da data de criação, então as datas distintas
+    são agrupadas por nº de dias e cada grupo (um intervalo contíguo de datas)
+    vira um único update_many, que só toca documentos cujo valor mudou.
+    """
+    agora = agora or datetime.now(timezone.utc)
+    sem_prazo = recalcular_prazos(filtro_abertos(prazo_dt={"$exists": False}))
+    limpos = protocolos_coll.update_many(
+        {"faixa_aging": {"$exists": True}, "status": {"$ne": AGING_STATUS}},
+        {"$unset": {c: "" for c in AGING_CAMPOS}}
+    ).modified_count
+    por_dias: Dict[int, List[datetime]] = {}
+    for d in protocolos_coll.distinct("data_criacao_dt", {"status": AGING_STATUS}):
+        if isinstance(d, datetime):
+            por_dias.setdefault(contar_dias_uteis(as_utc(d), agora), []).append(d)
+    atualizados = 0
+    for dias, datas in por_dias.items():
+        atualizados += protocolos_coll.update_many(
+            {
+                "status": AGING_STATUS,
+                "data_criacao_dt": {"$gte": min(datas), "$lte": max(datas)},
+                "dias_uteis_em_aberto": {"$ne": dias}
+            },
+            {"$set": {"dias_uteis_em_aberto": dias, "faixa_aging": faixa_aging(dias)}}
+        ).modified_count
+    obter_estatisticas_cache.cache_clear()
+    return {
+        "datas_distintas": sum(len(v) for v in por_dias.values()),
+        "atualizados": atualizados,
+        "limpos": limpos,
+        "prazos_calculados": sem_prazo
+    }
+
+def executar_aging_protocolos() -> Dict[str, Any]:
+    inicio = datetime.now(timezone.utc)
+    relatorio: Dict[str, Any] = {"status": "ok"}
+    try:
+        relatorio.update(atualizar_aging_protocolos(inicio))
+    except Exception as e:
+        logger.error(f"[Aging] Erro ao atualizar aging dos protocolos: {e}")
+        relatorio["status"] = "erro"
+        relatorio["erro"] = str(e)
+    return registrar_execucao_job("aging_protocolos", inicio, relatorio)
+
+# ====================== [BLOCO 7.6: REQUERENTES E FILA DE SINCRONIZAÇÃO POR CPF] ======================
+# A coleção `requerentes` (chave: CPF) é a fonte da verdade de nome e WhatsApp.
+# Os protocolos referenciam o requerente pelo campo `cpf` e guardam apenas uma
+# cópia de leitura de nome/WhatsApp, usada pelas listagens. Essa cópia é
+# atualizada em background: cada alteração marca o CPF em `requerentes_sync`
+# (um documento por CPF, edições seguidas são coalescidas) e o worker aplica
+# os dados atuais do requerente a todos os protocolos daquele CPF.
+REQUERENTE_SYNC_POLL_SECONDS = 2             # Intervalo entre varreduras quando a fila está vazia
+REQUERENTE_SYNC_LOTE = 50                    # Máximo de CPFs processados por varredura
+REQUERENTE_SYNC_CLAIM_TIMEOUT_SECONDS = 300  # Job "processando" há mais tempo que isso pode ser retomado
+
+AUTOCOMPLETE_CACHE_TTL_SECONDS = 60  # Validade das respostas em cache (cobre edições feitas em outros workers)
+AUTOCOMPLETE_LIMITE_MAX = 20
+
+def normalizar_nome_busca(nome: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados: chave de busca por prefixo."""
+    sem_acento = unicodedata.normalize("NFKD", nome or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.lower().split())
+
+def obter_requerente(cpf: str) -> Optional[Dict[str, Any]]:
+    if not cpf:
+        return None
+    return requerentes_coll.find_one({"cpf": cpf}, {"_id": 0, "cpf": 1, "nome_requerente": 1, "whatsapp": 1})
+
+def salvar_requerente(
+    cpf: str, nome_requerente: str = "", whatsapp: str = "", novo_protocolo: bool = False,
+    repo: Optional[DBConnection] = None
+) -> bool:
+    """
+    Grava nome/WhatsApp no cadastro do requerente (apenas campos preenchidos).
+    `novo_protocolo` incrementa o contador usado para ordenar o autocompletar.
+    Retorna True quando algo mudou e a cópia nos protocolos precisa ser sincronizada.
+    """
+    dados: Dict[str, Any] = {}
+    if nome_requerente:
+        dados["nome_requerente"] = nome_requerente
+        dados["nome_busca"] = normalizar_nome_busca(nome_requerente)
+    if whatsapp:
+        dados["whatsapp"] = whatsapp
+    if not cpf or not (dados or novo_protocolo):
+        return False
+    agora = datetime.now(timezone.utc)
+    update: Dict[str, Any] = {"$set": {**dados, "atualizado_dt": agora}, "$setOnInsert": {"criado_dt": agora}}
+    if novo_protocolo:
+        update["$inc"] = {"total_protocolos": 1}
+    repo = repo or repositorio
+    antes = repo.requerentes.find_one_and_update(
+        {"cpf": cpf}, update, upsert=True,
+        projection={"nome_requerente": 1, "whatsapp": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    mudou = antes is None or any(
+        antes.get(k) != v for k, v in dados.items() if k in ("nome_requerente", "whatsapp")
+    )
+    if not mudou:
+        return False
+    _autocomplete_cache.cache_clear()
+    enfileirar_sync_requerente(cpf, repo)
+    return True
+
+def enfileirar_sync_requerente(cpf: str, repo: Optional[DBConnection] = None) -> bool:
+    """
+    Agenda a atualização da cópia de nome/WhatsApp nos protocolos do CPF.
+    Se já existir um job para o CPF apenas a versão é incrementada, de modo que
+    o worker reprocessa o CPF uma única vez com os dados mais recentes.
+    """
+    if not cpf:
+        return False
+    agora = datetime.now(timezone.utc)
+    (repo or repositorio).requerentes_sync.update_one(
+        {"cpf": cpf},
+        {
+            "$set": {"atualizado_dt": agora},
+            "$inc": {"versao": 1},
+            "$setOnInsert": {"status": "pendente", "enfileirado_dt": agora},
+        },
+        upsert=True
+    )
+    return True
+
+def migrar_requerentes(substituir: bool = False) -> int:
+    """
+    Popula `requerentes` a partir dos protocolos existentes (dados do protocolo
+    mais recente de cada CPF). Com `substituir=True` o cadastro é recriado do zero,
+    como após restaurar um backup.
+    """
+    if substituir:
+        requerentes_coll.delete_many({})
+    pipeline = [
+        {"$match": {"cpf": {"$nin": ["", None]}}},
+        {"$sort": {"data_criacao_dt": -1}},
+        {"$group": {
+            "_id": "$cpf",
+            "nome_requerente": {"$first": "$nome_requerente"},
+            "whatsapp": {"$first": "$whatsapp"},
+            "total_protocolos": {"$sum": 1},
+        }},
+    ]
+    agora = datetime.now(timezone.utc)
+    criados = 0
+    for item in protocolos_coll.aggregate(pipeline, allowDiskUse=True):
+        res = requerentes_coll.update_one(
+            {"cpf": item["_id"]},
+            {"$setOnInsert": {
+                "nome_requerente": item.get("nome_requerente") or "",
+                "nome_busca": normalizar_nome_busca(item.get("nome_requerente") or ""),
+                "whatsapp": item.get("whatsapp") or "",
+                "total_protocolos": item.get("total_protocolos", 0),
+                "criado_dt": agora,
+                "atualizado_dt": agora,
+            }},
+            upsert=True
+        )
+        if res.upserted_id is not None:
+            criados += 1
+    _autocomplete_cache.cache_clear()
+    return criados
+
+@lru_cache(maxsize=1024)
+def _autocomplete_cache(prefixo: str, limite: int, janela: int) -> Tuple[Dict[str, Any], ...]:
+    # `janela` muda a cada AUTOCOMPLETE_CACHE_TTL_SECONDS e faz as entradas expirarem sozinhas
+    if prefixo.isdigit():
+        filtro = {"cpf": {"$regex": f"^{prefixo}"}}
+        ordem = [("cpf", ASCENDING)]
+    else:
+        filtro = {"nome_busca": {"$regex": f"^{re.escape(prefixo)}"}}
+        # Mesma ordem do índice (nome_busca, total_protocolos -1): o limite para na
+        # N-ésima chave, sem ordenação em memória; uso só desempata nomes iguais
+        ordem = [("nome_busca", ASCENDING), ("total_protocolos", DESCENDING)]
+    cursor = requerentes_coll.find(
+        filtro, {"_id": 0, "cpf": 1, "nome_requerente": 1, "whatsapp": 1}
+    ).sort(ordem).limit(limite)
+    return tuple(cursor)
+
+def autocompletar_requerentes(termo: str, limite: int = 10) -> List[Dict[str, Any]]:
+    """Primeiros N requerentes (ordem do índice) cujo CPF ou nome começa com `termo`."""
+    termo = (termo or "").strip()
+    digitos = apenas_digitos(termo)
+    if digitos and len(digitos) == len(re.sub(r"[\s.\-/]", "", termo)):
+        prefixo = digitos
+        if len(prefixo) < 3:
+            return []
+    else:
+        prefixo = normalizar_nome_busca(termo)
+        if len(prefixo) < 2:
+            return []
+    limite = max(1, min(int(limite or 10), AUTOCOMPLETE_LIMITE_MAX))
+    janela = int(time.time() // AUTOCOMPLETE_CACHE_TTL_SECONDS)
+    return [dict(r) for r in _autocomplete_cache(prefixo, limite, janela)]
+
+def _reservar_job_requerente() -> Optional[Dict[str, Any]]:
+    agora = datetime.now(timezone.utc)
+    expirado = agora - timedelta(seconds=REQUERENTE_SYNC_CLAIM_TIMEOUT_SECONDS)
+    return requerentes_sync_coll.find_one_and_update(
+        {"$or": [
+            {"status": "pendente"},
+            {"status": "processando", "reservado_dt": {"$lt": expirado}},
+        ]},
+        {"$set": {"status": "processando", "reservado_dt": agora}},
+        sort=[("enfileirado_dt", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def processar_fila_requerentes(limite: int = REQUERENTE_SYNC_LOTE) -> int:
+    """
+    Processa até `limite` CPFs pendentes (síncrono, roda fora do event loop).
+    Retorna quantos jobs foram aplicados.
+    """
+    processados = 0
+    while processados < limite:
+        job = _reservar_job_requerente()
+        if not job:
+            break
+        versao = job.get("versao", 0)
+        requerente = obter_requerente(job["cpf"]) or {}
+        dados = {k: requerente[k] for k in ("nome_requerente", "whatsapp") if requerente.get(k)}
+        if dados:
+            divergentes = [{k: {"$ne": v}} for k, v in dados.items()]
+            res = protocolos_coll.update_many({"cpf": job["cpf"], "$or": divergentes}, {"$set": dados})
+            logger.info(f"[SyncRequerente] CPF {job['cpf']}: {res.modified_count} protocolo(s) atualizados")
+        # Só remove o job se ninguém o alterou durante o processamento;
+        # caso contrário volta para a fila com os dados mais recentes.
+        removido = requerentes_sync_coll.delete_one({"_id": job["_id"], "versao": versao})
+        if not removido.deleted_count:
+            requerentes_sync_coll.update_one({"_id": job["_id"]}, {"$set": {"status": "pendente"}})
+        processados += 1
+    return processados
+
+async def requerente_sync_worker():
+    """Task em background que esvazia a fila de sincronização de requerentes."""
+    while True:
+        try:
+            processados = await asyncio.to_thread(processar_fila_requerentes)
+            if processados < REQUERENTE_SYNC_LOTE:
+                await asyncio.sleep(REQUERENTE_SYNC_POLL_SECONDS)
+        except asyncio.CancelledError:
+            logger.info("[SyncRequerente] Worker cancelado.")
+            raise
+        except Exception as e:
+            logger.error(f"[SyncRequerente] Erro no worker: {e}")
+            await asyncio.sleep(ERROR_RETRY_INTERVAL_SECONDS)
+
+# ====================== [BLOCO 7.7: NOTIFICAÇÕES EM TEMPO REAL (SSE)] ======================
+# Conexões SSE (/api/notificacoes/stream) assinam o broadcaster do processo.
+# Inserções feitas neste processo são publicadas na hora; as feitas por outros
+# workers chegam pelo relay, que usa change stream quando o Mongo é replica set
+# e, caso contrário, consulta periodicamente as notificações recentes.
+SSE_KEEPALIVE_SECONDS = 20           # Comentário enviado para manter proxies/conexões abertas
+SSE_FILA_MAX = 100                   # Notificações acumuladas por conexão lenta antes de descartar
+NOTIF_RELAY_POLL_SECONDS = 3         # Intervalo do relay por consulta (sem change streams)
+NOTIF_RELAY_JANELA_SECONDS = 10      # Sobreposição da consulta para não perder inserções concorrentes
+
+class NotificacoesBroadcaster:
+    """Distribui notificações novas às conexões SSE abertas neste processo."""
+
+    def __init__(self, max_recentes: int = 2000):
+        self._assinantes: Dict[str, set] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._recentes: "OrderedDict[str, None]" = OrderedDict()
+        self._max_recentes = max_recentes
+        self._lock = threading.Lock()
+
+    def vincular_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    @property
+    def total_assinantes(self) -> int:
+        return sum(len(filas) for filas in self._assinantes.values())
+
+    def assinar(self, usuario: str) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        fila: asyncio.Queue = asyncio.Queue(maxsize=SSE_FILA_MAX)
+        self._assinantes.setdefault(usuario, set()).add(fila)
+        return fila
+
+    def cancelar(self, usuario: str, fila: asyncio.Queue) -> None:
+        filas = self._assinantes.get(usuario)
+        if filas:
+            filas.discard(fila)
+            if not filas:
+                self._assinantes.pop(usuario, None)
+
+    def publicar(self, notificacao: Dict[str, Any]) -> None:
+        """Pode ser chamado de qualquer thread; ignora notificações já publicadas."""
+        nid = str(notificacao.get("_id") or notificacao.get("id") or "")
+        with self._lock:
+            if nid:
+                if nid in self._recentes:
+                    return
+                self._recentes[nid] = None
+                while len(self._recentes) > self._max_recentes:
+                    self._recentes.popitem(last=False)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._entregar, _serialize_doc(notificacao))
+
+    def _entregar(self, notificacao: Dict[str, Any]) -> None:
+        for fila in list(self._assinantes.get(notificacao.get("usuario"), ())):
+            try:
+                fila.put_nowait(notificacao)
+            except asyncio.QueueFull:
+                logger.warning(f"[SSE] Fila cheia para {notificacao.get('usuario')}, notificação descartada")
+
+broadcaster_notificacoes = NotificacoesBroadcaster()
+
+def publicar_notificacao(doc: Dict[str, Any]) -> None:
+    try:
+        broadcaster_notificacoes.publicar(doc)
+    except Exception as e:
+        logger.warning(f"[SSE] Falha ao publicar notificação: {e}")
+
+def _relay_change_stream(parar: threading.Event) -> None:
+    with notificacoes_coll.watch([{"$match": {"operationType": "insert"}}], max_await_time_ms=1000) as stream:
+        logger.info("[SSE] Relay de notificações usando change stream")
+        while not parar.is_set():
+            mudanca = stream.try_next()
+            if mudanca and mudanca.get("fullDocument"):
+                publicar_notificacao(mudanca["fullDocument"])
+
+def _relay_consulta(desde: datetime) -> datetime:
+    """Publica notificações inseridas desde `desde` (menos a janela de sobreposição)."""
+    agora = datetime.now(timezone.utc)
+    if broadcaster_notificacoes.total_assinantes:
+        limite_id = ObjectId.from_datetime(desde - timedelta(seconds=NOTIF_RELAY_JANELA_SECONDS))
+        for doc in notificacoes_coll.find({"_id": {"$gt": limite_id}}).sort("_id", ASCENDING):
+            publicar_notificacao(doc)
+    return agora
+
+async def notificacoes_relay_task():
+    """Encaminha ao broadcaster local notificações inseridas por outros processos."""
+    parar = threading.Event()
+    try:
+        try:
+            await asyncio.to_thread(_relay_change_stream, parar)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"[SSE] Change streams indisponíveis ({e}); relay por consulta periódica")
+        desde = datetime.now(timezone.utc)
+        while True:
+            try:
+                desde = await asyncio.to_thread(_relay_consulta, desde)
+            except Exception as e:
+                logger.error(f"[SSE] Erro no relay de notificações: {e}")
+            await asyncio.sleep(NOTIF_RELAY_POLL_SECONDS)
+    finally:
+        parar.set()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação."""
     # Startup
     logger.info("[App] Iniciando sistema de notificações automáticas...")
-    task = asyncio.create_task(daily_notification_task())
+    broadcaster_notificacoes.vincular_loop(asyncio.get_running_loop())
+    tasks = [
+        asyncio.create_task(lideranca_heartbeat_task()),
+        asyncio.create_task(inicializacao_esquema_task()),
+        asyncio.create_task(daily_notification_task()),
+        asyncio.create_task(requerente_sync_worker()),
+        asyncio.create_task(notificacoes_relay_task()),
+        asyncio.create_task(filtros_contagem_task()),
+    ]
     
     yield
     
     # Shutdown
-    logger.info("[App] Encerrando sistema de notificações automáticas...")
-    task.cancel()
+    logger.info("[App] Encerrando tarefas em background...")
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+# ====================== [BLOCO 7.8: FILTROS SALVOS - VALIDAÇÃO E CONTAGEM PERIÓDICA] ======================
+# O documento em `filtros` guarda o que a tela enviou (`filtros`, reaplicado no
+# formulário) e a forma canônica validada pelo compilador (`consulta`). O total de
+# protocolos de cada filtro (`total`) é recontado em background pelo líder, os mais
+# antigos primeiro, para a listagem mostrar "Meus filtros (123)" sem executar nada.
+# Só entram na recontagem filtros usados há pouco (`usado_dt`: salvo ou executado);
+# os demais mantêm a última contagem até serem executados de novo. A listagem só lê.
+FILTROS_CONTAGEM_INTERVALO_SECONDS = 900   # Idade máxima de uma contagem antes de ser refeita
+FILTROS_CONTAGEM_LOTE = 200                # Filtros recontados por rodada
+FILTROS_CONTAGEM_PAUSA_SECONDS = 30        # Entre lotes cheios (fila atrasada), sem rodar lotes colados
+FILTROS_USO_RECENTE_DAYS = 7               # Filtro sem uso há mais tempo não é recontado
+FILTRO_SALVO_ALIASES = {"palavra": "q"}    # Nome do campo na tela -> campo do FiltroProtocolos
+# Campos só de apresentação (ordem, paginação, atalho de período), ignorados na consulta
+FILTRO_SALVO_CAMPOS_TELA = {"sort_by", "sort_dir", "per_page", "periodo_relativo"}
+
+def spec_filtro_salvo(filtros: Dict[str, Any]) -> FiltroProtocolos:
+    """Converte os filtros salvos pela tela em FiltroProtocolos (FiltroInvalido se não reconhecidos)."""
+    if not isinstance(filtros, dict):
+        raise FiltroInvalido("Filtros devem ser um objeto.")
+    dados = {
+        FILTRO_SALVO_ALIASES.get(k, k): v
+        for k, v in filtros.items()
+        if k not in FILTRO_SALVO_CAMPOS_TELA and v not in (None, "", [])
+    }
+    return FiltroProtocolos.de_dict(dados)
+
+def contar_filtro_salvo(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de contagem ($set) de um filtro salvo; filtro que deixou de ser válido grava o erro."""
+    agora = datetime.now(timezone.utc)
     try:
-        await task
-    except asyncio.CancelledError:
-        pass
+        # Filtros salvos antes da validação não têm `consulta`; derivada dos campos da tela
+        if "consulta" in doc:
+            spec = FiltroProtocolos.de_dict(doc["consulta"] or {})
+        else:
+            spec = spec_filtro_salvo(doc.get("filtros") or {})
+        consulta = compilar_consulta(spec, ALLOWED_STATUS, get_allowed_categorias())
+    except FiltroInvalido as e:
+        return {"total": None, "total_erro": str(e), "total_atualizado_dt": agora}
+    return {"total": contar_protocolos(consulta), "total_erro": "", "total_atualizado_dt": agora}
+
+def atualizar_contagens_filtros(agora: Optional[datetime] = None, lote: int = FILTROS_CONTAGEM_LOTE) -> Dict[str, Any]:
+    """Reconta os filtros usados há pouco sem contagem ou com contagem mais velha que o intervalo."""
+    agora = agora or datetime.now(timezone.utc)
+    limite = agora - timedelta(seconds=FILTROS_CONTAGEM_INTERVALO_SECONDS)
+    pendentes = filtros_coll.find(
+        {
+            "usado_dt": {"$gte": agora - timedelta(days=FILTROS_USO_RECENTE_DAYS)},
+            "$or": [{"total_atualizado_dt": {"$exists": False}}, {"total_atualizado_dt": {"$lte": limite}}],
+        },
+        {"filtros": 1, "consulta": 1}
+    ).sort("total_atualizado_dt", ASCENDING).limit(lote)
+    ops = []
+    # Custo da rodada: tempo total das contagens e o filtro mais caro
+    custo_ms, mais_lento_ms, mais_lento_id = 0.0, 0.0, None
+    for doc in pendentes:
+        t0 = time.perf_counter()
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": contar_filtro_salvo(doc)}))
+        ms = (time.perf_counter() - t0) * 1000
+        custo_ms += ms
+        if ms > mais_lento_ms:
+            mais_lento_ms, mais_lento_id = ms, str(doc["_id"])
+    if ops:
+        filtros_coll.bulk_write(ops, ordered=False)
+    return {
+        "recontados": len(ops),
+        "contagem_ms": round(custo_ms, 1),
+        "mais_lento_ms": round(mais_lento_ms, 1),
+        "mais_lento_id": mais_lento_id,
+    }
+
+def executar_contagem_filtros() -> Dict[str, Any]:
+    inicio = datetime.now(timezone.utc)
+    relatorio: Dict[str, Any] = {"status": "ok"}
+    try:
+        relatorio.update(atualizar_contagens_filtros(inicio))
+    except Exception as e:
+        logger.error(f"[Filtros] Erro ao recontar filtros salvos: {e}")
+        relatorio["status"] = "erro"
+        relatorio["erro"] = str(e)
+    return registrar_execucao_job("contagem_filtros", inicio, relatorio)
+
+async def filtros_contagem_task():
+    """Recontagem periódica dos filtros salvos; só o líder executa."""
+    while True:
+        try:
+            if sou_lider():
+                relatorio = await asyncio.to_thread(executar_contagem_filtros)
+                # Lote cheio: ainda há filtros vencidos, segue sem esperar o intervalo todo
+                if relatorio.get("recontados", 0) >= FILTROS_CONTAGEM_LOTE:
+                    await asyncio.sleep(FILTROS_CONTAGEM_PAUSA_SECONDS)
+                    continue
+            await asyncio.sleep(FILTROS_CONTAGEM_INTERVALO_SECONDS if sou_lider() else LIDER_HEARTBEAT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Filtros] Erro no loop de contagem: {e}")
+            await asyncio.sleep(ERROR_RETRY_INTERVAL_SECONDS)
 
 # ====================== [BLOCO 8: APP FASTAPI E MIDDLEWARES] ======================
 app = FastAPI(
@@ -467,6 +1481,93 @@ def get_favicon():
         return FileResponse(favicon_svg, media_type="image/svg+xml")
     raise HTTPException(status_code=404, detail="Favicon not found")
 
+# ====================== [BLOCO 8.1: IDEMPOTÊNCIA DE INCLUSÃO/EDIÇÃO DE PROTOCOLOS] ======================
+# Reenvios do navegador com o mesmo cabeçalho Idempotency-Key recebem a resposta
+# original sem reexecutar validação, checagem de número duplicado nem a
+# sincronização do requerente. Registrado antes dos demais middlewares para
+# ficar mais próximo das rotas (os cabeçalhos de segurança continuam aplicados).
+IDEMPOTENCIA_PROCESSANDO_TIMEOUT_SECONDS = 120  # Reserva "processando" mais antiga que isso é considerada abandonada
+IDEMPOTENCIA_ROTAS = {
+    "POST": re.compile(r"^/api/protocolo$"),
+    "PUT": re.compile(r"^/api/protocolo/[0-9a-fA-F]{24}$"),
+}
+
+def _reservar_idempotencia(chave_id: str, corpo_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Tenta reservar a chave. Retorna None quando a requisição deve ser executada,
+    ou o registro existente (concluído ou ainda em processamento).
+    """
+    agora = datetime.now(timezone.utc)
+    try:
+        idempotencia_coll.insert_one({
+            "_id": chave_id, "estado": "processando", "corpo_hash": corpo_hash, "criado_dt": agora
+        })
+        return None
+    except errors.DuplicateKeyError:
+        pass
+    existente = idempotencia_coll.find_one({"_id": chave_id})
+    if not existente:
+        return _reservar_idempotencia(chave_id, corpo_hash)
+    if existente.get("estado") == "processando":
+        abandonado = agora - timedelta(seconds=IDEMPOTENCIA_PROCESSANDO_TIMEOUT_SECONDS)
+        res = idempotencia_coll.update_one(
+            {"_id": chave_id, "estado": "processando", "criado_dt": {"$lt": abandonado}},
+            {"$set": {"criado_dt": agora, "corpo_hash": corpo_hash}}
+        )
+        if res.modified_count:
+            return None
+    return existente
+
+@app.middleware("http")
+async def idempotencia_protocolos(request: Request, call_next):
+    chave = (request.headers.get("Idempotency-Key") or "").strip()
+    rota = IDEMPOTENCIA_ROTAS.get(request.method)
+    if not chave or not rota or not rota.match(request.url.path):
+        return await call_next(request)
+    if len(chave) > 200:
+        return JSONResponse(status_code=400, content={"detail": "Idempotency-Key muito longa."})
+
+    corpo = await request.body()
+    corpo_hash = hashlib.sha256(corpo).hexdigest()
+    chave_id = f"{request.method} {request.url.path} {chave}"
+    existente = await asyncio.to_thread(_reservar_idempotencia, chave_id, corpo_hash)
+    if existente:
+        if existente.get("corpo_hash") != corpo_hash:
+            return JSONResponse(status_code=422, content={"detail": "Idempotency-Key já utilizada com outro conteúdo."})
+        if existente.get("estado") != "concluido":
+            return JSONResponse(status_code=409, content={"detail": "Requisição com esta Idempotency-Key ainda em processamento."})
+        return Response(
+            content=existente.get("corpo", b""),
+            status_code=existente.get("status_code", 200),
+            media_type=existente.get("media_type") or "application/json",
+            headers={"Idempotent-Replay": "true"}
+        )
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        await asyncio.to_thread(idempotencia_coll.delete_one, {"_id": chave_id})
+        raise
+    if response.status_code >= 500:
+        # Falha do servidor: libera a chave para que o reenvio seja executado de novo
+        await asyncio.to_thread(idempotencia_coll.delete_one, {"_id": chave_id})
+        return response
+
+    conteudo = b"".join([chunk async for chunk in response.body_iterator])
+    media_type = response.headers.get("content-type", "application/json")
+    await asyncio.to_thread(
+        idempotencia_coll.update_one,
+        {"_id": chave_id},
+        {"$set": {
+            "estado": "concluido",
+            "status_code": response.status_code,
+            "corpo": conteudo,
+            "media_type": media_type,
+        }}
+    )
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return Response(content=conteudo, status_code=response.status_code, headers=headers, media_type=media_type)
+
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     response = await call_next(request)
@@ -645,7 +1746,6 @@ def login(usuario: str = Body(...), senha: str = Body(...), request: Request = N
     raise HTTPException(status_code=401, detail="Credenciais inválidas.")
 
 # ====================== [BLOCO 11: API DE PROTOCOLOS - CONSTANTES E HELPERS] ======================
-ALLOWED_STATUS = {"Pendente", "Em andamento", "Concluído", "Exigência", "EXCLUIDO"}
 
 def sanitize_pagination(page: Optional[int], per_page: Optional[int]) -> Tuple[int, int]:
     p = max(1, int(page or 1))
@@ -682,6 +1782,34 @@ def sanitize_sort(sort_by: Optional[str], sort_dir: Optional[str]) -> Tuple[str,
     return (normalized_sb[0] if normalized_sb else "data_criacao"), direction, field
 
 
+# Busca de protocolos: filtros e escolha de índice ficam em consulta_protocolos.py.
+# O hint só é aplicado se o índice existir (ele pode estar em construção ou ter
+# falhado); senão o planner do Mongo escolhe sozinho. Os índices são os do
+# repositório que executa a consulta (o injetado pode ser outro banco).
+INDICES_CACHE_TTL_SECONDS = 60
+
+@lru_cache(maxsize=8)
+def _indices_protocolos(repo: DBConnection, janela: int) -> frozenset:
+    try:
+        return frozenset(tuple((k, int(d)) for k, d in info["key"]) for info in repo.protocolos.index_information().values())
+    except Exception as e:
+        logger.warning(f"[MongoDB] Não foi possível listar os índices de protocolos: {e}")
+        return frozenset()
+
+def hint_protocolos(consulta: ConsultaCompilada, repo: Optional[DBConnection] = None) -> Optional[List[Tuple[str, int]]]:
+    janela = int(time.time() // INDICES_CACHE_TTL_SECONDS)
+    if consulta.hint and consulta.hint in _indices_protocolos(repo or repositorio, janela):
+        return consulta.hint_lista
+    return None
+
+def compilar_filtro_protocolos(
+    spec: FiltroProtocolos, campo_ordem: str = "data_criacao_dt", repo: Optional[DBConnection] = None
+) -> ConsultaCompilada:
+    try:
+        return compilar_consulta(spec, ALLOWED_STATUS, get_allowed_categorias(repo), campo_ordem)
+    except FiltroInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 def build_change_list(original: Dict[str, Any], atualizacao: Dict[str, Any], unset_fields: Dict[str, Any]) -> List[Dict[str, Any]]:
     track_fields = [
         "nome_requerente","cpf","titulo","nome_parte_ato","outras_infos","data_criacao","status","categoria","observacoes",
@@ -704,35 +1832,18 @@ def build_change_list(original: Dict[str, Any], atualizacao: Dict[str, Any], uns
 
 # ====================== [BLOCO 12: API DE PROTOCOLOS - CRUD] ======================
 @app.post("/api/protocolo")
-def incluir_protocolo(protocolo: ProtocoloModel):
-    numero = apenas_digitos(protocolo.numero)
-    cpf_raw = protocolo.cpf.strip()
-    status = protocolo.status.strip()
-    categoria = protocolo.categoria.strip()
-    if categoria == "IDT":
-        categoria = "RTD"
-    cpf = apenas_digitos(cpf_raw)
+def incluir_protocolo(protocolo: ProtocoloModel, repo: DBConnection = Depends(obter_repositorio)):
+    # CPF, status, categoria e data já chegam normalizados e validados pelo ProtocoloModel
+    numero = protocolo.numero
+    cpf = protocolo.cpf
+    status = protocolo.status
+    categoria = protocolo.categoria
+    dt_criacao = protocolo.data_criacao_dt
     if len(numero) != 5:
         raise HTTPException(status_code=400, detail="Número do protocolo deve conter exatamente 5 dígitos.")
-    
-    # Only validate CPF if sem_cpf is False
-    if not protocolo.sem_cpf:
-        if not validar_cpf(cpf):
-            raise HTTPException(status_code=400, detail="CPF inválido. Informe um CPF válido.")
-    else:
-        # If sem_cpf is True, set CPF to empty string
-        cpf = ""
-    
-    if status not in ALLOWED_STATUS:
-        raise HTTPException(status_code=400, detail="Status inválido.")
-    allowed_cats = get_allowed_categorias()
-    if categoria not in allowed_cats:
+    if categoria not in get_allowed_categorias(repo):  # O modelo confere no repositório do processo
         raise HTTPException(status_code=400, detail="Categoria inválida.")
-    try:
-        dt_criacao = datetime.strptime(protocolo.data_criacao, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Data de criação inválida. Use YYYY-MM-DD.")
-    if protocolos_coll.find_one({"numero": numero}):
+    if repo.protocolo_por_numero(numero, {"_id": 1}):
         raise HTTPException(status_code=400, detail="Já consta um protocolo com a numeração informada.")
     novo = protocolo.model_dump()
     if "observacoes" in novo and novo["observacoes"]:
@@ -744,6 +1855,8 @@ def incluir_protocolo(protocolo: ProtocoloModel):
     novo["ultima_alteracao_nome"] = protocolo.ultima_alteracao_nome or protocolo.responsavel or ""
     novo["ultima_alteracao_data"] = now_str()
     novo["data_criacao_dt"] = dt_criacao
+    novo["prazo_dt"] = calcular_prazo(dt_criacao, categoria, repo)
+    novo.update(campos_aging(dt_criacao, status))
     novo["retirado_por"] = novo.get("retirado_por", "") or ""
     novo["data_retirada"] = novo.get("data_retirada", "") or ""
     novo.pop("data_retirada_dt", None)
@@ -768,25 +1881,12 @@ def incluir_protocolo(protocolo: ProtocoloModel):
         "changes": []
     }]
     try:
-        res = protocolos_coll.insert_one(novo)
-        protocolo_id = str(res.inserted_id)
+        protocolo_id = repo.salvar_protocolo(novo)
         logger.info(f"Protocolo {numero} criado")
         
-        # Update nome_requerente and whatsapp in all other protocols with the same CPF
-        # Only sync if CPF is provided (not empty)
-        if cpf:
-            update_data = {}
-            if novo.get("nome_requerente"):
-                update_data["nome_requerente"] = novo["nome_requerente"]
-            if novo.get("whatsapp"):
-                update_data["whatsapp"] = novo["whatsapp"]
-            
-            if update_data:
-                protocolos_coll.update_many(
-                    {"cpf": cpf, "numero": {"$ne": numero}},
-                    {"$set": update_data}
-                )
-                logger.info(f"Dados do requerente atualizados para CPF {cpf}")
+        # Atualiza o cadastro do requerente; a cópia nos demais protocolos do CPF é sincronizada em background
+        if cpf and salvar_requerente(cpf, novo.get("nome_requerente", ""), novo.get("whatsapp", ""), novo_protocolo=True, repo=repo):
+            logger.info(f"Requerente atualizado para CPF {cpf}")
         
         return {"id": protocolo_id}
     except errors.DuplicateKeyError:
@@ -805,100 +1905,37 @@ def buscar_protocolos(
     per_page: Optional[int] = Query(default=50, ge=1, le=100),
     sort_by: Optional[str] = Query(default="data_criacao"),
     sort_dir: Optional[str] = Query(default="desc"),
-    use_aggregation: Optional[str] = Query(default=None)
+    use_aggregation: Optional[str] = Query(default=None),
+    repo: DBConnection = Depends(obter_repositorio)
 ):
-    filtros: List[Dict[str, Any]] = []
-    if numero:
-        num = apenas_digitos(numero)
-        if num:
-            filtros.append({"numero": num})
-    if cpf:
-        cpf_puro = apenas_digitos(cpf)
-        if cpf_puro:
-            filtros.append({"cpf": cpf_puro})
-    if status:
-        status_list = [s for s in status if s]
-        if status_list:
-            invalido = [s for s in status_list if s not in ALLOWED_STATUS]
-            if invalido:
-                raise HTTPException(status_code=400, detail=f"Status inválido: {invalido}")
-            if len(status_list) == 1:
-                filtros.append({"status": status_list[0]})
-            else:
-                filtros.append({"status": {"$in": status_list}})
-    if categoria:
-        cat_list = []
-        for c in categoria:
-            if c is None:
-                continue
-            cc = str(c).strip()
-            if not cc:
-                continue
-            if cc == "IDT":
-                cc = "RTD"
-            cat_list.append(cc)
-        cat_list = list(dict.fromkeys([c for c in cat_list if c]))
-        if cat_list:
-            allowed_cats = get_allowed_categorias()
-            invalido = [c for c in cat_list if c not in allowed_cats]
-            if invalido:
-                raise HTTPException(status_code=400, detail=f"Categoria inválida: {invalido}")
-            filtros.append({"categoria": {"$in": cat_list}})
-    if q:
-        q_str = q.strip()
-        if q_str:
-            if q_str.isdigit() and 1 <= len(q_str) <= 10:
-                filtros.append({"numero": {"$regex": re.escape(q_str)}})
-            else:
-                esc_q = re.escape(q_str)
-                re_obj = {"$regex": esc_q, "$options": "i"}
-                filtros.append({"$or": [
-                    {"nome_requerente": re_obj},
-                    {"titulo": re_obj},
-                    {"outras_infos": re_obj},
-                    {"nome_parte_ato": re_obj},
-                    {"numero": re_obj}
-                ]})
-    filtro_final: Dict[str, Any] = {}
-    if filtros:
-        filtro_final = filtros[0] if len(filtros) == 1 else {"$and": filtros}
-    if data_inicio or data_fim:
-        dt_cond: Dict[str, Any] = {}
-        try:
-            if data_inicio:
-                dt_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-                dt_cond["$gte"] = dt_inicio
-            if data_fim:
-                dt_fim = datetime.strptime(data_fim, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1) - timedelta(seconds=1)
-                dt_cond["$lte"] = dt_fim
-            if dt_cond:
-                filtro_final["data_criacao_dt"] = dt_cond
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Data inválida. Use YYYY-MM-DD.")
+    spec = FiltroProtocolos.criar(numero, cpf, status, categoria, q, data_inicio, data_fim)
+    return pesquisar_protocolos(spec, page, per_page, sort_by, sort_dir, repo)
+
+def contar_protocolos(consulta: ConsultaCompilada, repo: Optional[DBConnection] = None) -> int:
+    repo = repo or repositorio
+    return repo.contar_protocolos(consulta.filtro, hint_protocolos(consulta, repo))
+
+def pesquisar_protocolos(
+    spec: FiltroProtocolos,
+    page: Optional[int] = 1,
+    per_page: Optional[int] = 50,
+    sort_by: Optional[str] = "data_criacao",
+    sort_dir: Optional[str] = "desc",
+    repo: Optional[DBConnection] = None,
+) -> Dict[str, Any]:
+    """Página da busca de protocolos; usada pela busca e pela execução de filtros salvos."""
+    repo = repo or repositorio
     p, pp = sanitize_pagination(page, per_page)
     sb_human, direction, field = sanitize_sort(sort_by, sort_dir)
-    projection = {
-        "historico_alteracoes": 0,
-        "data_criacao_dt": 0,
-        "data_retirada_dt": 0,
-        "exig1_data_retirada_dt": 0,
-        "exig1_data_reapresentacao_dt": 0,
-        "exig2_data_retirada_dt": 0,
-        "exig2_data_reapresentacao_dt": 0,
-        "exig3_data_retirada_dt": 0,
-        "exig3_data_reapresentacao_dt": 0,
-    }
-    total = protocolos_coll.count_documents(filtro_final)
-    skip = (p - 1) * pp
-    cursor = protocolos_coll.find(filtro_final, projection).sort(field, direction).skip(skip).limit(pp)
+    consulta = compilar_filtro_protocolos(spec, field, repo)
+    total = contar_protocolos(consulta, repo)
+    docs = repo.pagina_protocolos(
+        consulta.filtro, limite=pp, skip=(p - 1) * pp, projecao=PROJECAO_PROTOCOLO_LISTAGEM,
+        ordem=[(field, direction)], hint=hint_protocolos(consulta, repo)
+    )
     items: List[Dict[str, Any]] = []
-    for doc in cursor:
-        out = {k: v for k, v in doc.items() if k not in [
-            "_id", "data_criacao_dt", "data_retirada_dt", "historico_alteracoes",
-            "exig1_data_retirada_dt","exig1_data_reapresentacao_dt",
-            "exig2_data_retirada_dt","exig2_data_reapresentacao_dt",
-            "exig3_data_retirada_dt","exig3_data_reapresentacao_dt"
-        ]}
+    for doc in docs:
+        out = {k: v for k, v in doc.items() if k != "_id"}
         out["id"] = str(doc["_id"])
         items.append(out)
     pages = (total + pp - 1) // pp if pp else 1
@@ -912,17 +1949,110 @@ def buscar_protocolos(
         "sort_dir": "desc" if direction == DESCENDING else "asc"
     }
 
+# Colunas exportáveis (campo -> cabeçalho), na ordem padrão da planilha
+EXPORT_PROTOCOLO_COLUNAS: Dict[str, str] = OrderedDict([
+    ("numero", "Número"),
+    ("nome_requerente", "Nome Requerente"),
+    ("cpf", "CPF"),
+    ("whatsapp", "WhatsApp"),
+    ("titulo", "Título"),
+    ("nome_parte_ato", "Nome Parte Ato"),
+    ("outras_infos", "Outras Informações"),
+    ("data_criacao", "Data Criação"),
+    ("status", "Status"),
+    ("categoria", "Categoria"),
+    ("responsavel", "Responsável"),
+    ("observacoes", "Observações"),
+    ("retirado_por", "Retirado Por"),
+    ("data_retirada", "Data Retirada"),
+    ("data_concluido", "Data Conclusão"),
+    ("ultima_alteracao_nome", "Última Alteração Por"),
+    ("ultima_alteracao_data", "Última Alteração Em"),
+])
+
+def colunas_exportacao(colunas: Optional[str]) -> List[str]:
+    """Lista de colunas pedida ("numero,status,..."); vazia = todas."""
+    if not colunas:
+        return list(EXPORT_PROTOCOLO_COLUNAS)
+    pedidas = list(dict.fromkeys(c.strip() for c in colunas.split(",") if c.strip()))
+    invalidas = [c for c in pedidas if c not in EXPORT_PROTOCOLO_COLUNAS]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Coluna inválida: {invalidas}")
+    return pedidas or list(EXPORT_PROTOCOLO_COLUNAS)
+
+@app.get("/api/protocolo/export")
+def exportar_protocolos(
+    request: Request,
+    numero: Optional[str] = Query(default=None),
+    cpf: Optional[str] = Query(default=None),
+    status: Optional[List[str]] = Query(default=None),
+    categoria: Optional[List[str]] = Query(default=None),
+    q: Optional[str] = Query(default=None),
+    data_inicio: Optional[str] = Query(default=None),
+    data_fim: Optional[str] = Query(default=None),
+    sort_by: Optional[str] = Query(default="data_criacao"),
+    sort_dir: Optional[str] = Query(default="desc"),
+    formato: str = Query(default="csv"),
+    colunas: Optional[str] = Query(default=None),
+    repo: DBConnection = Depends(obter_repositorio)
+):
+    """
+    Exporta todos os protocolos da busca (sem paginação) em CSV ou XLSX.
+    O arquivo é gerado em fluxo a partir do cursor, sem carregar o resultado em memória;
+    a iteração roda no threadpool, então não trava as demais requisições.
+    """
+    formato = (formato or "csv").strip().lower()
+    if formato not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Use csv ou xlsx.")
+    if formato == "xlsx" and not xlsx_disponivel():
+        raise HTTPException(status_code=501, detail="Exportação XLSX indisponível: instale o pacote openpyxl.")
+    campos = colunas_exportacao(colunas)
+    _, direction, field = sanitize_sort(sort_by, sort_dir)
+    spec = FiltroProtocolos.criar(numero, cpf, status, categoria, q, data_inicio, data_fim)
+    consulta = compilar_filtro_protocolos(spec, field, repo)
+    hint = hint_protocolos(consulta, repo)
+    projecao = {c: 1 for c in campos}
+    projecao["_id"] = 0
+    
+    def linhas():
+        ordem = [(field, direction), ("_id", direction)]
+        for doc in repo.iterar_protocolos(consulta.filtro, projecao, ordem, hint):
+            yield tuple(doc.get(c, "") for c in campos)
+    
+    cabecalho = [EXPORT_PROTOCOLO_COLUNAS[c] for c in campos]
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    if formato == "xlsx":
+        return resposta_xlsx(cabecalho, linhas(), f"protocolos_{timestamp}.xlsx")
+    return resposta_csv(cabecalho, linhas(), f"protocolos_{timestamp}.csv", request)
+
 # ====================== [BLOCO 13: ESTATÍSTICAS E HISTÓRICO] ======================
+# Calendário de dias úteis (calendario.py): feriados nacionais calculados + feriados
+# cadastrados em `feriados` (municipais, pontos facultativos). Toda conta de prazo
+# e atraso passa por obter_calendario().
+CALENDARIO_CACHE_TTL_SECONDS = 300  # Outros workers enxergam feriados editados em até 5 min
+
+@lru_cache(maxsize=1)
+def _calendario(janela: int) -> CalendarioDiasUteis:
+    extras = {}
+    for f in feriados_coll.find({}, {"data": 1, "descricao": 1}):
+        try:
+            extras[datetime.strptime(f["data"], "%Y-%m-%d").date()] = f.get("descricao", "")
+        except (KeyError, ValueError):
+            continue
+    return CalendarioDiasUteis(extras)
+
+def obter_calendario() -> CalendarioDiasUteis:
+    return _calendario(int(time.time() // CALENDARIO_CACHE_TTL_SECONDS))
+
 def subtract_business_days(from_dt: datetime, business_days: int) -> datetime:
-    if business_days <= 0:
-        return from_dt
-    d = from_dt
-    counted = 0
-    while counted < business_days:
-        d = d - timedelta(days=1)
-        if d.weekday() < 5:
-            counted += 1
-    return d
+    return obter_calendario().subtrair(from_dt, business_days)
+
+def add_business_days(from_dt: datetime, business_days: int) -> datetime:
+    return obter_calendario().somar(from_dt, business_days)
+
+def contar_dias_uteis(inicio: datetime, fim: datetime) -> int:
+    """Dias úteis de inicio (inclusive) a fim (exclusive), por data; inverso de subtract_business_days."""
+    return obter_calendario().contar(inicio, fim)
 
 @lru_cache(maxsize=128)
 def obter_estatisticas_cache(usuario_id: str, forcar_atualizacao: bool = False):
@@ -940,11 +2070,14 @@ def calcular_estatisticas():
         total_em_andamento = protocolos_coll.count_documents({"status": "Em andamento"})
         total_exigencias_pendentes = protocolos_coll.count_documents({"status": {"$in": ["Exigência", "Pendente"]}})
         agora = datetime.now(timezone.utc)
-        limiar_30_uteis = subtract_business_days(agora, 30)
-        total_atrasados = protocolos_coll.count_documents({
-            "status": "Em andamento",
-            "data_criacao_dt": {"$lte": limiar_30_uteis}
-        })
+        total_atrasados = protocolos_coll.count_documents(filtro_atrasados(agora))
+        faixas_aging = {nome: 0 for _, nome in FAIXAS_AGING}
+        faixas_aging[FAIXA_AGING_ULTIMA] = 0
+        for item in protocolos_coll.aggregate([
+            {"$match": {"faixa_aging": {"$exists": True}}},
+            {"$group": {"_id": "$faixa_aging", "total": {"$sum": 1}}}
+        ]):
+            faixas_aging[item["_id"]] = item["total"]
         por_categoria: Dict[str, Dict[str, int]] = {}
         dyn_cats = set(get_allowed_categorias()) | set(protocolos_coll.distinct("categoria"))
         for cat in sorted(dyn_cats):
@@ -958,11 +2091,7 @@ def calcular_estatisticas():
                 "categoria": cat,
                 "status": {"$in": ["Exigência", "Pendente"]}
             })
-            atrasados = protocolos_coll.count_documents({
-                "categoria": cat,
-                "status": "Em andamento",
-                "data_criacao_dt": {"$lte": limiar_30_uteis}
-            })
+            atrasados = protocolos_coll.count_documents(filtro_atrasados(agora, cat))
             por_categoria[cat] = {
                 "gerados": gerados,
                 "finalizados": finalizados,
@@ -984,6 +2113,7 @@ def calcular_estatisticas():
                 "em_andamento": total_em_andamento,
                 "exigencias_pendentes": total_exigencias_pendentes
             },
+            "faixas_aging": faixas_aging,
             "por_categoria": por_categoria
         }
     except Exception as e:
@@ -1011,18 +2141,18 @@ def obter_historico(id: str):
 
 # ====================== [BLOCO 14: EDIÇÃO / EXCLUSÃO] ======================
 @app.put("/api/protocolo/{id}")
-def editar_protocolo(id: str, protocolo: dict):
+def editar_protocolo(id: str, protocolo: dict, repo: DBConnection = Depends(obter_repositorio)):
     try:
         oid = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido.")
-    prot = protocolos_coll.find_one({"_id": oid})
+    prot = repo.protocolo_por_id(oid)
     if not prot or prot.get("editavel") is False or prot.get("status", "").upper() == "EXCLUIDO":
         raise HTTPException(status_code=403, detail="Protocolo bloqueado para edição.")
     user_name = (protocolo.get("ultima_alteracao_nome") or "").strip()
     is_admin = False
     if user_name:
-        u = usuarios_coll.find_one({"usuario": user_name})
+        u = repo.usuario_por_nome(user_name)
         is_admin = bool(u and u.get("tipo") == "admin")
     atualizacao = protocolo.copy()
     if "observacoes" in atualizacao and atualizacao["observacoes"]:
@@ -1034,7 +2164,8 @@ def editar_protocolo(id: str, protocolo: dict):
         if novo_numero != prot.get("numero"):
             if not is_admin:
                 raise HTTPException(status_code=403, detail="Apenas administradores podem alterar o número do protocolo.")
-            if protocolos_coll.find_one({"numero": novo_numero, "_id": {"$ne": oid}}):
+            outro = repo.protocolo_por_numero(novo_numero, {"_id": 1})
+            if outro and outro["_id"] != oid:
                 raise HTTPException(status_code=400, detail="Já existe um protocolo com esse número.")
             atualizacao["numero"] = novo_numero
         else:
@@ -1060,10 +2191,8 @@ def editar_protocolo(id: str, protocolo: dict):
             raise HTTPException(status_code=400, detail="Status inválido.")
         atualizacao["status"] = status_novo
     if "categoria" in atualizacao:
-        categoria_nova = str(atualizacao["categoria"]).strip()
-        if categoria_nova == "IDT":
-            categoria_nova = "RTD"
-        if categoria_nova not in get_allowed_categorias():
+        categoria_nova = normalizar_categoria(atualizacao["categoria"])
+        if categoria_nova not in get_allowed_categorias(repo):
             raise HTTPException(status_code=400, detail="Categoria inválida.")
         atualizacao["categoria"] = categoria_nova
     if "data_criacao" in atualizacao:
@@ -1154,17 +2283,34 @@ def editar_protocolo(id: str, protocolo: dict):
     atualizacao["ultima_alteracao_data"] = now_str()
     atualizacao["ultima_alteracao_nome"] = protocolo.get("ultima_alteracao_nome", "") or ""
     atualizacao.pop("id", None)
+    for campo in AGING_CAMPOS + ("prazo_dt",):
+        atualizacao.pop(campo, None)
+    # Prazo recalculado também na troca de status: o de um protocolo encerrado não é mantido
+    if "data_criacao_dt" in atualizacao or "categoria" in atualizacao or "status" in atualizacao or not prot.get("prazo_dt"):
+        prazo_dt = calcular_prazo(
+            atualizacao.get("data_criacao_dt", prot.get("data_criacao_dt")),
+            atualizacao.get("categoria", prot.get("categoria")),
+            repo
+        )
+        if prazo_dt is not None:
+            atualizacao["prazo_dt"] = prazo_dt
+    if "status" in atualizacao or "data_criacao_dt" in atualizacao:
+        aging = campos_aging(
+            atualizacao.get("data_criacao_dt", prot.get("data_criacao_dt")),
+            atualizacao.get("status", prot.get("status", ""))
+        )
+        if aging:
+            atualizacao.update(aging)
+        else:
+            unset_fields.update({c: "" for c in AGING_CAMPOS})
     changes = build_change_list(prot, atualizacao, unset_fields)
-    update_doc: Dict[str, Any] = {"$set": atualizacao, "$push": {"historico_alteracoes": {
+    historico = {"historico_alteracoes": {
         "acao": "editar",
         "usuario": atualizacao["ultima_alteracao_nome"],
         "timestamp": atualizacao["ultima_alteracao_data"],
         "changes": changes
-    }}}
-    if unset_fields:
-        update_doc["$unset"] = unset_fields
-    res = protocolos_coll.update_one({"_id": oid}, update_doc)
-    if res.matched_count == 1:
+    }}
+    if repo.editar_protocolo(oid, atualizacao, unset_fields, historico) == 1:
         logger.info(f"Protocolo {prot.get('numero', '')} editado")
         
         # Se WhatsApp foi enviado, adicionar ao histórico
@@ -1180,10 +2326,7 @@ def editar_protocolo(id: str, protocolo: dict):
                 "acao": f"WhatsApp enviado para {whatsapp_numero}"
             }
             
-            protocolos_coll.update_one(
-                {"_id": oid},
-                {"$push": {"historico": historico_entry}}
-            )
+            repo.editar_protocolo(oid, {}, adicionar={"historico": historico_entry})
             logger.info(f"Envio WhatsApp registrado no histórico do protocolo {prot.get('numero', '')}")
         
         # Update nome_requerente and whatsapp in all other protocols with the same CPF
@@ -1192,56 +2335,48 @@ def editar_protocolo(id: str, protocolo: dict):
         sem_cpf_flag = atualizacao.get("sem_cpf", prot.get("sem_cpf", False))
         
         if cpf_atualizado and not sem_cpf_flag:
-            update_data = {}
-            if "nome_requerente" in atualizacao and atualizacao.get("nome_requerente"):
-                update_data["nome_requerente"] = atualizacao["nome_requerente"]
-            if "whatsapp" in atualizacao and atualizacao.get("whatsapp"):
-                update_data["whatsapp"] = atualizacao["whatsapp"]
-            
-            if update_data:
-                protocolos_coll.update_many(
-                    {"cpf": cpf_atualizado, "_id": {"$ne": oid}},
-                    {"$set": update_data}
-                )
-                logger.info(f"Dados do requerente atualizados para CPF {cpf_atualizado}")
+            if salvar_requerente(
+                cpf_atualizado,
+                atualizacao.get("nome_requerente", ""),
+                atualizacao.get("whatsapp", ""),
+                repo=repo
+            ):
+                logger.info(f"Requerente atualizado para CPF {cpf_atualizado}")
         
         return {"ok": True}
     raise HTTPException(status_code=404, detail="Protocolo não encontrado ou não alterado.")
 
 @app.delete("/api/protocolo/{id}")
-def excluir_protocolo(id: str, usuario: str = Query(...)):
+def excluir_protocolo(id: str, usuario: str = Query(...), repo: DBConnection = Depends(obter_repositorio)):
     try:
         oid = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido.")
-    user = usuarios_coll.find_one({"usuario": usuario})
+    user = repo.usuario_por_nome(usuario)
     if not user or user.get("tipo") != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem excluir protocolos")
-    prot = protocolos_coll.find_one({"_id": oid})
+    prot = repo.protocolo_por_id(oid, {"numero": 1})
     if not prot:
         raise HTTPException(status_code=404, detail="Protocolo não encontrado.")
-    update_doc = {
-        "$set": {
-            "status": "EXCLUIDO",
-            "editavel": False,
-            "ultima_alteracao_nome": usuario,
-            "ultima_alteracao_data": now_str()
-        },
-        "$push": {"historico_alteracoes": {
-            "acao": "excluir",
-            "usuario": usuario,
-            "timestamp": now_str(),
-            "changes": []
-        }}
+    novos_dados = {
+        "status": "EXCLUIDO",
+        "editavel": False,
+        "ultima_alteracao_nome": usuario,
+        "ultima_alteracao_data": now_str()
     }
-    res = protocolos_coll.update_one({"_id": oid}, update_doc)
-    if res.matched_count == 1:
+    historico = {"historico_alteracoes": {
+        "acao": "excluir",
+        "usuario": usuario,
+        "timestamp": now_str(),
+        "changes": []
+    }}
+    if repo.editar_protocolo(oid, novos_dados, {c: "" for c in AGING_CAMPOS}, historico) == 1:
         logger.info(f"Protocolo {prot.get('numero', '')} excluído por {usuario}")
         return {"ok": True}
     raise HTTPException(status_code=404, detail="Protocolo não encontrado.")
 
 @app.post("/api/protocolo/{id}/excluir-definitivamente")
-def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
+def excluir_protocolo_definitivamente(id: str, body: dict = Body(...), repo: DBConnection = Depends(obter_repositorio)):
     """
     Permanently delete a protocol from the database.
     Only administrators can perform this action with password confirmation.
@@ -1260,7 +2395,7 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Usuário e senha são obrigatórios.")
     
     # Verify user is admin
-    user = usuarios_coll.find_one({"usuario": usuario})
+    user = repo.usuario_por_nome(usuario)
     if not user:
         raise HTTPException(status_code=403, detail="Usuário não encontrado.")
     
@@ -1273,7 +2408,7 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
         raise HTTPException(status_code=403, detail="Senha incorreta.")
     
     # Get protocol to delete
-    prot = protocolos_coll.find_one({"_id": oid})
+    prot = repo.protocolo_por_id(oid)
     if not prot:
         raise HTTPException(status_code=404, detail="Protocolo não encontrado.")
     
@@ -1284,6 +2419,12 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
         "numero": prot.get("numero", ""),
         "nome_requerente": prot.get("nome_requerente", ""),
         "cpf": prot.get("cpf", ""),
+        # Resumo para a tela de auditoria, que não carrega o snapshot completo
+        "categoria": prot.get("categoria", ""),
+        "status_original": prot.get("status", ""),
+        "data_criacao": prot.get("data_criacao", ""),
+        "responsavel": prot.get("responsavel", ""),
+        "titulo": prot.get("titulo", ""),
         "exclusao_timestamp": now_str(),
         "exclusao_timestamp_dt": datetime.now(timezone.utc),
         "admin_responsavel": usuario,
@@ -1292,14 +2433,12 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
     
     try:
         # Insert audit trail first
-        audit_result = protocolos_excluidos_coll.insert_one(audit_data)
-        audit_id = str(audit_result.inserted_id)
+        audit_oid = repo.registrar_exclusao(audit_data)
+        audit_id = str(audit_oid)
         logger.info(f"Audit trail criado para protocolo {prot.get('numero', '')} excluído definitivamente")
         
         # Delete from main collection
-        result = protocolos_coll.delete_one({"_id": oid})
-        
-        if result.deleted_count == 1:
+        if repo.excluir_protocolo(oid) == 1:
             logger.info(f"Protocolo {prot.get('numero', '')} excluído definitivamente por {usuario}")
             return {
                 "ok": True,
@@ -1308,7 +2447,7 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
             }
         else:
             # Rollback: Remove audit trail if deletion failed
-            protocolos_excluidos_coll.delete_one({"_id": audit_result.inserted_id})
+            repo.remover_registro_exclusao(audit_oid)
             logger.warning(f"Exclusão falhou, audit trail removido para protocolo {prot.get('numero', '')}")
             raise HTTPException(status_code=404, detail="Protocolo não encontrado para exclusão.")
             
@@ -1318,6 +2457,43 @@ def excluir_protocolo_definitivamente(id: str, body: dict = Body(...)):
         logger.error(f"Erro ao excluir definitivamente protocolo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao excluir protocolo: {str(e)}")
 
+AUDITORIA_RESUMO_CAMPOS = (
+    "protocolo_id_original", "numero", "nome_requerente", "cpf", "categoria", "status_original",
+    "exclusao_timestamp", "admin_responsavel", "motivo", "data_criacao", "responsavel", "titulo"
+)
+# A listagem sem filtro ou só por período é coberta pelo índice "auditoria_resumo_coberto"
+# (indices.json), que guarda a ordenação e todos estes campos: nenhum documento é lido.
+AUDITORIA_RESUMO_PROJECAO = {campo: 1 for campo in AUDITORIA_RESUMO_CAMPOS}
+AUDITORIA_ORDEM = [("exclusao_timestamp_dt", DESCENDING), ("_id", DESCENDING)]
+
+def filtro_auditoria_exclusoes(
+    data_inicio: Optional[str],
+    data_fim: Optional[str],
+    admin: Optional[str],
+    numero_protocolo: Optional[str]
+) -> Dict[str, Any]:
+    """Filtro comum da consulta e da exportação da auditoria de exclusões."""
+    filtro: Dict[str, Any] = {}
+    date_filter: Dict[str, Any] = {}
+    if data_inicio:
+        try:
+            date_filter["$gte"] = parse_data_iso(data_inicio)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Data inicial inválida. Use YYYY-MM-DD.")
+    if data_fim:
+        try:
+            # Include the entire end day
+            date_filter["$lte"] = parse_data_iso(data_fim).replace(hour=23, minute=59, second=59)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Data final inválida. Use YYYY-MM-DD.")
+    if date_filter:
+        filtro["exclusao_timestamp_dt"] = date_filter
+    if admin:
+        filtro["admin_responsavel"] = admin
+    if numero_protocolo:
+        filtro["numero"] = apenas_digitos(numero_protocolo)
+    return filtro
+
 @app.get("/api/auditoria/exclusoes")
 def consultar_auditoria_exclusoes(
     data_inicio: Optional[str] = Query(default=None, description="Data inicial (YYYY-MM-DD)"),
@@ -1332,43 +2508,16 @@ def consultar_auditoria_exclusoes(
     Only accessible by admin users.
     """
     try:
-        filtro = {}
-        
-        # Filter by date range
-        if data_inicio or data_fim:
-            date_filter = {}
-            if data_inicio:
-                try:
-                    dt_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-                    date_filter["$gte"] = dt_inicio
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Data inicial inválida. Use YYYY-MM-DD.")
-            if data_fim:
-                try:
-                    # Include the entire end day
-                    dt_fim = datetime.strptime(data_fim, "%Y-%m-%d").replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
-                    date_filter["$lte"] = dt_fim
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Data final inválida. Use YYYY-MM-DD.")
-            if date_filter:
-                filtro["exclusao_timestamp_dt"] = date_filter
-        
-        # Filter by admin
-        if admin:
-            filtro["admin_responsavel"] = admin
-        
-        # Filter by protocol number
-        if numero_protocolo:
-            filtro["numero"] = apenas_digitos(numero_protocolo)
+        filtro = filtro_auditoria_exclusoes(data_inicio, data_fim, admin, numero_protocolo)
         
         # Count total
         total = protocolos_excluidos_coll.count_documents(filtro)
         
-        # Paginate
+        # Paginate (só o resumo: o snapshot `protocolo_original` nunca é lido aqui)
         skip = (page - 1) * per_page
         registros = list(
-            protocolos_excluidos_coll.find(filtro)
-            .sort("exclusao_timestamp_dt", DESCENDING)
+            protocolos_excluidos_coll.find(filtro, AUDITORIA_RESUMO_PROJECAO)
+            .sort(AUDITORIA_ORDEM)
             .skip(skip)
             .limit(per_page)
         )
@@ -1376,21 +2525,8 @@ def consultar_auditoria_exclusoes(
         # Format output
         saida = []
         for r in registros:
-            r_out = {
-                "id": str(r["_id"]),
-                "protocolo_id_original": r.get("protocolo_id_original", ""),
-                "numero": r.get("numero", ""),
-                "nome_requerente": r.get("nome_requerente", ""),
-                "cpf": r.get("cpf", ""),
-                "categoria": r.get("protocolo_original", {}).get("categoria", ""),
-                "status_original": r.get("protocolo_original", {}).get("status", ""),
-                "exclusao_timestamp": r.get("exclusao_timestamp", ""),
-                "admin_responsavel": r.get("admin_responsavel", ""),
-                "motivo": r.get("motivo", ""),
-                # Include some key protocol fields for reference
-                "data_criacao": r.get("protocolo_original", {}).get("data_criacao", ""),
-                "responsavel": r.get("protocolo_original", {}).get("responsavel", ""),
-            }
+            r_out = {"id": str(r["_id"])}
+            r_out.update({campo: r.get(campo, "") for campo in AUDITORIA_RESUMO_CAMPOS})
             saida.append(r_out)
         
         return {
@@ -1409,6 +2545,7 @@ def consultar_auditoria_exclusoes(
 
 @app.get("/api/auditoria/exclusoes/export")
 def exportar_auditoria_exclusoes_csv(
+    request: Request,
     data_inicio: Optional[str] = Query(default=None),
     data_fim: Optional[str] = Query(default=None),
     admin: Optional[str] = Query(default=None),
@@ -1419,90 +2556,28 @@ def exportar_auditoria_exclusoes_csv(
     Only accessible by admin users.
     """
     try:
-        filtro = {}
-        
-        # Filter by date range
-        if data_inicio or data_fim:
-            date_filter = {}
-            if data_inicio:
-                try:
-                    dt_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-                    date_filter["$gte"] = dt_inicio
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Data inicial inválida. Use YYYY-MM-DD.")
-            if data_fim:
-                try:
-                    dt_fim = datetime.strptime(data_fim, "%Y-%m-%d").replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
-                    date_filter["$lte"] = dt_fim
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Data final inválida. Use YYYY-MM-DD.")
-            if date_filter:
-                filtro["exclusao_timestamp_dt"] = date_filter
-        
-        # Filter by admin
-        if admin:
-            filtro["admin_responsavel"] = admin
+        filtro = filtro_auditoria_exclusoes(data_inicio, data_fim, admin, numero_protocolo)
         
-        # Filter by protocol number
-        if numero_protocolo:
-            filtro["numero"] = apenas_digitos(numero_protocolo)
-        
-        # Define CSV fieldnames upfront for consistent structure
-        fieldnames = [
+        cabecalho = [
             "Número", "Nome Requerente", "CPF", "Categoria", "Status Original",
             "Data Criação", "Responsável Protocolo", "Título", "Data Exclusão",
             "Admin Responsável", "Motivo", "Observações"
         ]
+        # Do snapshot só vêm as observações; o resto está no resumo
+        projecao = {**AUDITORIA_RESUMO_PROJECAO, "protocolo_original.observacoes": 1}
         
-        # Generator function for streaming CSV
-        def generate_csv():
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            
-            # Write header
-            writer.writeheader()
-            yield output.getvalue()
-            output.truncate(0)
-            output.seek(0)
-            
-            # Stream records
-            cursor = protocolos_excluidos_coll.find(filtro).sort("exclusao_timestamp_dt", DESCENDING)
-            
-            for r in cursor:
-                prot_orig = r.get("protocolo_original", {})
-                row = {
-                    "Número": r.get("numero", ""),
-                    "Nome Requerente": r.get("nome_requerente", ""),
-                    "CPF": r.get("cpf", ""),
-                    "Categoria": prot_orig.get("categoria", ""),
-                    "Status Original": prot_orig.get("status", ""),
-                    "Data Criação": prot_orig.get("data_criacao", ""),
-                    "Responsável Protocolo": prot_orig.get("responsavel", ""),
-                    "Título": prot_orig.get("titulo", ""),
-                    "Data Exclusão": r.get("exclusao_timestamp", ""),
-                    "Admin Responsável": r.get("admin_responsavel", ""),
-                    "Motivo": r.get("motivo", ""),
-                    "Observações": prot_orig.get("observacoes", ""),
-                }
-                
-                writer.writerow(row)
-                yield output.getvalue()
-                output.truncate(0)
-                output.seek(0)
-            
-            output.close()
+        def linhas():
+            for r in cursor_exportacao(protocolos_excluidos_coll, filtro, projecao, AUDITORIA_ORDEM):
+                yield (
+                    r.get("numero", ""), r.get("nome_requerente", ""), r.get("cpf", ""),
+                    r.get("categoria", ""), r.get("status_original", ""), r.get("data_criacao", ""),
+                    r.get("responsavel", ""), r.get("titulo", ""), r.get("exclusao_timestamp", ""),
+                    r.get("admin_responsavel", ""), r.get("motivo", ""),
+                    r.get("protocolo_original", {}).get("observacoes", ""),
+                )
         
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        filename = f"auditoria_exclusoes_{timestamp}.csv"
-        
-        # Create response with generator for memory efficiency
-        response = StreamingResponse(
-            (chunk.encode('utf-8-sig') if i == 0 else chunk.encode('utf-8') for i, chunk in enumerate(generate_csv())),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-        return response
+        return resposta_csv(cabecalho, linhas(), f"auditoria_exclusoes_{timestamp}.csv", request)
         
     except HTTPException:
         raise
@@ -1514,14 +2589,7 @@ def exportar_auditoria_exclusoes_csv(
 # ====================== [BLOCO 15: ATENÇÃO / AUTOPREENCHIMENTO] ======================
 @app.get("/api/protocolo/atencao")
 def protocolos_atencao(categoria: Optional[str] = Query(default=None)):
-    hoje = datetime.now(timezone.utc)
-    limiar_30_uteis = subtract_business_days(hoje, 30)
-    filtro = {
-        "status": "Em andamento",
-        "data_criacao_dt": {"$lte": limiar_30_uteis}
-    }
-    if categoria:
-        filtro["categoria"] = categoria
+    filtro = filtro_atrasados(categoria=categoria)
     protos = list(protocolos_coll.find(filtro).sort("data_criacao_dt", DESCENDING))
     saida = []
     for p in protos:
@@ -1533,51 +2601,78 @@ def protocolos_atencao(categoria: Optional[str] = Query(default=None)):
         saida.append(p_out)
     return saida
 
+ATENCAO_SETOR_LIMITE_MAX = 100
+_ATENCAO_SETOR_CAMPOS = ("numero", "nome_requerente", "data_criacao", "responsavel")
+_ATENCAO_SETOR_ORDEM = [("prazo_dt", ASCENDING), ("_id", ASCENDING)]  # Mais atrasados primeiro
+_agregacao_suporte: Dict[str, bool] = {}
+# Servidor sem o operador (InvalidPipelineOperator / "unknown group operator")
+CODIGOS_OPERADOR_DESCONHECIDO = {168, 15952}
+
+def _atencao_por_setor_firstn(filtro: Dict[str, Any], limite: int) -> List[Dict[str, Any]]:
+    """Um único pipeline: $firstN (MongoDB 5.2+) guarda só `limite` protocolos por grupo."""
+    return list(protocolos_coll.aggregate([
+        {"$match": filtro},
+        {"$sort": dict(_ATENCAO_SETOR_ORDEM)},
+        {"$group": {
+            "_id": "$categoria",
+            "total": {"$sum": 1},
+            "protocolos": {"$firstN": {"n": limite, "input": {c: f"${c}" for c in _ATENCAO_SETOR_CAMPOS}}}
+        }},
+        {"$sort": {"total": -1}}
+    ]))
+
+def _atencao_por_setor_fallback(filtro: Dict[str, Any], limite: int) -> List[Dict[str, Any]]:
+    """Servidores sem $firstN: contagem por grupo e um find limitado por setor (mesmo índice)."""
+    grupos = list(protocolos_coll.aggregate([
+        {"$match": filtro},
+        {"$group": {"_id": "$categoria", "total": {"$sum": 1}}},
+        {"$sort": {"total": -1}}
+    ]))
+    projecao = {c: 1 for c in _ATENCAO_SETOR_CAMPOS}
+    projecao["_id"] = 0
+    for g in grupos:
+        g["protocolos"] = list(
+            protocolos_coll.find({**filtro, "categoria": g["_id"]}, projecao)
+            .sort(_ATENCAO_SETOR_ORDEM)
+            .limit(limite)
+        )
+    return grupos
+
 @app.get("/api/protocolo/atencao-por-setor")
-def protocolos_atencao_por_setor():
+def protocolos_atencao_por_setor(limite: int = Query(default=10, ge=1, le=ATENCAO_SETOR_LIMITE_MAX)):
     """
-    Retorna protocolos em atraso (>30 dias úteis) agrupados por setor/categoria.
+    Retorna protocolos em atraso (prazo/SLA vencido) agrupados por setor/categoria,
+    com o total de cada setor e até `limite` protocolos (os mais atrasados).
     Usado para exibir estatísticas de atrasos na visualização de notificações.
     """
     try:
-        hoje = datetime.now(timezone.utc)
-        limiar_30_uteis = subtract_business_days(hoje, 30)
-        
-        filtro = {
-            "status": "Em andamento",
-            "data_criacao_dt": {"$lte": limiar_30_uteis}
-        }
-        
-        # Aggregate by category
-        pipeline = [
-            {"$match": filtro},
-            {"$group": {
-                "_id": "$categoria",
-                "total": {"$sum": 1},
-                "protocolos": {"$push": {
-                    "numero": "$numero",
-                    "nome_requerente": "$nome_requerente",
-                    "data_criacao": "$data_criacao",
-                    "responsavel": "$responsavel"
-                }}
-            }},
-            {"$sort": {"total": -1}}
-        ]
-        
-        result = list(protocolos_coll.aggregate(pipeline))
-        
+        filtro = filtro_atrasados()
+        result = None
+        if _agregacao_suporte.get("firstN", True):
+            try:
+                result = _atencao_por_setor_firstn(filtro, limite)
+            except NotImplementedError as e:  # mongomock
+                logger.info(f"[Atenção] $firstN indisponível ({e}); usando consultas por setor")
+                _agregacao_suporte["firstN"] = False
+            except errors.OperationFailure as e:
+                if e.code in CODIGOS_OPERADOR_DESCONHECIDO:
+                    logger.info(f"[Atenção] $firstN indisponível ({e}); usando consultas por setor")
+                    _agregacao_suporte["firstN"] = False
+                else:
+                    # Falha pontual (timeout, memória, operação interrompida): só esta requisição usa o fallback
+                    logger.warning(f"[Atenção] Falha na agregação com $firstN ({e}); usando consultas por setor")
+        if result is None:
+            result = _atencao_por_setor_fallback(filtro, limite)
+
         # Format output
         setores = []
         total_geral = 0
         for item in result:
-            setor_nome = item["_id"] or "Sem categoria"
-            total = item["total"]
-            total_geral += total
-            
+            total_geral += item["total"]
             setores.append({
-                "setor": setor_nome,
-                "total": total,
-                "protocolos": item["protocolos"][:10]  # Limit to 10 protocols per sector
+                "setor": item["_id"] or "Sem categoria",
+                "total": item["total"],
+                "protocolos": item["protocolos"]
             })
         
         return {
@@ -1591,14 +2686,48 @@ def protocolos_atencao_por_setor():
 @app.get("/api/protocolo/nome_requerente_por_cpf")
 def nome_requerente_por_cpf(cpf: str):
     cpf_puro = apenas_digitos(cpf)
-    p = protocolos_coll.find_one({"cpf": cpf_puro}, sort=[("data_criacao_dt", DESCENDING)])
-    if p:
+    if not cpf_puro:
+        return {"nome_requerente": "", "whatsapp": ""}
+    r = obter_requerente(cpf_puro)
+    if r:
         return {
-            "nome_requerente": p.get("nome_requerente", ""),
-            "whatsapp": p.get("whatsapp", "")
+            "nome_requerente": r.get("nome_requerente", ""),
+            "whatsapp": r.get("whatsapp", "")
         }
+    # CPF ainda não migrado para `requerentes`: usa o protocolo mais recente e cadastra
+    p = protocolos_coll.find_one(
+        {"cpf": cpf_puro},
+        {"nome_requerente": 1, "whatsapp": 1},
+        sort=[("data_criacao_dt", DESCENDING)]
+    )
+    if p:
+        nome = p.get("nome_requerente", "")
+        whatsapp = p.get("whatsapp", "")
+        try:
+            requerentes_coll.update_one(
+                {"cpf": cpf_puro},
+                {"$setOnInsert": {
+                    "nome_requerente": nome,
+                    "nome_busca": normalizar_nome_busca(nome),
+                    "whatsapp": whatsapp,
+                    "total_protocolos": protocolos_coll.count_documents({"cpf": cpf_puro}),
+                    "criado_dt": datetime.now(timezone.utc),
+                    "atualizado_dt": datetime.now(timezone.utc),
+                }},
+                upsert=True
+            )
+        except errors.DuplicateKeyError:
+            pass
+        return {"nome_requerente": nome, "whatsapp": whatsapp}
     return {"nome_requerente": "", "whatsapp": ""}
 
+@app.get("/api/requerentes/autocomplete")
+def autocomplete_requerentes(
+    q: str = Query(..., description="Prefixo do CPF (somente dígitos) ou do nome"),
+    limite: int = Query(default=10, ge=1, le=AUTOCOMPLETE_LIMITE_MAX)
+):
+    return autocompletar_requerentes(q, limite)
+
 @app.get("/api/protocolo/exigencias-pendentes")
 def protocolos_exigencias_pendentes_get(
     categoria: Optional[str] = Query(default=None),
@@ -1683,6 +2812,18 @@ def migrar_datas_antigas(usuario: str = Body(...), senha: str = Body(...)):
         logger.error(f"Erro na migração: {e}")
         raise HTTPException(status_code=500, detail=f"Erro na migração: {e}")
 
+@app.post("/api/admin/migrar-requerentes")
+def migrar_requerentes_endpoint(usuario: str = Body(...), senha: str = Body(...)):
+    user = usuarios_coll.find_one({"usuario": usuario})
+    if not user or not verify_password(senha, user.get("senha", "")) or user.get("tipo") != "admin":
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    try:
+        criados = migrar_requerentes()
+        return {"criados": criados, "message": f"Migração concluída: {criados} requerentes cadastrados"}
+    except Exception as e:
+        logger.error(f"Erro na migração de requerentes: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro na migração: {e}")
+
 # ====================== [BLOCO 17: BACKUP COMPLETO (BD + SISTEMA)] ======================
 @app.post("/api/backup/full")
 def backup_completo():
@@ -1752,6 +2893,8 @@ async def restaurar_backup(file: UploadFile = File(...)):
         if "protocolos" in data:
             protocolos_coll.delete_many({})
             protocolos_coll.insert_many(data["protocolos"])
+            migrar_requerentes(substituir=True)
+            atualizar_aging_protocolos()
         obter_estatisticas_cache.cache_clear()
         return {"ok": True, "msg": "Backup restaurado (substituído)."}
     except Exception as e:
@@ -1771,6 +2914,8 @@ async def restaurar_backup_protegido(usuario: str = Query(...), file: UploadFile
         if "protocolos" in data:
             protocolos_coll.delete_many({})
             protocolos_coll.insert_many(data["protocolos"])
+            migrar_requerentes(substituir=True)
+            atualizar_aging_protocolos()
         obter_estatisticas_cache.cache_clear()
         return {"ok": True}
     except Exception as e:
@@ -1791,6 +2936,8 @@ async def restaurar_backup_protegido2(usuario: str = Body(...), senha: str = Bod
         if "protocolos" in data:
             protocolos_coll.delete_many({})
             protocolos_coll.insert_many(data["protocolos"])
+            migrar_requerentes(substituir=True)
+            atualizar_aging_protocolos()
         obter_estatisticas_cache.cache_clear()
         return {"ok": True}
     except Exception as e:
@@ -1798,48 +2945,161 @@ async def restaurar_backup_protegido2(usuario: str = Body(...), senha: str = Bod
         raise HTTPException(status_code=500, detail=f"Erro ao restaurar: {str(e)}")
 
 # ====================== [BLOCO 18: ENDPOINTS PARA NOTIFICAÇÕES E FILTROS] ======================
+NOTIFICACOES_LIMITE_PADRAO = 30
+NOTIFICACOES_LIMITE_MAX = 200
+
+# Notificação sem data_criacao_dt (gravada antes do backfill de migrar_datas_notificacoes)
+# ordena depois de todas as datadas, como o Mongo ordena campo ausente; o cursor dela é "-.<_id>".
+CURSOR_SEM_DATA = "-"
+
+def _cursor_notificacao(doc: Dict[str, Any]) -> str:
+    """Cursor opaco "<epoch_ms>.<_id>" da última notificação da página."""
+    data = doc.get("data_criacao_dt")
+    if not isinstance(data, datetime):
+        return f"{CURSOR_SEM_DATA}.{doc['_id']}"
+    return f"{int(as_utc(data).timestamp() * 1000)}.{doc['_id']}"
+
+def _filtro_apos_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        ms, oid = cursor.split(".", 1)
+        data_dt = None if ms == CURSOR_SEM_DATA else datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc)
+        oid = ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if data_dt is None:
+        return {"data_criacao_dt": None, "_id": {"$lt": oid}}
+    return {"$or": [
+        {"data_criacao_dt": {"$lt": data_dt}},
+        {"data_criacao_dt": data_dt, "_id": {"$lt": oid}},
+        {"data_criacao_dt": None}
+    ]}
+
 @app.get("/api/notificacoes")
-def listar_notificacoes(usuario: Optional[str] = Query(default=None)):
+def listar_notificacoes(
+    usuario: str = Query(...),
+    lida: Optional[bool] = Query(default=None),
+    limite: int = Query(default=NOTIFICACOES_LIMITE_PADRAO, ge=1, le=NOTIFICACOES_LIMITE_MAX),
+    cursor: Optional[str] = Query(default=None),
+    repo: DBConnection = Depends(obter_repositorio)
+):
+    """
+    Notificações do usuário, mais recentes primeiro, paginadas por cursor
+    (data_criacao_dt, _id). Para a próxima página, repasse `proximo_cursor`.
+    """
+    query: Dict[str, Any] = {"usuario": usuario}
+    if lida is not None:
+        query["lida"] = lida
+    if cursor:
+        query.update(_filtro_apos_cursor(cursor))
     try:
-        query = {}
-        if usuario:
-            query["usuario"] = usuario
-        docs = list(notificacoes_coll.find(query).sort("data_criacao", DESCENDING))
-        out = []
-        for d in docs:
-            o = {k: v for k, v in d.items() if k != "_id"}
-            o["id"] = str(d["_id"])
-            out.append(o)
-        return out
+        docs = list(
+            repo.notificacoes.find(query)
+            .sort([("data_criacao_dt", DESCENDING), ("_id", DESCENDING)])
+            .limit(limite + 1)
+        )
+        proximo = _cursor_notificacao(docs[limite - 1]) if len(docs) > limite else None
+        return {"items": [_serialize_doc(d) for d in docs[:limite]], "proximo_cursor": proximo}
     except Exception as e:
         logger.exception("Erro ao listar notificações: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao listar notificações.")
 
+@app.get("/api/notificacoes/nao-lidas/contagem")
+def contar_notificacoes_nao_lidas(usuario: str = Query(...), repo: DBConnection = Depends(obter_repositorio)):
+    """Contador do badge: coberto pelo índice (usuario, lida, ...)."""
+    try:
+        return {"nao_lidas": repo.notificacoes.count_documents({"usuario": usuario, "lida": False})}
+    except Exception as e:
+        logger.exception("Erro ao contar notificações: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao contar notificações.")
+
+@app.get("/api/notificacoes/stream")
+async def stream_notificacoes(request: Request, usuario: str = Query(...)):
+    """
+    Server-Sent Events com as notificações novas do usuário (evento "notificacao").
+    Substitui o polling periódico de /api/notificacoes pelo frontend.
+    """
+    fila = broadcaster_notificacoes.assinar(usuario)
+
+    async def eventos():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    notif = await asyncio.wait_for(fila.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: notificacao\nid: {notif.get('id', '')}\ndata: {json.dumps(notif, ensure_ascii=False)}\n\n"
+        finally:
+            broadcaster_notificacoes.cancelar(usuario, fila)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.put("/api/notificacao/{id}/ler")
-def marcar_notificacao_lida(id: str):
+def marcar_notificacao_lida(id: str, repo: DBConnection = Depends(obter_repositorio)):
     try:
         oid = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido.")
-    res = notificacoes_coll.update_one({"_id": oid}, {"$set": {"lida": True}})
-    if res.matched_count:
+    res = repo.notificacoes.update_one(
+        {"_id": oid, "lida": {"$ne": True}},
+        {"$set": {"lida": True, "lida_em_dt": datetime.now(timezone.utc)}}
+    )
+    if res.matched_count or repo.notificacoes.count_documents({"_id": oid}, limit=1):
         return {"ok": True}
     raise HTTPException(status_code=404, detail="Notificação não encontrada.")
 
+@app.put("/api/notificacoes/ler")
+def marcar_notificacoes_lidas(
+    usuario: str = Body(...),
+    ids: Optional[List[str]] = Body(default=None),
+    tipo: Optional[str] = Body(default=None),
+    repo: DBConnection = Depends(obter_repositorio)
+):
+    """
+    Marca como lidas, num único update_many, as notificações não lidas do usuário:
+    as de `ids`, se informado, ou todas (opcionalmente só as do `tipo`).
+    """
+    filtro: Dict[str, Any] = {"usuario": usuario, "lida": False}
+    if ids is not None:
+        try:
+            filtro["_id"] = {"$in": [ObjectId(i) for i in ids]}
+        except Exception:
+            raise HTTPException(status_code=400, detail="ID inválido.")
+    if tipo:
+        filtro["tipo"] = tipo
+    try:
+        res = repo.notificacoes.update_many(
+            filtro, {"$set": {"lida": True, "lida_em_dt": datetime.now(timezone.utc)}}
+        )
+        return {"ok": True, "marcadas": res.modified_count}
+    except Exception as e:
+        logger.exception("Erro ao marcar notificações como lidas: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao marcar notificações como lidas.")
+
 @app.get("/api/filtros")
-def listar_filtros(usuario: Optional[str] = Query(default=None)):
+def listar_filtros(usuario: Optional[str] = Query(default=None), repo: DBConnection = Depends(obter_repositorio)):
     try:
         q = {}
         if usuario:
             q["usuario"] = usuario
-        docs = list(filtros_coll.find(q).sort("data_atualizacao", DESCENDING))
+        docs = repo.filtros.find(
+            q, {"nome": 1, "data_atualizacao": 1, "filtros": 1, "total": 1, "total_atualizado_dt": 1}
+        ).sort("data_atualizacao", DESCENDING)
         out = []
         for d in docs:
             out.append({
                 "id": str(d["_id"]),
                 "nome": d.get("nome", ""),
                 "data_atualizacao": d.get("data_atualizacao"),
-                "filtros": d.get("filtros", {})
+                "filtros": d.get("filtros", {}),
+                # Contagem em cache (BLOCO 7.8); None até a primeira recontagem
+                "total": d.get("total"),
+                "total_atualizado_em": _serialize_value(d.get("total_atualizado_dt"))
             })
         return out
     except Exception as e:
@@ -1847,29 +3107,73 @@ def listar_filtros(usuario: Optional[str] = Query(default=None)):
         raise HTTPException(status_code=500, detail="Erro ao listar filtros.")
 
 @app.post("/api/filtros/salvar")
-def salvar_filtro(body: dict = Body(...)):
+def salvar_filtro(body: dict = Body(...), repo: DBConnection = Depends(obter_repositorio)):
     try:
         nome = body.get("nome")
         filtros = body.get("filtros", {})
         usuario = body.get("usuario")
         if not nome or not usuario:
             raise HTTPException(status_code=400, detail="Dados insuficientes.")
-        doc = {"nome": nome, "filtros": filtros, "usuario": usuario, "data_atualizacao": now_str()}
-        res = filtros_coll.insert_one(doc)
-        return {"ok": True, "id": str(res.inserted_id)}
+        try:
+            spec = spec_filtro_salvo(filtros)
+        except FiltroInvalido as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        consulta = compilar_filtro_protocolos(spec, repo=repo)
+        doc = {
+            "nome": nome, "filtros": filtros, "usuario": usuario, "data_atualizacao": now_str(),
+            "consulta": spec.para_dict(),
+            "total": contar_protocolos(consulta, repo), "total_erro": "",
+            "total_atualizado_dt": datetime.now(timezone.utc), "usado_dt": datetime.now(timezone.utc)
+        }
+        res = repo.filtros.insert_one(doc)
+        return {"ok": True, "id": str(res.inserted_id), "total": doc["total"]}
     except HTTPException:
         raise
     except Exception as e:
         logger.exception("Erro ao salvar filtro: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao salvar filtro.")
 
+@app.get("/api/filtros/{filtro_id}/executar")
+def executar_filtro(
+    filtro_id: str,
+    usuario: str = Query(...),
+    page: Optional[int] = Query(default=1, ge=1),
+    per_page: Optional[int] = Query(default=None, ge=1, le=100),
+    repo: DBConnection = Depends(obter_repositorio)
+):
+    """Executa no servidor um filtro salvo do usuário, com a ordenação e paginação salvas."""
+    try:
+        oid = ObjectId(filtro_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID inválido.")
+    doc = repo.filtros.find_one({"_id": oid, "usuario": usuario})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Filtro não encontrado.")
+    tela = doc.get("filtros") or {}
+    try:
+        spec = FiltroProtocolos.de_dict(doc["consulta"]) if "consulta" in doc else spec_filtro_salvo(tela)
+    except FiltroInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        pp = per_page or int(tela.get("per_page") or 50)
+    except (TypeError, ValueError):
+        pp = 50
+    resultado = pesquisar_protocolos(spec, page, pp, tela.get("sort_by"), tela.get("sort_dir"), repo)
+    # Aproveita o total recém-calculado para a contagem em cache
+    agora = datetime.now(timezone.utc)
+    repo.filtros.update_one({"_id": oid}, {"$set": {
+        "total": resultado["total"], "total_erro": "", "total_atualizado_dt": agora, "usado_dt": agora
+    }})
+    resultado["filtro"] = {"id": filtro_id, "nome": doc.get("nome", "")}
+    return resultado
+
 # ====================== [BLOCO 19: UTILITÁRIOS, HEALTH, PROTEÇÕES] ======================
 def _serialize_value(v):
     try:
         if isinstance(v, ObjectId):
             return str(v)
         if isinstance(v, datetime):
-            return v.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+            return as_utc(v).isoformat().replace("+00:00", "Z")
         if isinstance(v, list):
             return [_serialize_value(x) for x in v]
         if isinstance(v, dict):
@@ -1925,44 +3229,70 @@ def protocolos_finalizados_por_data(data: str):
         raise HTTPException(status_code=500, detail="Erro interno ao buscar protocolos")
 
 @app.get("/api/protocolo/{id}", response_model=Optional[Dict[str, Any]])
-def get_protocolo_por_id(id: str):
+def get_protocolo_por_id(id: str, repo: DBConnection = Depends(obter_repositorio)):
     try:
         oid = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido.")
-    p = protocolos_coll.find_one({"_id": oid})
+    p = repo.protocolo_por_id(oid)
     if not p:
         raise HTTPException(status_code=404, detail="Protocolo não encontrado.")
     return _serialize_doc(p)
 
+# Liveness: o processo responde (sem tocar no banco). Readiness: Mongo responde
+# ao ping e o esquema está pronto. /api/health traz os dois.
+@app.get("/api/health/live")
+def health_live():
+    return {"status": "ok", "instancia": INSTANCIA_ID}
+
+def _estado_prontidao() -> Tuple[bool, str, str]:
+    """(pronto, status, detalhe) para readiness."""
+    ok, msg = ping_mongodb()
+    if not ok:
+        logger.warning("Health check Mongo falhou: %s", msg)
+        return False, "error", msg
+    if _esquema_estado["estado"] != "pronto":
+        # Atendendo, mas índices/migrações ainda em andamento (ou aguardando o líder)
+        return False, "indexing", _esquema_estado["erro"] or _esquema_estado["estado"]
+    return True, "ok", msg
+
+@app.get("/api/health/ready")
+def health_ready():
+    pronto, estado, msg = _estado_prontidao()
+    return JSONResponse(status_code=200 if pronto else 503, content={"status": estado, "detail": msg})
+
 @app.get("/api/health")
 def health_check():
-    ok = True
-    msg = "ok"
-    try:
-        client.admin.command("ping")
-    except Exception as e:
-        logger.exception("Health check Mongo falhou: %s", e)
-        ok = False
-        msg = f"mongo error: {str(e)}"
-    status_code = 200 if ok else 503
-    return JSONResponse(status_code=status_code, content={"status": "ok" if ok else "error", "detail": msg})
+    pronto, estado, msg = _estado_prontidao()
+    status_code = 503 if estado == "error" else 200
+    return JSONResponse(status_code=status_code, content={
+        "status": estado,
+        "detail": msg,
+        "live": True,
+        "ready": pronto,
+        "conexao": {k: _serialize_value(v) for k, v in _conexao_estado.items()},
+        "esquema": {k: _serialize_value(v) for k, v in _esquema_estado.items()}
+    })
 
 @app.get("/api/version")
 def api_version():
     return {"app": "Sistema de Gestão de Protocolos", "version": "2.0.1"}
 
 @app.post("/api/notificacoes/exemplo")
-def criar_notificacao_exemplo(usuario: str = Body(...), mensagem: str = Body(...)):
+def criar_notificacao_exemplo(
+    usuario: str = Body(...), mensagem: str = Body(...), repo: DBConnection = Depends(obter_repositorio)
+):
     try:
         doc = {
             "usuario": usuario,
             "mensagem": mensagem,
             "tipo": "info",
             "lida": False,
-            "data_criacao": now_str()
+            "data_criacao": now_str(),
+            "data_criacao_dt": datetime.now(timezone.utc)
         }
-        res = notificacoes_coll.insert_one(doc)
+        res = repo.notificacoes.insert_one(doc)
+        publicar_notificacao(doc)
         return {"ok": True, "id": str(res.inserted_id)}
     except Exception as e:
         logger.exception("Erro ao criar notificação de exemplo: %s", e)
@@ -1984,7 +3314,9 @@ def listar_categorias():
             out.append({
                 "id": str(d["_id"]),
                 "nome": d.get("nome"),
-                "descricao": d.get("descricao", "")
+                "descricao": d.get("descricao", ""),
+                "sla_dias_uteis": d.get("sla_dias_uteis"),  # None = usa o padrão
+                "sla_padrao": PRAZO_ATRASO_DIAS_UTEIS
             })
         return out
     except Exception as e:
@@ -1996,8 +3328,13 @@ def criar_categoria(categoria: CategoriaModel = Body(...), usuario: str = Query(
     if not _is_admin_usuario(usuario):
         raise HTTPException(status_code=403, detail="Apenas administradores podem criar categorias.")
     doc = {"nome": categoria.nome.strip(), "descricao": (categoria.descricao or "").strip()}
+    if categoria.sla_dias_uteis:
+        doc["sla_dias_uteis"] = categoria.sla_dias_uteis
     try:
         res = categorias_coll.insert_one(doc)
+        _categorias_permitidas.cache_clear()
+        if categoria.sla_dias_uteis:
+            _apos_alterar_sla(doc["nome"])
         logger.info(f"Categoria criada: {doc['nome']} por {usuario}")
         return {"ok": True, "id": str(res.inserted_id)}
     except errors.DuplicateKeyError:
@@ -2006,6 +3343,15 @@ def criar_categoria(categoria: CategoriaModel = Body(...), usuario: str = Query(
         logger.exception("Erro ao criar categoria: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao criar categoria.")
 
+def _apos_alterar_sla(*categorias: str) -> None:
+    """O SLA efetivo mudou: regrava prazo_dt dos protocolos abertos dessas categorias (o aging não depende do SLA)."""
+    _slas_categorias.cache_clear()
+    try:
+        for categoria in categorias:
+            recalcular_prazos(filtro_abertos(categoria=categoria))
+    except Exception as e:
+        logger.warning(f"[SLA] Falha ao recalcular prazos das categorias {categorias}: {e}")
+
 @app.put("/api/categoria/{id}")
 def atualizar_categoria(id: str, body: dict = Body(...), usuario: str = Query(...)):
     if not _is_admin_usuario(usuario):
@@ -2018,11 +3364,38 @@ def atualizar_categoria(id: str, body: dict = Body(...), usuario: str = Query(..
     descricao = (body.get("descricao") or "").strip()
     if not nome:
         raise HTTPException(status_code=400, detail="Nome obrigatório.")
+    campos: Dict[str, Any] = {"nome": nome, "descricao": descricao}
+    atualizacao: Dict[str, Any] = {"$set": campos}
+    if "sla_dias_uteis" in body and body["sla_dias_uteis"] in (None, ""):
+        # Campo limpo: volta ao SLA padrão
+        atualizacao["$unset"] = {"sla_dias_uteis": ""}
+    elif body.get("sla_dias_uteis") is not None:
+        try:
+            campos["sla_dias_uteis"] = int(body["sla_dias_uteis"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="SLA inválido.")
+        if not 1 <= campos["sla_dias_uteis"] <= 365:
+            raise HTTPException(status_code=400, detail="SLA deve estar entre 1 e 365 dias úteis.")
     try:
         if categorias_coll.find_one({"nome": nome, "_id": {"$ne": oid}}):
             raise HTTPException(status_code=400, detail="Já existe uma categoria com esse nome.")
-        res = categorias_coll.update_one({"_id": oid}, {"$set": {"nome": nome, "descricao": descricao}})
-        if res.matched_count:
+        anterior = categorias_coll.find_one_and_update({"_id": oid}, atualizacao)
+        _categorias_permitidas.cache_clear()
+        if anterior:
+            sla_anterior = anterior.get("sla_dias_uteis")
+            sla_novo = None if "$unset" in atualizacao else campos.get("sla_dias_uteis", sla_anterior)
+            recalcular: List[str] = []
+            if anterior.get("nome") != nome:
+                # Os protocolos continuam com o nome antigo (que passa a usar o padrão);
+                # os que já tiverem o nome novo passam a usar o SLA desta categoria
+                if sla_anterior:
+                    recalcular.append(anterior.get("nome"))
+                if sla_novo:
+                    recalcular.append(nome)
+            elif sla_anterior != sla_novo:
+                recalcular.append(nome)
+            if recalcular:
+                _apos_alterar_sla(*recalcular)
             logger.info(f"Categoria {id} atualizada por {usuario}")
             return {"ok": True}
         raise HTTPException(status_code=404, detail="Categoria não encontrada.")
@@ -2040,12 +3413,83 @@ def excluir_categoria(id: str, usuario: str = Query(...)):
         oid = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido.")
-    res = categorias_coll.delete_one({"_id": oid})
-    if res.deleted_count:
+    cat = categorias_coll.find_one_and_delete({"_id": oid})
+    _categorias_permitidas.cache_clear()
+    if cat:
+        if cat.get("sla_dias_uteis"):
+            _apos_alterar_sla(cat.get("nome"))
         logger.info(f"Categoria {id} excluída por {usuario}")
         return {"ok": True}
     raise HTTPException(status_code=404, detail="Categoria não encontrada.")
 
+# ====================== [NOVAS ROTAS: FERIADOS (CALENDÁRIO DE DIAS ÚTEIS)] ======================
+def _apos_alterar_feriados(inicio: str, fim: str) -> None:
+    """
+    Feriados entre `inicio` e `fim` (YYYY-MM-DD) mudaram: recarrega o calendário e
+    regrava prazo_dt só dos protocolos abertos cujo prazo atravessa essas datas
+    (criados antes e com prazo depois). O aging é pedido ao job em background.
+    """
+    _calendario.cache_clear()
+    ini_dt, fim_dt = parse_data_iso(inicio), parse_data_iso(fim) + timedelta(days=1)
+    try:
+        recalcular_prazos(filtro_abertos(data_criacao_dt={"$lt": fim_dt}, prazo_dt={"$gte": ini_dt}))
+    except Exception as e:
+        logger.warning(f"[Feriados] Falha ao recalcular prazos: {e}")
+    if ini_dt <= datetime.now(timezone.utc):  # Dias em aberto só mudam com feriado já passado
+        try:
+            solicitar_job("aging_protocolos", f"feriados de {inicio} a {fim}")
+        except Exception as e:
+            logger.warning(f"[Feriados] Falha ao pedir o recálculo do aging: {e}")
+
+@app.get("/api/feriados")
+def listar_feriados(ano: int = Query(..., ge=1900, le=2200)):
+    """Feriados do ano: nacionais (calculados) e cadastrados (municipais, pontos facultativos)."""
+    cadastrados = {f["data"]: f.get("descricao", "") for f in feriados_coll.find({"ano": ano})}
+    out = [
+        {"data": d.isoformat(), "descricao": nome, "origem": "nacional"}
+        for d, nome in feriados_nacionais(ano).items() if d.isoformat() not in cadastrados
+    ]
+    out += [{"data": d, "descricao": nome, "origem": "cadastrado"} for d, nome in cadastrados.items()]
+    return sorted(out, key=lambda f: f["data"])
+
+@app.post("/api/feriado")
+def criar_feriado(feriado: FeriadoModel = Body(...), usuario: str = Query(...)):
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem cadastrar feriados.")
+    try:
+        feriados_coll.insert_one({"data": feriado.data, "ano": int(feriado.data[:4]), "descricao": feriado.descricao.strip()})
+    except errors.DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Já existe feriado cadastrado nessa data.")
+    _apos_alterar_feriados(feriado.data, feriado.data)
+    logger.info(f"Feriado {feriado.data} cadastrado por {usuario}")
+    return {"ok": True}
+
+@app.put("/api/feriados/{ano}")
+def substituir_feriados_ano(ano: int, feriados: List[FeriadoModel] = Body(...), usuario: str = Query(...)):
+    """Carrega a lista de feriados cadastrados de um ano, substituindo a anterior."""
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem cadastrar feriados.")
+    if any(int(f.data[:4]) != ano for f in feriados):
+        raise HTTPException(status_code=400, detail=f"Todas as datas devem ser de {ano}.")
+    docs = {f.data: {"data": f.data, "ano": ano, "descricao": f.descricao.strip()} for f in feriados}
+    feriados_coll.delete_many({"ano": ano})
+    if docs:
+        feriados_coll.insert_many(list(docs.values()))
+    _apos_alterar_feriados(f"{ano:04d}-01-01", f"{ano:04d}-12-31")
+    logger.info(f"Feriados de {ano} substituídos por {usuario} ({len(docs)} datas)")
+    return {"ok": True, "total": len(docs)}
+
+@app.delete("/api/feriado/{data}")
+def excluir_feriado(data: str, usuario: str = Query(...)):
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem excluir feriados.")
+    res = feriados_coll.delete_one({"data": data})
+    if not res.deleted_count:
+        raise HTTPException(status_code=404, detail="Feriado não encontrado.")
+    _apos_alterar_feriados(data, data)
+    logger.info(f"Feriado {data} excluído por {usuario}")
+    return {"ok": True}
+
 # ====================== [NOVO ENDPOINT: ZERAR APLICAÇÃO (RESET) - APENAS ADMIN] ======================
 @app.post("/api/admin/zerar-app")
 def zerar_aplicacao(usuario: str = Body(...), senha: str = Body(...)):
@@ -2057,6 +3501,11 @@ def zerar_aplicacao(usuario: str = Body(...), senha: str = Body(...)):
         filtros_coll.delete_many({})
         notificacoes_coll.delete_many({})
         categorias_coll.delete_many({})
+        requerentes_coll.delete_many({})
+        requerentes_sync_coll.delete_many({})
+        _autocomplete_cache.cache_clear()
+        _categorias_permitidas.cache_clear()
+        _slas_categorias.cache_clear()
         usuarios_coll.delete_many({})
         usuarios_coll.insert_one({
             "usuario": usuario,
@@ -2077,75 +3526,38 @@ def zerar_aplicacao(usuario: str = Body(...), senha: str = Body(...)):
 def admin_verificar_atrasos(
     usuario: str = Body(...),
     senha: str = Body(...),
-    categoria: Optional[str] = Body(default=None)
+    categoria: Optional[str] = Body(default=None),
+    repo: DBConnection = Depends(obter_repositorio)
 ):
     """
-    Varre protocolos em atraso (>30 dias úteis, status 'Em andamento') e cria notificações.
+    Varre protocolos em atraso (prazo vencido, status 'Em andamento') e cria notificações.
     Regra: apenas admin pode executar.
     Destinatário: todos os admins.
     Anti-spam: no máximo 1 notificação por dia (UTC) por admin.
     """
-    user = usuarios_coll.find_one({"usuario": usuario})
+    user = repo.usuario_por_nome(usuario)
     if not user or not verify_password(senha, user.get("senha", "")) or user.get("tipo") != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
 
     agora = datetime.now(timezone.utc)
-    limiar_30_uteis = subtract_business_days(agora, 30)
-
-    filtro = {
-        "status": "Em andamento",
-        "data_criacao_dt": {"$lte": limiar_30_uteis},
-    }
-    if categoria:
-        filtro["categoria"] = categoria
+    filtro = filtro_atrasados(agora, categoria)
 
-    atrasados = list(protocolos_coll.find(
-        filtro,
-        {"numero": 1, "categoria": 1, "nome_requerente": 1, "data_criacao": 1}
-    ))
-    total_atrasados = len(atrasados)
+    total_atrasados, numeros = resumo_atrasados(filtro, limite=20, repo=repo)
 
     # Mesmo sem atrasados, não cria notificação (evita ruído)
     if total_atrasados == 0:
         return {"ok": True, "atrasados": 0, "notificacoes_criadas": 0, "skipped_por_ja_existir": 0}
 
     # Admins que recebem
-    admins = list(usuarios_coll.find({"tipo": "admin"}, {"usuario": 1}))
-    admin_names = [a.get("usuario") for a in admins if a.get("usuario")]
+    admin_names = list(repo.nomes_admins())
 
     # Mensagem resumo (com alguns exemplos)
-    lista_nums = ", ".join([p.get("numero", "") for p in atrasados[:20] if p.get("numero")])
+    lista_nums = ", ".join(numeros)
     sufixo = f" (e mais {total_atrasados - 20})" if total_atrasados > 20 else ""
-    msg = f"⚠️ Atrasos detectados: {total_atrasados} protocolo(s) 'Em andamento' com +30 dias úteis. Exemplos: {lista_nums}{sufixo}"
-
-    # Janela do “dia atual UTC”
-    inicio_dia = agora.replace(hour=0, minute=0, second=0, microsecond=0)
-    fim_dia = inicio_dia + timedelta(days=1)
-
-    created = 0
-    skipped = 0
-
-    for admin_user in admin_names:
-        # 1 alerta por dia por admin (filtra por tipo + usuário + data_criacao_dt no dia)
-        ja_hoje = notificacoes_coll.find_one({
-            "usuario": admin_user,
-            "tipo": "alerta_atrasos",
-            "data_criacao_dt": {"$gte": inicio_dia, "$lt": fim_dia}
-        })
+    msg = f"⚠️ Atrasos detectados: {total_atrasados} protocolo(s) 'Em andamento' com prazo vencido. Exemplos: {lista_nums}{sufixo}"
 
-        if ja_hoje:
-            skipped += 1
-            continue
-
-        notificacoes_coll.insert_one({
-            "usuario": admin_user,
-            "mensagem": msg,
-            "tipo": "alerta_atrasos",
-            "lida": False,
-            "data_criacao": now_str(),
-            "data_criacao_dt": agora
-        })
-        created += 1
+    # 1 alerta por dia (UTC) por admin, garantido pelo índice único (usuario, tipo, dia)
+    created, skipped = notificar_admins_atrasos(admin_names, msg, agora, repo)
 
     return {
         "ok": True,
@@ -2154,6 +3566,207 @@ def admin_verificar_atrasos(
         "skipped_por_ja_existir": skipped
     }
 
+# ====================== [ADMIN: LIDERANÇA DOS JOBS AGENDADOS] ======================
+@app.get("/api/admin/lideranca")
+def status_lideranca(usuario: str = Query(...)):
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    doc = lideranca_coll.find_one({"_id": LIDER_LEASE_NOME}) or {}
+    return {
+        "instancia": INSTANCIA_ID,
+        "lider": sou_lider(),
+        "dono": doc.get("dono"),
+        "expira_em": _serialize_value(as_utc(doc.get("expira_dt"))) if doc.get("expira_dt") else None
+    }
+
+# ====================== [ADMIN: RELATÓRIOS DE EXECUÇÃO DOS JOBS] ======================
+@app.get("/api/admin/jobs/execucoes")
+def listar_execucoes_jobs(
+    usuario: str = Query(...),
+    job: Optional[str] = Query(default=None),
+    limite: int = Query(default=20, ge=1, le=200)
+):
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    try:
+        filtro = {"job": job} if job else {}
+        docs = execucoes_jobs_coll.find(filtro, {"_id": 0}).sort("inicio_dt", DESCENDING).limit(limite)
+        return [_serialize_doc(d) for d in docs]
+    except Exception as e:
+        logger.exception("Erro ao listar execuções de jobs: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao listar execuções.")
+
+# ====================== [ADMIN: FILA DE SINCRONIZAÇÃO DE REQUERENTES] ======================
+@app.get("/api/admin/sync-requerentes/status")
+def status_sync_requerentes(usuario: str = Query(...)):
+    """
+    Situação da fila de propagação de nome/WhatsApp por CPF.
+    `lag_segundos` é a idade do job pendente mais antigo (0 quando a fila está vazia).
+    """
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    try:
+        pendentes = requerentes_sync_coll.count_documents({"status": "pendente"})
+        processando = requerentes_sync_coll.count_documents({"status": "processando"})
+        mais_antigo = requerentes_sync_coll.find_one(
+            {}, {"enfileirado_dt": 1, "cpf": 1}, sort=[("enfileirado_dt", ASCENDING)]
+        )
+        lag = 0.0
+        mais_antigo_em = None
+        if mais_antigo and mais_antigo.get("enfileirado_dt"):
+            dt = as_utc(mais_antigo["enfileirado_dt"])
+            lag = max(0.0, (datetime.now(timezone.utc) - dt).total_seconds())
+            mais_antigo_em = _serialize_value(dt)
+        return {
+            "pendentes": pendentes,
+            "processando": processando,
+            "lag_segundos": round(lag, 3),
+            "mais_antigo_em": mais_antigo_em
+        }
+    except Exception as e:
+        logger.exception("Erro ao consultar fila de requerentes: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao consultar fila de sincronização.")
+
+# ====================== [ADMIN: MÉTRICAS DO POOL MONGODB] ======================
+@app.get("/api/admin/mongo/metricas")
+def metricas_pool_mongodb(usuario: str = Query(...)):
+    """
+    Métricas deste processo (cada worker tem o seu pool): espera no checkout,
+    conexões em uso/abertas, timeouts da fila e latência por comando.
+    Espera alta com conexões em uso perto de maxPoolSize indica pool pequeno.
+    """
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    return {"instancia": INSTANCIA_ID, "config": opcoes_pool_mongodb(), **metricas_mongo.instantaneo()}
+
+@app.post("/api/admin/mongo/metricas/zerar")
+def zerar_metricas_pool_mongodb(usuario: str = Query(...)):
+    """Zera contadores, máximos e latências (as conexões abertas/em uso seguem valendo)."""
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    dados = metricas_mongo.instantaneo()
+    metricas_mongo.zerar()
+    return {"instancia": INSTANCIA_ID, "config": opcoes_pool_mongodb(), **dados}
+
+# ====================== [ADMIN: CONSULTOR DE ÍNDICES] ======================
+# Cruza o uso real dos índices de `protocolos` ($indexStats, desde o último restart
+# do mongod) com o plano (explain) das consultas que a aplicação faz e com o
+# arquivo gerenciado indices.json. Índice sem uso sai apagando-o do arquivo e
+# chamando /api/admin/indices/sincronizar (ou no próximo start).
+def formas_consulta_protocolos() -> List[Tuple[str, Dict[str, Any], List[Tuple[str, int]]]]:
+    """Formatos de consulta conhecidos: (nome, filtro, ordenação)."""
+    agora = datetime.now(timezone.utc)
+    categoria = next(iter(sorted(get_allowed_categorias())), "RGI")
+    ordem_padrao = [("data_criacao_dt", DESCENDING)]
+
+    def busca(**kw) -> Dict[str, Any]:
+        return compilar_consulta(FiltroProtocolos.criar(**kw), ALLOWED_STATUS, get_allowed_categorias()).filtro
+
+    return [
+        ("busca_padrao", busca(), ordem_padrao),
+        ("busca_numero", busca(numero="00000"), ordem_padrao),
+        ("busca_cpf", busca(cpf="00000000000"), ordem_padrao),
+        ("busca_status", busca(status=["Pendente"]), ordem_padrao),
+        ("busca_categoria", busca(categoria=[categoria]), ordem_padrao),
+        ("busca_categoria_status", busca(categoria=[categoria], status=["Pendente", "Exigência"]), ordem_padrao),
+        ("busca_periodo", busca(data_inicio=(agora - timedelta(days=30)).strftime("%Y-%m-%d")), ordem_padrao),
+        ("exigencias_pendentes", {"status": {"$in": ["Pendente", "Exigência"]}}, ordem_padrao),
+        ("atrasados", filtro_atrasados(agora), ordem_padrao),
+        ("aging_em_andamento", {"status": AGING_STATUS, "data_criacao_dt": {"$gte": agora - timedelta(days=365)}}, []),
+        ("estatisticas_categoria_status", {"categoria": categoria, "status": "Concluído"}, []),
+    ]
+
+def relatorio_indices_protocolos() -> Dict[str, Any]:
+    espec = ESPEC_INDICES["protocolos"]
+    existentes = protocolos_coll.index_information()
+    # Depois de uma troca o índice fica sob o nome alternativo (nome + "__novo")
+    por_nome = {n: i for i in espec.indices for n in nomes_aceitos(i)}
+    uso: Dict[str, Dict[str, Any]] = {}
+    uso_erro = None
+    try:
+        for st in protocolos_coll.aggregate([{"$indexStats": {}}]):
+            uso[st["name"]] = {"ops": int(st.get("accesses", {}).get("ops", 0)),
+                               "desde": _serialize_value(st.get("accesses", {}).get("since"))}
+    except Exception as e:
+        uso_erro = str(e)
+
+    consultas = []
+    usados_por_consultas = set()
+    for nome, filtro, ordem in formas_consulta_protocolos():
+        item: Dict[str, Any] = {"consulta": nome}
+        try:
+            cursor = protocolos_coll.find(filtro)
+            if ordem:
+                cursor = cursor.sort(ordem)
+            plano = cursor.explain()["queryPlanner"]["winningPlan"]
+            estagios = list(estagios_plano(plano))
+            item["estagios"] = [e for e, _ in estagios]
+            item["indices"] = sorted({i for _, i in estagios if i})
+            item["collscan"] = "COLLSCAN" in item["estagios"]
+            usados_por_consultas.update(item["indices"])
+        except Exception as e:
+            item["erro"] = str(e)
+        consultas.append(item)
+
+    indices = []
+    recomendacoes = []
+    for nome, info in existentes.items():
+        i_espec = por_nome.get(nome)
+        item = {
+            "nome": nome,
+            "chaves": [list(c) for c in chaves_indice(info)],
+            "parcial": info.get("partialFilterExpression"),
+            "unico": bool(info.get("unique")),
+            "gerenciado": i_espec is not None,
+            "descricao": i_espec.descricao if i_espec else "",
+            "uso": uso.get(nome),
+        }
+        indices.append(item)
+        if nome == "_id_":
+            continue
+        if i_espec is None:
+            recomendacoes.append(f"{nome}: fora de indices.json; será removido na próxima sincronização")
+        elif nome in uso and uso[nome]["ops"] == 0 and not item["unico"] and nome not in usados_por_consultas:
+            recomendacoes.append(f"{nome}: sem uso desde {uso[nome]['desde']} e fora dos planos conhecidos; candidato a sair de indices.json")
+    for i_espec in espec.indices:
+        if nome_vigente(i_espec, existentes) is None:
+            recomendacoes.append(f"{i_espec.nome}: previsto em indices.json mas não existe; sincronize")
+    for c in consultas:
+        if c.get("collscan"):
+            recomendacoes.append(f"{c['consulta']}: plano com COLLSCAN")
+    return {
+        "indices": indices,
+        "consultas": consultas,
+        "recomendacoes": recomendacoes,
+        "uso_disponivel": uso_erro is None,
+        "uso_erro": uso_erro,
+    }
+
+@app.get("/api/admin/indices")
+def consultor_indices(usuario: str = Query(...)):
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    try:
+        return relatorio_indices_protocolos()
+    except Exception as e:
+        logger.exception("Erro ao gerar relatório de índices: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao gerar relatório de índices.")
+
+@app.post("/api/admin/indices/sincronizar")
+def sincronizar_indices_protocolos(usuario: str = Query(...)):
+    """Aplica indices.json agora (cria, recria e remove), sem esperar o próximo start."""
+    if not _is_admin_usuario(usuario):
+        raise HTTPException(status_code=403, detail="Apenas administradores podem executar esta ação")
+    global ESPEC_INDICES
+    try:
+        ESPEC_INDICES = carregar_especificacao()  # Relê o arquivo: vale o que estiver salvo agora
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"indices.json inválido: {e}")
+    relatorio = sincronizar_indices(protocolos_coll, ESPEC_INDICES["protocolos"])
+    _indices_protocolos.cache_clear()
+    logger.info(f"[MongoDB] Sincronização de índices por {usuario}: {relatorio}")
+    return relatorio
+
 
 if __name__ == "__main__":
     import uvicorn
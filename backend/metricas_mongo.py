@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# Métricas do pool de conexões e dos comandos do MongoDB (por processo).
+#
+# Os listeners do PyMongo recebem os eventos do driver: espera no checkout de
+# conexão, conexões em uso/abertas, timeouts da fila de espera e latência por
+# comando. Os listeners rodam na thread que fez a operação, então cada evento
+# só atualiza contadores sob um lock; percentis saem de uma janela das últimas
+# amostras. instantaneo() devolve tudo num dict serializável.
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+from pymongo import monitoring
+
+METRICAS_JANELA_AMOSTRAS = 1024  # Amostras recentes usadas nos percentis
+
+class SerieLatencia:
+    """Contagem, soma e máximo acumulados + percentis sobre as amostras recentes (ms)."""
+
+    def __init__(self, janela: int = METRICAS_JANELA_AMOSTRAS):
+        self.total = 0
+        self.soma_ms = 0.0
+        self.max_ms = 0.0
+        self._recentes: Deque[float] = deque(maxlen=janela)
+
+    def registrar(self, ms: float) -> None:
+        self.total += 1
+        self.soma_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self._recentes.append(ms)
+
+    def resumo(self) -> Dict[str, Any]:
+        ordenadas = sorted(self._recentes)
+
+        def percentil(p: float) -> float:
+            if not ordenadas:
+                return 0.0
+            return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+        return {
+            "total": self.total,
+            "media_ms": round(self.soma_ms / self.total, 3) if self.total else 0.0,
+            "p50_ms": round(percentil(0.50), 3),
+            "p95_ms": round(percentil(0.95), 3),
+            "p99_ms": round(percentil(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+class MetricasMongo(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """Listener único de pool e de comandos; registre com MongoClient(event_listeners=[...])."""
+
+    def __init__(self, janela: int = METRICAS_JANELA_AMOSTRAS):
+        self._lock = threading.Lock()
+        self._janela = janela
+        # Medidores do estado atual do pool: acompanham os eventos, nunca são zerados
+        self.conexoes_abertas = 0
+        self.conexoes_em_uso = 0
+        self.aguardando_checkout = 0
+        self.zerar()
+
+    def zerar(self) -> None:
+        """Zera contadores, máximos e latências; os máximos recomeçam do valor atual."""
+        with self._lock:
+            self.max_em_uso = self.conexoes_em_uso
+            self.max_aguardando = self.aguardando_checkout
+            self.checkouts_falhos: Dict[str, int] = {}
+            self.pools_limpos = 0
+            self.espera_checkout = SerieLatencia(self._janela)
+            self.comandos: Dict[str, SerieLatencia] = {}
+            self.comandos_falhos: Dict[str, int] = {}
+
+    # --- Pool de conexões ---
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pools_limpos += 1
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.conexoes_abertas += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.conexoes_abertas = max(0, self.conexoes_abertas - 1)
+
+    def connection_check_out_started(self, event) -> None:
+        with self._lock:
+            self.aguardando_checkout += 1
+            self.max_aguardando = max(self.max_aguardando, self.aguardando_checkout)
+
+    def connection_checked_out(self, event) -> None:
+        with self._lock:
+            self.aguardando_checkout = max(0, self.aguardando_checkout - 1)
+            self.conexoes_em_uso += 1
+            self.max_em_uso = max(self.max_em_uso, self.conexoes_em_uso)
+            self.espera_checkout.registrar(float(getattr(event, "duration", 0.0) or 0.0) * 1000)
+
+    def connection_check_out_failed(self, event) -> None:
+        motivo = str(getattr(event, "reason", "desconhecido"))
+        with self._lock:
+            self.aguardando_checkout = max(0, self.aguardando_checkout - 1)
+            self.checkouts_falhos[motivo] = self.checkouts_falhos.get(motivo, 0) + 1
+            self.espera_checkout.registrar(float(getattr(event, "duration", 0.0) or 0.0) * 1000)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.conexoes_em_uso = max(0, self.conexoes_em_uso - 1)
+
+    # --- Comandos ---
+    def started(self, event) -> None:
+        pass
+
+    def _serie_comando(self, nome: str) -> SerieLatencia:
+        serie = self.comandos.get(nome)
+        if serie is None:
+            serie = self.comandos[nome] = SerieLatencia(self._janela)
+        return serie
+
+    def succeeded(self, event) -> None:
+        with self._lock:
+            self._serie_comando(event.command_name).registrar(event.duration_micros / 1000)
+
+    def failed(self, event) -> None:
+        with self._lock:
+            self.comandos_falhos[event.command_name] = self.comandos_falhos.get(event.command_name, 0) + 1
+            self._serie_comando(event.command_name).registrar(event.duration_micros / 1000)
+
+    def instantaneo(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pool": {
+                    "conexoes_abertas": self.conexoes_abertas,
+                    "conexoes_em_uso": self.conexoes_em_uso,
+                    "max_em_uso": self.max_em_uso,
+                    "aguardando_checkout": self.aguardando_checkout,
+                    "max_aguardando": self.max_aguardando,
+                    "espera_checkout": self.espera_checkout.resumo(),
+                    "checkouts_falhos": dict(self.checkouts_falhos),
+                    "pools_limpos": self.pools_limpos,
+                },
+                "comandos": {
+                    nome: {**serie.resumo(), "falhas": self.comandos_falhos.get(nome, 0)}
+                    for nome, serie in sorted(self.comandos.items())
+                },
+            }
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tempo de startup: do import de backend.main até o serviço responder.
+
+Cada medição roda num processo Python novo (import a frio) e sobe a aplicação
+com o lifespan (`with TestClient(app)`), como o uvicorn faria. São medidos:
+
+- import: só o import do módulo (sem E/S no banco: conexão preguiçosa);
+- live: primeira resposta de /api/health/live (processo atendendo);
+- ready: primeira resposta 200 de /api/health/ready, que pinga o Mongo e
+  espera a etapa de esquema do líder. Meta: bem abaixo de 1s com o banco no ar.
+
+O cenário "banco fora do ar" mede só import e live: o ready não chega a 200,
+mas o processo sobe e atende sem esperar o Mongo (antes: 30 tentativas x 2s
+travando o import).
+
+Uso (na raiz do projeto, com um MongoDB real):
+    MONGO_URL=mongodb://localhost:27017/ python benchmarks/bench_startup.py [repeticoes]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+READY_TIMEOUT_SECONDS = 60
+
+MEDICAO = """
+import sys, time
+t0 = time.perf_counter()
+from backend.main import app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+esperar_ready = sys.argv[1] == "1"
+with TestClient(app) as c:
+    r = c.get("/api/health/live")
+    assert r.status_code == 200, r.text
+    t2 = time.perf_counter()
+    t3 = -1.0
+    while esperar_ready and time.perf_counter() - t0 < %d:
+        if c.get("/api/health/ready").status_code == 200:
+            t3 = time.perf_counter()
+            break
+        time.sleep(0.01)
+    assert not esperar_ready or t3 > 0, "readiness não chegou a 200"
+print(f"{t1 - t0:.4f} {t2 - t0:.4f} {(t3 - t0) if t3 > 0 else -1:.4f}")
+""" % READY_TIMEOUT_SECONDS
+
+def medir(mongo_url: str, repeticoes: int, esperar_ready: bool):
+    env = {**os.environ, "MONGO_URL": mongo_url, "DB_NAME": "protocolos_db_bench"}
+    amostras = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, "-c", MEDICAO, "1" if esperar_ready else "0"], cwd=RAIZ, env=env,
+            capture_output=True, text=True, check=True, timeout=READY_TIMEOUT_SECONDS + 60
+        ).stdout.strip().splitlines()[-1]
+        amostras.append([float(x) for x in saida.split()])
+    return [statistics.median(col) for col in zip(*amostras)]
+
+if __name__ == "__main__":
+    mongo_url = os.environ.get("MONGO_URL", "")
+    if not mongo_url or mongo_url.startswith("mongomock://"):
+        sys.exit("Defina MONGO_URL com um MongoDB real (o ready mede ping e esquema no banco).")
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cenarios = [
+        ("banco no ar", mongo_url, True),
+        ("banco fora do ar", "mongodb://127.0.0.1:1/", False),
+    ]
+    print(f"repetições: {n} (mediana)")
+    for nome, url, esperar_ready in cenarios:
+        t_import, t_live, t_ready = medir(url, n, esperar_ready)
+        ready = f"{t_ready * 1000:7.1f} ms" if t_ready > 0 else "      -   "
+        print(f"{nome:18s}: import {t_import * 1000:7.1f} ms | live {t_live * 1000:7.1f} ms | ready {ready}")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark do custo de CPU da validação na inclusão de protocolos.
+
+"antes" reproduz o fluxo anterior: validadores do ProtocoloModel consultando as
+categorias no banco, seguidos da revalidação manual feita em incluir_protocolo
+(CPF, status, categoria com nova consulta e strptime da data outra vez).
+"depois" é o pipeline atual: um único ProtocoloModel com categorias em cache.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_validacao_protocolo.py [iteracoes]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_URL", "mongomock://localhost")
+os.environ.setdefault("DB_NAME", "protocolos_db_bench")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend import main  # noqa: E402
+
+PAYLOAD = {
+    "numero": "12345",
+    "nome_requerente": "FULANO DE TAL",
+    "cpf": "529.982.247-25",
+    "whatsapp": "+55(24)99999-0000",
+    "titulo": "ABERTURA DE FIRMA",
+    "data_criacao": "2025-01-10",
+    "status": "Em andamento",
+    "categoria": "RTD",
+    "responsavel": "Operador",
+}
+
+def _categorias_do_banco():
+    main._categorias_permitidas.cache_clear()
+    return main.get_allowed_categorias()
+
+def validacao_anterior(dados):
+    # Validadores do modelo (consulta de categorias + strptime)
+    _categorias_do_banco()
+    p = main.ProtocoloModel(**dados)
+    # Revalidação manual do endpoint
+    cpf = main.apenas_digitos(dados["cpf"].strip())
+    if not main.validar_cpf(cpf):
+        raise ValueError("cpf")
+    if dados["status"].strip() not in main.ALLOWED_STATUS:
+        raise ValueError("status")
+    if dados["categoria"].strip() not in _categorias_do_banco():
+        raise ValueError("categoria")
+    datetime.strptime(dados["data_criacao"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return p
+
+def validacao_atual(dados):
+    return main.ProtocoloModel(**dados)
+
+def medir(fn, iteracoes):
+    fn(PAYLOAD)  # aquecimento
+    inicio = time.process_time()
+    for _ in range(iteracoes):
+        fn(PAYLOAD)
+    return (time.process_time() - inicio) / iteracoes * 1e6
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for i in range(20):
+        main.categorias_coll.update_one({"nome": f"SETOR{i}"}, {"$set": {"nome": f"SETOR{i}"}}, upsert=True)
+    antes = medir(validacao_anterior, n)
+    depois = medir(validacao_atual, n)
+    print(f"iterações: {n}")
+    print(f"antes : {antes:8.1f} µs CPU por inclusão")
+    print(f"depois: {depois:8.1f} µs CPU por inclusão ({antes / depois:.1f}x)")
@@ -119,6 +119,25 @@ async function refreshAccessToken() {
   }
 }
 
+// Idempotency-Key: reenvios do mesmo conteúdo reutilizam a chave até o servidor responder,
+// de modo que uma inclusão/edição repetida após falha de rede não é aplicada duas vezes.
+const chavesIdempotencia = new Map();
+
+function chaveIdempotencia(escopo, corpo) {
+  const id = `${escopo}|${corpo}`;
+  if (!chavesIdempotencia.has(id)) {
+    const nova = (window.crypto && crypto.randomUUID)
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    chavesIdempotencia.set(id, nova);
+  }
+  return chavesIdempotencia.get(id);
+}
+
+function liberarChaveIdempotencia(escopo, corpo) {
+  chavesIdempotencia.delete(`${escopo}|${corpo}`);
+}
+
 async function fetchWithAuth(url, options = {}) {
   // Check if user is logged in
   const sessao = getSessao();
@@ -183,6 +202,8 @@ async function logout() {
     }
   }
   
+  pararStreamNotificacoes();
+
   // Clear all storage
   try { sessionStorage.removeItem("sessao"); } catch {}
   try { localStorage.removeItem("access_token"); } catch {}
@@ -224,26 +245,112 @@ function brToNewline(str) {
 
 /* ====================== [BLOCO 2: SISTEMA DE NOTIFICAÇÕES] ====================== */
 let notificacoes = [];
+let notificacoesProximoCursor = null;
+let notificacoesNaoLidas = 0;
 
-async function carregarNotificacoes() {
+// Carrega a primeira página (ou a seguinte, com maisAntigas=true) e o contador de não lidas
+async function carregarNotificacoes(maisAntigas = false) {
   try {
     const sessao = getSessao();
     if (!sessao) return;
-    
-    const resp = await fetchWithAuth(`${API_ENDPOINTS.NOTIFICACOES}?usuario=${encodeURIComponent(sessao.usuario)}`);
+
+    let url = `${API_ENDPOINTS.NOTIFICACOES}?usuario=${encodeURIComponent(sessao.usuario)}`;
+    if (maisAntigas && notificacoesProximoCursor) {
+      url += `&cursor=${encodeURIComponent(notificacoesProximoCursor)}`;
+    }
+    const resp = await fetchWithAuth(url);
     if (resp.ok) {
-      notificacoes = await resp.json();
-      atualizarBadgeNotificacoes();
+      const pagina = await resp.json();
+      notificacoes = maisAntigas ? notificacoes.concat(pagina.items) : pagina.items;
+      notificacoesProximoCursor = pagina.proximo_cursor;
+      if (maisAntigas) {
+        renderizarNotificacoes();
+      } else {
+        await carregarContagemNaoLidas();
+        iniciarStreamNotificacoes();
+      }
     }
   } catch (err) {
     console.error("Erro ao carregar notificações:", err);
   }
 }
 
+async function carregarContagemNaoLidas() {
+  const sessao = getSessao();
+  if (!sessao) return;
+  const resp = await fetchWithAuth(`${API_ENDPOINTS.NOTIFICACOES}/nao-lidas/contagem?usuario=${encodeURIComponent(sessao.usuario)}`);
+  if (resp.ok) {
+    notificacoesNaoLidas = (await resp.json()).nao_lidas;
+    atualizarBadgeNotificacoes();
+  }
+}
+
+// Notificações novas chegam por Server-Sent Events; o polling fica só como fallback
+let streamNotificacoes = null;
+let streamNotificacoesUsuario = null;
+let pollingNotificacoes = null;
+
+function iniciarStreamNotificacoes() {
+  const sessao = getSessao();
+  if (!sessao) return;
+  if (streamNotificacoes && streamNotificacoesUsuario === sessao.usuario &&
+      streamNotificacoes.readyState !== EventSource.CLOSED) return;
+
+  pararStreamNotificacoes();
+  if (typeof EventSource === 'undefined') {
+    iniciarPollingNotificacoes();
+    return;
+  }
+
+  streamNotificacoesUsuario = sessao.usuario;
+  streamNotificacoes = new EventSource(`${API_ENDPOINTS.NOTIFICACOES}/stream?usuario=${encodeURIComponent(sessao.usuario)}`);
+  streamNotificacoes.addEventListener('notificacao', (ev) => {
+    try {
+      const notif = JSON.parse(ev.data);
+      if (notificacoes.some(n => n.id === notif.id)) return;
+      notificacoes.unshift(notif);
+      if (!notif.lida) notificacoesNaoLidas++;
+      atualizarBadgeNotificacoes();
+      const container = document.getElementById('notificacoes-container');
+      if (container && container.style.display === 'block') renderizarNotificacoes();
+    } catch (err) {
+      console.error("Erro ao processar notificação recebida:", err);
+    }
+  });
+  streamNotificacoes.onerror = () => {
+    // O navegador reconecta sozinho; se desistir (CLOSED), volta ao polling
+    if (streamNotificacoes && streamNotificacoes.readyState === EventSource.CLOSED) {
+      pararStreamNotificacoes();
+      iniciarPollingNotificacoes();
+    }
+  };
+}
+
+function iniciarPollingNotificacoes() {
+  if (pollingNotificacoes) return;
+  pollingNotificacoes = setInterval(() => {
+    if (getSessao()) {
+      carregarNotificacoes();
+    }
+  }, 120000);
+}
+
+function pararStreamNotificacoes() {
+  if (streamNotificacoes) {
+    streamNotificacoes.close();
+    streamNotificacoes = null;
+  }
+  streamNotificacoesUsuario = null;
+  if (pollingNotificacoes) {
+    clearInterval(pollingNotificacoes);
+    pollingNotificacoes = null;
+  }
+}
+
 function atualizarBadgeNotificacoes() {
   const badge = document.getElementById('badge-notificacoes');
-  const naoLidas = notificacoes.filter(n => !n.lida).length;
-  
+  const naoLidas = notificacoesNaoLidas;
+
   if (badge) {
     if (naoLidas > 0) {
       badge.textContent = naoLidas;
@@ -294,7 +401,13 @@ function renderizarNotificacoes() {
       </div>
     `;
   });
-  
+
+  if (notificacoesProximoCursor) {
+    html += `<div style="padding:10px;text-align:center;">
+      <button type="button" onclick="event.stopPropagation(); carregarNotificacoes(true)">Carregar mais</button>
+    </div>`;
+  }
+
   lista.innerHTML = html;
 }
 
@@ -305,6 +418,7 @@ async function marcarNotificacaoComoLida(id) {
       // Atualizar localmente
       const notifIndex = notificacoes.findIndex(n => n.id === id);
       if (notifIndex !== -1) {
+        if (!notificacoes[notifIndex].lida) notificacoesNaoLidas = Math.max(0, notificacoesNaoLidas - 1);
         notificacoes[notifIndex].lida = true;
         atualizarBadgeNotificacoes();
         renderizarNotificacoes();
@@ -619,15 +733,34 @@ function verDetalhesSetor(setor) {
   // TODO: Filter by sector after navigation
 }
 
+// Marca em lote (uma requisição) as não lidas do usuário; `tipo` restringe a um tipo
+async function marcarNotificacoesComoLidasEmLote(tipo = null) {
+  const sessao = getSessao();
+  if (!sessao) return;
+  const resp = await fetchWithAuth(`${API_ENDPOINTS.NOTIFICACOES}/ler`, {
+    method: 'PUT',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ usuario: sessao.usuario, tipo })
+  });
+  if (resp.ok) {
+    notificacoes.forEach(n => { if (!tipo || n.tipo === tipo) n.lida = true; });
+    await carregarContagemNaoLidas();
+    renderizarNotificacoes();
+  }
+}
+
+async function marcarTodasNotificacoesComoLidas() {
+  try {
+    await marcarNotificacoesComoLidasEmLote();
+  } catch (err) {
+    console.error("Erro ao marcar notificações como lidas:", err);
+  }
+}
+
 async function marcarNotificacoesAtrasosComoLidas() {
   // Mark all unread "alerta_atrasos" notifications as read
   try {
-    const notificacoesAtrasos = notificacoes.filter(n => !n.lida && n.tipo === 'alerta_atrasos');
-    for (const notif of notificacoesAtrasos) {
-      await fetchWithAuth(`/api/notificacao/${notif.id}/ler`, { method: 'PUT' });
-      notif.lida = true;
-    }
-    atualizarBadgeNotificacoes();
+    await marcarNotificacoesComoLidasEmLote('alerta_atrasos');
   } catch (err) {
     console.error("Erro ao marcar notificações como lidas:", err);
   }
@@ -776,6 +909,47 @@ function attachCpfMask(elOrId) {
   el.addEventListener("input", () => el.value = formatCpf(el.value));
 }
 
+/* ====================== [BLOCO 6.1: AUTOCOMPLETAR REQUERENTE] ====================== */
+function setupAutocompleteRequerente(cpfInput, nomeInput, whatsappInput, semCpfCheckbox) {
+  if (!cpfInput || !nomeInput) return;
+  // Um único datalist na página: cada render do formulário reaproveita o mesmo
+  let datalist = document.getElementById("requerentes-sugestoes");
+  if (!datalist) {
+    datalist = document.createElement("datalist");
+    datalist.id = "requerentes-sugestoes";
+    document.body.appendChild(datalist);
+  }
+  datalist.innerHTML = "";
+  nomeInput.setAttribute("list", datalist.id);
+  nomeInput.setAttribute("autocomplete", "off");
+  let sugestoes = [];
+
+  const buscar = debounce(async (termo) => {
+    try {
+      const resp = await fetchWithAuth(`/api/requerentes/autocomplete?q=${encodeURIComponent(termo)}&limite=8`);
+      if (!resp.ok) return;
+      sugestoes = await resp.json();
+      datalist.innerHTML = sugestoes.map(r =>
+        `<option value="${esc((r.nome_requerente || "").toUpperCase())}" label="${esc(formatCpf(r.cpf || ""))}"></option>`
+      ).join("");
+    } catch {}
+  }, 150);
+
+  nomeInput.addEventListener("input", () => {
+    const termo = nomeInput.value.trim();
+    const escolhido = sugestoes.find(r => (r.nome_requerente || "").toUpperCase() === termo.toUpperCase());
+    if (escolhido && !cpfInput.value.trim() && !(semCpfCheckbox && semCpfCheckbox.checked)) {
+      cpfInput.value = formatCpf(escolhido.cpf);
+      cpfInput.dispatchEvent(new Event("input"));
+      if (whatsappInput && escolhido.whatsapp && (whatsappInput.value === "+55(24)" || !whatsappInput.value.trim())) {
+        whatsappInput.value = escolhido.whatsapp;
+      }
+      return;
+    }
+    if (termo.length >= 2) buscar(termo);
+  });
+}
+
 /* ====================== [BLOCO 7: VALIDAÇÃO GENÉRICA E FEEDBACK] ====================== */
 function validarCamposObrigatorios(campos) {
   return campos.every(id => {
@@ -2201,6 +2375,10 @@ function navegar(pagina) {
       }
     });
 
+    // Autocompletar requerente por prefixo do nome ou do CPF
+    setupAutocompleteRequerente(cpfInput, document.getElementById("nome-requerente"),
+                                document.getElementById("whatsapp-incluir"), semCpfCheckbox);
+
     // Converter campos para maiúsculas ao digitar
     const uppercaseFields = [
       document.getElementById("nome-requerente"),
@@ -2249,12 +2427,17 @@ function navegar(pagina) {
       dados.ultima_alteracao_nome = sessao.usuario;
       mostrarLoader("Salvando protocolo...");
       
+      const corpoInclusao = JSON.stringify(dados);
       try {
         const resp = await fetchWithAuth("/api/protocolo", {
           method: "POST",
-          headers: {"Content-Type": "application/json"},
-          body: JSON.stringify(dados)
+          headers: {
+            "Content-Type": "application/json",
+            "Idempotency-Key": chaveIdempotencia("incluir", corpoInclusao)
+          },
+          body: corpoInclusao
         });
+        liberarChaveIdempotencia("incluir", corpoInclusao);
         
         esconderLoader();
         if (resp.ok) {
@@ -2679,7 +2862,8 @@ async function carregarFiltrosSalvos() {
       filtros.forEach(filtro => {
         const option = document.createElement('option');
         option.value = filtro.id;
-        option.textContent = `${filtro.nome} (${new Date(filtro.data_atualizacao).toLocaleDateString('pt-BR')})`;
+        const total = (filtro.total === null || filtro.total === undefined) ? '' : ` [${filtro.total}]`;
+        option.textContent = `${filtro.nome}${total} (${new Date(filtro.data_atualizacao).toLocaleDateString('pt-BR')})`;
         select.appendChild(option);
       });
     }
@@ -2726,7 +2910,8 @@ async function salvarFiltroAtual() {
       document.getElementById('nome-filtro').value = '';
       carregarFiltrosSalvos();
     } else {
-      mostrarMensagem('Erro ao salvar filtro', 'erro');
+      const erro = await resp.json().catch(() => ({}));
+      mostrarMensagem(erro.detail || 'Erro ao salvar filtro', 'erro');
     }
   } catch (err) {
     mostrarMensagem('Falha ao salvar filtro', 'erro');
@@ -3602,12 +3787,17 @@ function montarFormularioEditar(p) {
     dados["ultima_alteracao_nome"] = sessao.usuario;
     mostrarLoader("Salvando alterações...");
     
+    const corpoEdicao = JSON.stringify(dados);
     try {
       const resp = await fetchWithAuth('/api/protocolo/' + p.id, {
         method: 'PUT',
-        headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify(dados)
+        headers: {
+          'Content-Type': 'application/json',
+          'Idempotency-Key': chaveIdempotencia('editar:' + p.id, corpoEdicao)
+        },
+        body: corpoEdicao
       });
+      liberarChaveIdempotencia('editar:' + p.id, corpoEdicao);
       
       esconderLoader();
       if (resp.ok) {
@@ -4801,7 +4991,7 @@ async function gerenciarCategoriasAdmin() {
       <h2>🏷️ Cadastro de Categorias (Setores)</h2>
       <div style="background:#e7f3ff;padding:16px;border-radius:8px;border:1px solid #b3d9ff;margin-bottom:20px;">
         <h4 style="margin:0 0 8px 0;">Nova Categoria</h4>
-        <form id="form-categoria" autocomplete="off" style="display:grid;grid-template-columns:260px 1fr auto;gap:12px;align-items:end;">
+        <form id="form-categoria" autocomplete="off" style="display:grid;grid-template-columns:260px 1fr 140px auto;gap:12px;align-items:end;">
           <div>
             <label>Nome *</label>
             <input type="text" name="nome" required maxlength="60" style="width:100%;padding:10px;border:1px solid #ddd;border-radius:6px;">
@@ -4810,6 +5000,10 @@ async function gerenciarCategoriasAdmin() {
             <label>Descrição</label>
             <input type="text" name="descricao" maxlength="240" style="width:100%;padding:10px;border:1px solid #ddd;border-radius:6px;">
           </div>
+          <div>
+            <label title="Prazo em dias úteis para o protocolo ser considerado em atraso">Prazo (dias úteis)</label>
+            <input type="number" name="sla_dias_uteis" min="1" max="365" placeholder="30" style="width:100%;padding:10px;border:1px solid #ddd;border-radius:6px;">
+          </div>
           <div>
             <button type="submit" style="background:#007bff;color:white;border:none;padding:10px 16px;border-radius:6px;cursor:pointer;">➕ Cadastrar</button>
           </div>
@@ -4830,6 +5024,7 @@ async function gerenciarCategoriasAdmin() {
 document.getElementById("form-categoria").onsubmit = async function(e) {
   e.preventDefault();
   const dados = Object.fromEntries(new FormData(e.target).entries());
+  dados.sla_dias_uteis = dados.sla_dias_uteis ? parseInt(dados.sla_dias_uteis, 10) : null;
   mostrarLoader("Salvando categoria...");
   try {
     const resp = await fetch(`/api/categoria?usuario=${encodeURIComponent(sessao.usuario)}`, {
@@ -4882,6 +5077,9 @@ async function carregarListaCategorias() {
         <td style="padding:10px;border-bottom:1px solid #eee;">
           <input type="text" id="cat-desc-${c.id}" value="${esc(c.descricao || '')}" maxlength="240" style="width:100%;padding:8px;border:1px solid #ddd;border-radius:6px;">
         </td>
+        <td style="padding:10px;border-bottom:1px solid #eee;">
+          <input type="number" id="cat-sla-${c.id}" value="${esc(c.sla_dias_uteis || '')}" placeholder="${esc(c.sla_padrao || '')}" min="1" max="365" style="width:90px;padding:8px;border:1px solid #ddd;border-radius:6px;">
+        </td>
         <td style="padding:10px;border-bottom:1px solid #eee;text-align:center;">
           <button onclick="atualizarCategoria('${c.id}')" style="background:#28a745;color:white;border:none;padding:6px 12px;border-radius:6px;cursor:pointer;margin-right:6px;">💾 Salvar</button>
           <button onclick="excluirCategoria('${c.id}')" style="background:#dc3545;color:white;border:none;padding:6px 12px;border-radius:6px;cursor:pointer;">🗑️ Excluir</button>
@@ -4894,6 +5092,7 @@ async function carregarListaCategorias() {
           <tr style="background:#f8f9fa;">
             <th style="padding:12px;text-align:left;border-bottom:2px solid #dee2e6;">Nome</th>
             <th style="padding:12px;text-align:left;border-bottom:2px solid #dee2e6;">Descrição</th>
+            <th style="padding:12px;text-align:left;border-bottom:2px solid #dee2e6;">Prazo (dias úteis)</th>
             <th style="padding:12px;text-align:center;border-bottom:2px solid #dee2e6;">Ações</th>
           </tr>
         </thead>
@@ -4915,6 +5114,7 @@ async function atualizarCategoria(id) {
   }
   const nome = document.getElementById(`cat-nome-${id}`)?.value.trim() || "";
   const descricao = document.getElementById(`cat-desc-${id}`)?.value.trim() || "";
+  const sla = document.getElementById(`cat-sla-${id}`)?.value.trim() || "";
   if (!nome) {
     mostrarMensagem("Nome da categoria é obrigatório.", "erro");
     return;
@@ -4924,7 +5124,7 @@ async function atualizarCategoria(id) {
     const resp = await fetch(`/api/categoria/${id}?usuario=${encodeURIComponent(sessao.usuario)}`, {
       method: "PUT",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ nome, descricao })
+      body: JSON.stringify({ nome, descricao, sla_dias_uteis: sla ? parseInt(sla, 10) : null })
     });
     esconderLoader();
     if (resp.ok) {
@@ -5335,13 +5535,6 @@ document.addEventListener('DOMContentLoaded', function() {
       fecharNotificacoes();
     }
   });
-
-  // Recarregar notificações a cada 2 minutos
-  setInterval(() => {
-    if (getSessao()) {
-      carregarNotificacoes();
-    }
-  }, 120000);
 });
 
 // ====================== [BLOCO 27: UTILITÁRIOS, MODAL E OBSERVER DE FORMULÁRIOS (injeta estilos mínimos e cria createConfirmModal, initFormObserver) ====================== //
@@ -1,7 +1,48 @@
 import os
 import sys
+import tempfile
 
 # Adiciona a raiz do projeto (C:\Protocolos) ao sys.path
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
-    sys.path.insert(0, ROOT)
\ No newline at end of file
+    sys.path.insert(0, ROOT)
+
+# Antes de qualquer import de backend.main (o módulo lê o ambiente no import).
+# Todos os arquivos compartilham o mesmo banco mongomock: use números únicos.
+os.environ.setdefault("MONGO_URL", "mongomock://localhost")
+os.environ.setdefault("DB_NAME", "protocolos_db_test")
+# O log dos testes não vai para o app.log da raiz
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "protocolos_testes.log"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Testes marcados com @pytest.mark.mongodb (planos de execução via explain) precisam
+# de um servidor real; no mongomock padrão são pulados. Para rodá-los:
+#   MONGO_URL=mongodb://localhost:27017/ python -m pytest -m mongodb tests
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mongodb: precisa de um MongoDB real (MONGO_URL), ex.: explain")
+
+def pytest_collection_modifyitems(config, items):
+    if not os.environ["MONGO_URL"].startswith("mongomock://"):
+        return
+    pular = pytest.mark.skip(reason="precisa de um MongoDB real: MONGO_URL=mongodb://... python -m pytest -m mongodb tests")
+    for item in items:
+        if "mongodb" in item.keywords:
+            item.add_marker(pular)
+
+@pytest.fixture(scope="session", autouse=True)
+def esquema():
+    """Aplica índices, migrações e admin padrão uma vez, como a etapa de startup do líder."""
+    from backend.main import executar_inicializacao_esquema
+
+    relatorio = executar_inicializacao_esquema(forcar=True)
+    assert relatorio["status"] == "ok", relatorio
+    return relatorio
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente HTTP sem lifespan: os jobs em background não sobem nos testes."""
+    from backend.main import app
+
+    return TestClient(app)
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import (
+    app, protocolos_coll, atualizar_aging_protocolos, contar_dias_uteis,
+    subtract_business_days, faixa_aging, filtro_atrasados
+)
+
+def test_contar_dias_uteis_e_inverso_de_subtract_business_days():
+    base = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    for offset in range(14):
+        agora = base + timedelta(days=offset)
+        for n in (1, 5, 10, 29, 30, 31, 57):
+            assert contar_dias_uteis(subtract_business_days(agora, n), agora) == n
+    assert faixa_aging(0) == "0-10" and faixa_aging(11) == "11-20"
+    assert faixa_aging(29) == "21-29" and faixa_aging(30) == "30+"
+
+def _proto(numero, dias_corridos, status="Em andamento", agora=None):
+    criado = (agora - timedelta(days=dias_corridos)).replace(hour=0, minute=0, second=0, microsecond=0)
+    protocolos_coll.insert_one({
+        "numero": numero, "status": status, "categoria": "RGI",
+        "data_criacao": criado.strftime("%Y-%m-%d"), "data_criacao_dt": criado
+    })
+
+def test_atualizacao_incremental_e_consultas_por_atrasado(client):
+    agora = datetime.now(timezone.utc)
+    _proto("37001", 3, agora=agora)
+    _proto("37002", 60, agora=agora)
+    _proto("37003", 60, status="Concluído", agora=agora)
+    atualizar_aging_protocolos(agora)
+
+    recente = protocolos_coll.find_one({"numero": "37001"})
+    antigo = protocolos_coll.find_one({"numero": "37002"})
+    assert recente["faixa_aging"] == "0-10" and antigo["faixa_aging"] == "30+"
+    assert "atrasado" not in antigo and "prazo_dt" in antigo  # O atraso sai de prazo_dt
+    atrasados = {p["numero"] for p in protocolos_coll.find(filtro_atrasados(agora), {"numero": 1})}
+    assert "37002" in atrasados and "37001" not in atrasados
+    assert "faixa_aging" not in protocolos_coll.find_one({"numero": "37003"})
+    # Segunda execução no mesmo dia não reescreve nada
+    assert atualizar_aging_protocolos(agora)["atualizados"] == 0
+
+    numeros = {p["numero"] for p in client.get("/api/protocolo/atencao").json()}
+    assert "37002" in numeros and "37001" not in numeros
+
+    # Saindo de "Em andamento" o protocolo deixa de contar como atrasado
+    r = client.put(f"/api/protocolo/{antigo['_id']}", json={"status": "Concluído", "ultima_alteracao_nome": "t"})
+    assert r.status_code == 200
+    assert "faixa_aging" not in protocolos_coll.find_one({"numero": "37002"})
+    assert protocolos_coll.count_documents({**filtro_atrasados(agora), "numero": "37002"}) == 0
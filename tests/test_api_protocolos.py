@@ -1,13 +1,6 @@
-import os
-os.environ.setdefault("MONGO_URL", "mongomock://localhost")
-os.environ.setdefault("DB_NAME", "protocolos_db_test")
+from backend.main import db
 
-from fastapi.testclient import TestClient
-from backend.main import app, db
-
-client = TestClient(app)
-
-def test_fluxo_protocolo_crud():
+def test_fluxo_protocolo_crud(client):
     # login (não há sessão, mas endpoint existe)
     r = client.post("/api/login", json={"usuario":"Edvaldo","senha":"200482"})
     assert r.status_code in (200, 401)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import protocolos_coll
+
+def test_protocolos_por_setor_limitados_e_mais_atrasados_primeiro(client):
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    protocolos_coll.insert_many([
+        {"numero": f"40{i:03d}", "status": "Em andamento", "categoria": "SET40",
+         "nome_requerente": f"R{i}", "data_criacao": "2023-12-01", "responsavel": "x",
+         "data_criacao_dt": base - timedelta(days=60), "prazo_dt": base + timedelta(days=i)}
+        for i in range(15)
+    ])
+    r = client.get("/api/protocolo/atencao-por-setor", params={"limite": 4})
+    assert r.status_code == 200
+    setor = next(s for s in r.json()["setores"] if s["setor"] == "SET40")
+    assert setor["total"] == 15
+    assert [p["numero"] for p in setor["protocolos"]] == ["40000", "40001", "40002", "40003"]
+    assert set(setor["protocolos"][0]) == {"numero", "nome_requerente", "data_criacao", "responsavel"}
+    assert client.get("/api/protocolo/atencao-por-setor", params={"limite": 0}).status_code == 422
+
+def test_firstn_so_e_desligado_quando_o_operador_nao_existe(monkeypatch, client):
+    import backend.main as m
+    from pymongo.errors import OperationFailure
+
+    def falha(codigo):
+        def _f(filtro, limite):
+            raise OperationFailure("falha", code=codigo)
+        return _f
+
+    monkeypatch.setitem(m._agregacao_suporte, "firstN", True)
+    monkeypatch.setattr(m, "_atencao_por_setor_firstn", falha(50))  # MaxTimeMSExpired
+    assert client.get("/api/protocolo/atencao-por-setor").status_code == 200
+    assert m._agregacao_suporte["firstN"] is True
+
+    monkeypatch.setattr(m, "_atencao_por_setor_firstn", falha(168))  # InvalidPipelineOperator
+    assert client.get("/api/protocolo/atencao-por-setor").status_code == 200
+    assert m._agregacao_suporte["firstN"] is False
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.main import protocolos_excluidos_coll, migrar_resumo_auditoria
+
+def test_resumo_da_auditoria_sem_snapshot_e_migracao_de_registros_antigos(client):
+    protocolos_excluidos_coll.insert_one({
+        "protocolo_original": {"categoria": "RGI", "status": "Pendente", "data_criacao": "2024-05-02",
+                               "responsavel": "Ana", "titulo": "Escritura", "observacoes": "x" * 1000},
+        "protocolo_id_original": "abc", "numero": "41001", "nome_requerente": "Fulano", "cpf": "",
+        "exclusao_timestamp": "2025-01-10 10:00:00 UTC",
+        "exclusao_timestamp_dt": datetime(2025, 1, 10, 10, tzinfo=timezone.utc),
+        "admin_responsavel": "adm41", "motivo": "teste"
+    })
+    assert migrar_resumo_auditoria() >= 1
+
+    r = client.get("/api/auditoria/exclusoes", params={"admin": "adm41", "data_inicio": "2025-01-10", "data_fim": "2025-01-10"})
+    assert r.status_code == 200
+    [reg] = r.json()["registros"]
+    assert reg["categoria"] == "RGI" and reg["status_original"] == "Pendente" and reg["responsavel"] == "Ana"
+    assert "protocolo_original" not in reg
+
+    csv_txt = client.get("/api/auditoria/exclusoes/export", params={"numero_protocolo": "41001"}).content.decode("utf-8-sig")
+    assert "41001,Fulano,,RGI,Pendente,2024-05-02,Ana,Escritura" in csv_txt
+
+    assert client.get("/api/auditoria/exclusoes", params={"data_inicio": "10/01/2025"}).status_code == 400
+    assert "admin_responsavel_1_exclusao_timestamp_dt_-1__id_-1" in protocolos_excluidos_coll.index_information()
+
+def test_exportacao_comprime_quando_cliente_aceita_gzip(client):
+    r = client.get("/api/auditoria/exclusoes/export", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.content.decode("utf-8-sig").startswith("Número,Nome Requerente")
+    r = client.get("/api/auditoria/exclusoes/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+
+def test_indice_coberto_guarda_ordem_e_todos_os_campos_do_resumo():
+    from backend.main import AUDITORIA_ORDEM, AUDITORIA_RESUMO_CAMPOS, ESPEC_INDICES
+
+    [coberto] = [i for i in ESPEC_INDICES["protocolos_excluidos"].indices if i.nome == "auditoria_resumo_coberto"]
+    campos = [c for c, _ in coberto.chaves]
+    assert list(coberto.chaves[:2]) == [(c, d) for c, d in AUDITORIA_ORDEM]
+    assert set(AUDITORIA_RESUMO_CAMPOS) <= set(campos)
+    assert "auditoria_resumo_coberto" in protocolos_excluidos_coll.index_information()
+
+@pytest.mark.mongodb
+def test_listagem_da_auditoria_nao_le_documentos():
+    from backend.indices import estagios_plano
+    from backend.main import AUDITORIA_ORDEM, AUDITORIA_RESUMO_PROJECAO, filtro_auditoria_exclusoes
+
+    for periodo in ((None, None), ("2025-01-01", "2025-01-31")):
+        filtro = filtro_auditoria_exclusoes(*periodo, None, None)
+        cursor = protocolos_excluidos_coll.find(filtro, AUDITORIA_RESUMO_PROJECAO).sort(AUDITORIA_ORDEM).limit(50)
+        explain = cursor.explain()
+        estagios = list(estagios_plano(explain["queryPlanner"]["winningPlan"]))
+        assert ("IXSCAN", "auditoria_resumo_coberto") in estagios, estagios
+        assert "FETCH" not in {e for e, _ in estagios}, estagios
+        assert explain["executionStats"]["totalDocsExamined"] == 0
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta, timezone
+
+from backend.calendario import CalendarioDiasUteis, pascoa
+from backend.main import usuarios_coll, contar_dias_uteis
+
+def _subtrair_dia_a_dia(cal, d, n):
+    while n > 0:
+        d -= timedelta(days=1)
+        if cal.eh_dia_util(d):
+            n -= 1
+    return d
+
+def test_aritmetica_por_bisect_equivale_a_andar_dia_a_dia():
+    cal = CalendarioDiasUteis(ano_inicio=2024, ano_fim=2026)
+    for offset in range(0, 400, 7):
+        d = date(2024, 6, 1) + timedelta(days=offset)
+        for n in (1, 5, 30, 120):
+            anterior = cal.subtrair(d, n)
+            assert anterior == _subtrair_dia_a_dia(cal, d, n)
+            assert cal.contar(anterior, d) == n
+            assert cal.subtrair(cal.somar(anterior, n), n) == anterior
+
+def test_feriados_moveis_e_extensao_do_intervalo():
+    assert pascoa(2025) == date(2025, 4, 20)
+    cal = CalendarioDiasUteis(ano_inicio=2025, ano_fim=2025)
+    # Carnaval 2025: 3 e 4 de março; sexta 28/02 -> quarta 05/03 é 1 dia útil
+    assert not cal.eh_dia_util(date(2025, 3, 3)) and not cal.eh_dia_util(date(2025, 3, 4))
+    assert cal.somar(date(2025, 2, 28), 1) == date(2025, 3, 5)
+    # Fora do intervalo inicial o calendário se estende sozinho
+    assert cal.somar(date(2025, 12, 30), 3) == date(2026, 1, 5)
+    assert cal.subtrair(datetime(2025, 1, 2, 10, tzinfo=timezone.utc), 1) == datetime(2024, 12, 31, 10, tzinfo=timezone.utc)
+
+def test_ano_1_e_extensao_concorrente():
+    from concurrent.futures import ThreadPoolExecutor
+
+    cal = CalendarioDiasUteis(ano_inicio=2025, ano_fim=2025)
+    # 01/01/0001 é feriado (Confraternização); a extensão para no ano 1 sem date(0, 1, 1)
+    assert not cal.eh_dia_util(date(1, 1, 1)) and cal.eh_dia_util(date(1, 1, 2))
+
+    referencia = CalendarioDiasUteis(ano_inicio=1990, ano_fim=2060)
+    cal = CalendarioDiasUteis(ano_inicio=2025, ano_fim=2025)
+    casos = [(date(2025, 1, 1) + timedelta(days=-3000 + 97 * k), 20 + k % 400) for k in range(120)]
+
+    def conta(caso):
+        inicio, dias = caso
+        return cal.contar(inicio, inicio + timedelta(days=dias))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resultados = list(pool.map(conta, casos))
+    assert resultados == [referencia.contar(i, i + timedelta(days=d)) for i, d in casos]
+
+def test_feriado_municipal_cadastrado_entra_na_contagem(client):
+    usuarios_coll.update_one({"usuario": "adm38"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    inicio = datetime(2031, 6, 2, tzinfo=timezone.utc)  # segunda-feira
+    fim = datetime(2031, 6, 9, tzinfo=timezone.utc)
+    antes = contar_dias_uteis(inicio, fim)
+    r = client.post("/api/feriado", params={"usuario": "adm38"}, json={"data": "2031-06-03", "descricao": "Aniversário da cidade"})
+    assert r.status_code == 200
+    assert contar_dias_uteis(inicio, fim) == antes - 1
+    feriados = client.get("/api/feriados", params={"ano": 2031}).json()
+    assert {"data": "2031-06-03", "descricao": "Aniversário da cidade", "origem": "cadastrado"} in feriados
+    assert client.post("/api/feriado", params={"usuario": "comum"}, json={"data": "2031-06-04"}).status_code == 403
+    assert client.delete("/api/feriado/2031-06-03", params={"usuario": "adm38"}).status_code == 200
+    assert contar_dias_uteis(inicio, fim) == antes
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from itertools import combinations
+
+import pytest
+
+from backend.consulta_protocolos import (
+    FiltroInvalido, FiltroProtocolos, compilar_consulta,
+    INDICE_CATEGORIA_STATUS_DATA, INDICE_NUMERO, INDICE_STATUS_DATA,
+)
+
+STATUS = {"Pendente", "Em andamento", "Concluído", "Exigência"}
+CATEGORIAS = {"RGI", "RTD", "Notas"}
+
+def test_compila_filtros_normalizados_com_hint():
+    spec = FiltroProtocolos.criar(cpf="123.456.789-09", status=["Pendente", "Exigência"], categoria=["IDT", " RTD "])
+    consulta = compilar_consulta(spec, STATUS, CATEGORIAS)
+    assert consulta.filtro == {"$and": [
+        {"cpf": "12345678909"},
+        {"status": {"$in": ["Pendente", "Exigência"]}},
+        {"categoria": {"$in": ["RTD"]}},
+    ]}
+    assert compilar_consulta(FiltroProtocolos.criar(status=["Pendente"], categoria=["RGI"]), STATUS, CATEGORIAS).hint == INDICE_CATEGORIA_STATUS_DATA
+    assert compilar_consulta(FiltroProtocolos.criar(status=["Pendente"]), STATUS, CATEGORIAS).hint == INDICE_STATUS_DATA
+    assert compilar_consulta(FiltroProtocolos.criar(q="0420"), STATUS, CATEGORIAS).hint == INDICE_NUMERO
+
+    datas = compilar_consulta(FiltroProtocolos.criar(data_inicio="2024-01-01", data_fim="2024-01-31"), STATUS, CATEGORIAS)
+    assert datas.filtro["data_criacao_dt"]["$gte"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert datas.filtro["data_criacao_dt"]["$lte"] == datetime(2024, 1, 31, 23, 59, 59, tzinfo=timezone.utc)
+
+def test_filtros_invalidos():
+    with pytest.raises(FiltroInvalido, match="Status inválido"):
+        compilar_consulta(FiltroProtocolos.criar(status=["Arquivado"]), STATUS, CATEGORIAS)
+    with pytest.raises(FiltroInvalido, match="Categoria inválida"):
+        compilar_consulta(FiltroProtocolos.criar(categoria=["XYZ"]), STATUS, CATEGORIAS)
+    with pytest.raises(FiltroInvalido, match="Data inválida"):
+        compilar_consulta(FiltroProtocolos.criar(data_inicio="01/02/2024"), STATUS, CATEGORIAS)
+    with pytest.raises(FiltroInvalido, match="desconhecido"):
+        FiltroProtocolos.de_dict({"numero": "1", "ordem": "x"})
+    assert FiltroProtocolos.de_dict({"categoria": ["IDT"], "q": " a "}).para_dict() == {"categoria": ["RTD"], "q": "a"}
+
+# Cada campo com um valor representativo; o teste cobre todas as combinações
+VALORES_FILTRO = {
+    "numero": "42001",
+    "cpf": "12345678909",
+    "status": ["Pendente", "Exigência"],
+    "categoria": ["RGI"],
+    "q": "escritura",
+    "data_inicio": "2024-01-01",
+    "data_fim": "2024-12-31",
+}
+
+CAMPOS_ORDEM = ("data_criacao_dt", "numero", "nome_requerente", "nome_parte_ato", "status", "categoria", "cpf", "data_retirada_dt")
+PAGINA = 50
+
+def _massa_explain(n=2000):
+    """Valores seletivos: cpf 1/200, status 1/4, categoria 1/3, ano 1/3, "escritura" em 5%."""
+    status, categorias = sorted(STATUS), sorted(CATEGORIAS)
+    for i in range(n):
+        criacao = datetime(2023 + i % 3, 1 + i % 12, 1 + i % 28, tzinfo=timezone.utc)
+        yield {
+            "numero": f"{42000 + i}", "cpf": f"{12345678000 + i % 200:011d}",
+            "status": status[i % 4], "categoria": categorias[i % 3],
+            "nome_requerente": f"Requerente {i % 97}", "nome_parte_ato": f"Parte {i % 89}",
+            "titulo": "Escritura" if i % 20 == 0 else "Registro",
+            "data_criacao_dt": criacao, "data_retirada_dt": criacao if i % 2 else None,
+        }
+
+@pytest.mark.mongodb
+def test_toda_combinacao_de_filtros_e_ordenacao_examina_so_o_necessario():
+    """
+    Para cada combinação de filtros e cada campo de ordenação da busca, a página
+    (hint como na aplicação) usa o índice escolhido pelo compilador, sem COLLSCAN,
+    e não examina mais documentos/chaves do que os que casam com a parte indexável
+    do filtro (tudo menos `q`, que é regex sem âncora), nem menos que uma página.
+    Sem filtro, ordenar por campo indexado lê só a página.
+    """
+    from backend.indices import chaves_indice, estagios_plano, sincronizar_indices
+    from backend.main import ESPEC_INDICES, protocolos_coll
+
+    coll = protocolos_coll.database["protocolos_explain"]
+    coll.drop()
+    coll.insert_many(list(_massa_explain()))
+    sincronizar_indices(coll, ESPEC_INDICES["protocolos"])
+    chaves_por_nome = {nome: chaves_indice(info) for nome, info in coll.index_information().items()}
+
+    campos = list(VALORES_FILTRO)
+    for n in range(len(campos) + 1):
+        for combo in combinations(campos, n):
+            valores = {c: VALORES_FILTRO[c] for c in combo}
+            sem_q = compilar_consulta(FiltroProtocolos.criar(**{k: v for k, v in valores.items() if k != "q"}), STATUS, CATEGORIAS)
+            limite = max(coll.count_documents(sem_q.filtro), PAGINA) + 5
+            for campo in CAMPOS_ORDEM:
+                consulta = compilar_consulta(FiltroProtocolos.criar(**valores), STATUS, CATEGORIAS, campo)
+                cursor = coll.find(consulta.filtro).sort(campo, -1).limit(PAGINA)
+                if consulta.hint:
+                    cursor = cursor.hint(consulta.hint_lista)
+                explain = cursor.explain()
+                estagios = list(estagios_plano(explain["queryPlanner"]["winningPlan"]))
+                if consulta.hint:
+                    usados = {chaves_por_nome.get(nome) for estagio, nome in estagios if estagio == "IXSCAN"}
+                    assert tuple(consulta.hint) in usados, (combo, campo, estagios)
+                    assert "COLLSCAN" not in {e for e, _ in estagios}, (combo, campo, estagios)
+                else:
+                    # Sem hint só quando nada indexável foi filtrado e a ordenação não tem índice
+                    assert set(combo) <= {"q"} and campo not in ("data_criacao_dt", "numero", "cpf"), (combo, campo)
+                stats = explain["executionStats"]
+                examinados = (stats["totalDocsExamined"], stats["totalKeysExamined"])
+                assert max(examinados) <= limite, (combo, campo, examinados, limite)
+                if not combo and campo in ("data_criacao_dt", "numero", "cpf"):
+                    assert stats["totalDocsExamined"] <= PAGINA, (campo, examinados)
+    coll.drop()
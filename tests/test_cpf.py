@@ -1,6 +1,4 @@
-import os
 # usar mongomock para não conectar ao Mongo real ao importar o backend
-os.environ.setdefault("MONGO_URL", "mongomock://localhost")
 from backend.main import validar_cpf, apenas_digitos
 
 def test_apenas_digitos():
@@ -0,0 +1,97 @@
+import inspect
+
+import backend.main as m
+from backend.db_connection import DBConnection
+
+def test_repositorio_compartilhado_pelo_processo():
+    repo = DBConnection.compartilhada(m.MONGO_URL, m.DB_NAME)
+    assert repo is m.repositorio
+    assert m.client is repo.client
+    assert m.protocolos_coll is repo.protocolos and m.usuarios_coll is repo.usuarios
+
+def test_iterar_protocolos_gera_sob_demanda_com_projecao():
+    fake = DBConnection.em_memoria("db_connection_iter")
+    for i in range(5):
+        fake.salvar_protocolo({"numero": f"5000{i}", "categoria": "Registro", "historico_alteracoes": [1, 2]})
+    gerador = fake.iterar_protocolos({"categoria": "Registro"}, {"numero": 1, "_id": 0}, ordem=[("numero", -1)], batch_size=2)
+    assert inspect.isgenerator(gerador)
+    assert [d for d in gerador] == [{"numero": f"5000{i}"} for i in reversed(range(5))]
+    assert [d["numero"] for d in fake.pagina_protocolos({}, limite=2, skip=1, ordem=[("numero", 1)])] == ["50001", "50002"]
+    assert fake.contar_protocolos({"numero": {"$gte": "50003"}}) == 2
+
+def test_endpoints_usam_repositorio_injetado(client):
+    fake = DBConnection.em_memoria("db_connection_fake")
+    m.app.dependency_overrides[m.obter_repositorio] = lambda: fake
+    try:
+        r = client.get("/api/protocolo", params={"numero": "50099"})
+        assert r.status_code == 200 and r.json()["total"] == 0
+
+        pid = fake.salvar_protocolo({"numero": "50099", "categoria": "Registro", "status": "Em andamento"})
+        r = client.get("/api/protocolo", params={"numero": "50099"})
+        assert r.json()["total"] == 1 and r.json()["items"][0]["numero"] == "50099"
+
+        r = client.get(f"/api/protocolo/{pid}")
+        assert r.status_code == 200 and r.json()["numero"] == "50099"
+        assert m.protocolos_coll.find_one({"numero": "50099"}) is None
+    finally:
+        m.app.dependency_overrides.pop(m.obter_repositorio, None)
+
+def test_hint_e_atrasos_usam_o_repositorio_injetado(client):
+    from datetime import datetime, timezone
+
+    from backend.consulta_protocolos import FiltroProtocolos
+
+    consulta = m.compilar_filtro_protocolos(FiltroProtocolos.criar(numero="50098"))
+    fake = DBConnection.em_memoria("db_connection_atrasos")
+    assert m.hint_protocolos(consulta) == consulta.hint_lista
+    assert m.hint_protocolos(consulta, fake) is None  # o fake não tem os índices
+
+    fake.usuarios.insert_one({"usuario": "adm50", "senha": m.hash_password("s50"), "tipo": "admin"})
+    fake.salvar_protocolo({"numero": "50098", "status": "Em andamento", "prazo_dt": datetime(2020, 1, 1, tzinfo=timezone.utc)})
+    m.app.dependency_overrides[m.obter_repositorio] = lambda: fake
+    try:
+        r = client.post("/api/admin/verificar-atrasos", json={"usuario": "adm50", "senha": "s50"})
+        assert r.status_code == 200 and r.json()["atrasados"] == 1 and r.json()["notificacoes_criadas"] == 1
+        assert "50098" in fake.notificacoes.find_one({"usuario": "adm50"})["mensagem"]
+        assert m.notificacoes_coll.find_one({"usuario": "adm50"}) is None
+    finally:
+        m.app.dependency_overrides.pop(m.obter_repositorio, None)
+
+def test_escritas_e_notificacoes_usam_o_repositorio_injetado(client):
+    fake = DBConnection.em_memoria("db_connection_escritas")
+    fake.usuarios.insert_one({"usuario": "adm51", "senha": m.hash_password("s51"), "tipo": "admin"})
+    fake.categorias.insert_one({"nome": "SETOR51", "sla_dias_uteis": 5})
+    m.app.dependency_overrides[m.obter_repositorio] = lambda: fake
+    try:
+        r = client.post("/api/protocolo", json={
+            "numero": "50101", "nome_requerente": "Fulano", "cpf": "505.101.510-78", "titulo": "Registro",
+            "data_criacao": "2025-01-10", "status": "Pendente", "categoria": "RGI", "responsavel": "adm51",
+        })
+        assert r.status_code == 200, r.text
+        pid = r.json()["id"]
+        assert fake.protocolo_por_numero("50101")["prazo_dt"] is not None
+        assert fake.requerentes.find_one({"cpf": "50510151078"}) is not None
+
+        # Categoria que só existe no repositório injetado: SLA e validação vêm dele
+        r = client.put(f"/api/protocolo/{pid}", json={"categoria": "SETOR51", "ultima_alteracao_nome": "adm51"})
+        assert r.status_code == 200, r.text
+        prot = fake.protocolo_por_id(m.ObjectId(pid))
+        assert prot["categoria"] == "SETOR51" and len(prot["historico_alteracoes"]) == 2
+        assert m.as_utc(prot["prazo_dt"]) == m.calcular_prazo(m.as_utc(prot["data_criacao_dt"]), "SETOR51", fake)
+        assert client.get("/api/protocolo", params={"categoria": "SETOR51"}).json()["total"] == 1
+
+        assert client.delete(f"/api/protocolo/{pid}", params={"usuario": "adm51"}).status_code == 200
+        assert fake.protocolo_por_id(m.ObjectId(pid))["status"] == "EXCLUIDO"
+        r = client.post(f"/api/protocolo/{pid}/excluir-definitivamente", json={"usuario": "adm51", "senha": "s51"})
+        assert r.status_code == 200 and fake.protocolo_por_id(m.ObjectId(pid)) is None
+        assert fake.protocolos_excluidos.find_one({"numero": "50101"}) is not None
+
+        assert client.post("/api/notificacoes/exemplo", json={"usuario": "adm51", "mensagem": "oi"}).status_code == 200
+        assert client.get("/api/notificacoes/nao-lidas/contagem", params={"usuario": "adm51"}).json()["nao_lidas"] == 1
+        assert client.put("/api/notificacoes/ler", json={"usuario": "adm51"}).json()["marcadas"] == 1
+
+        for nome, coll in (("protocolos", m.protocolos_coll), ("protocolos_excluidos", m.protocolos_excluidos_coll),
+                           ("notificacoes", m.notificacoes_coll), ("requerentes", m.requerentes_coll)):
+            assert coll.find_one({"$or": [{"numero": "50101"}, {"usuario": "adm51"}, {"cpf": "50510151078"}]}) is None, nome
+    finally:
+        m.app.dependency_overrides.pop(m.obter_repositorio, None)
@@ -0,0 +1,18 @@
+import gzip
+
+from backend.exportacao import csv_em_blocos, gzip_em_fluxo
+
+def test_csv_sai_em_blocos_de_tamanho_limitado():
+    linhas = ((i, "nome " * 10, "ção") for i in range(5000))
+    blocos = list(csv_em_blocos(["id", "nome", "obs"], linhas, tamanho_bloco=16 * 1024))
+    assert len(blocos) > 1
+    assert all(len(b) < 18 * 1024 for b in blocos)
+    texto = b"".join(blocos).decode("utf-8")
+    assert texto.startswith("\ufeffid,nome,obs\r\n")
+    assert texto.count("\r\n") == 5001
+
+def test_gzip_em_fluxo_gera_arquivo_valido():
+    blocos = list(csv_em_blocos(["a"], ([i] for i in range(20000))))
+    comprimido = b"".join(gzip_em_fluxo(iter(blocos)))
+    assert gzip.decompress(comprimido) == b"".join(blocos)
+    assert len(comprimido) < len(b"".join(blocos))
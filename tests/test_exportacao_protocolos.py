@@ -0,0 +1,37 @@
+import csv
+import io
+
+from backend.main import app
+from backend.exportacao import xlsx_disponivel
+
+def _criar(client, numero, status, data):
+    r = client.post("/api/protocolo", json={
+        "numero": numero, "nome_requerente": "Exportado Teste", "sem_cpf": True, "titulo": "Exportação 43",
+        "data_criacao": data, "status": status, "categoria": "RGI", "responsavel": "Ana"
+    })
+    assert r.status_code == 200, r.text
+
+def test_exporta_busca_inteira_em_csv_com_colunas_escolhidas(client):
+    for i in range(120):
+        _criar(client, f"43{i:03d}", "Pendente" if i % 2 else "Concluído", "2024-03-10")
+
+    r = client.get("/api/protocolo/export", params={
+        "q": "Exportação 43", "status": "Pendente", "colunas": "numero,status", "sort_by": "numero", "sort_dir": "asc"
+    })
+    assert r.status_code == 200
+    assert r.headers["content-disposition"].startswith("attachment; filename=protocolos_")
+    linhas = list(csv.reader(io.StringIO(r.content.decode("utf-8-sig"))))
+    assert linhas[0] == ["Número", "Status"]
+    # Sem o teto de 100 por página da busca
+    assert len(linhas) == 61
+    assert linhas[1] == ["43001", "Pendente"] and linhas[-1] == ["43119", "Pendente"]
+
+def test_exportacao_valida_colunas_formato_e_filtros(client):
+    assert client.get("/api/protocolo/export", params={"colunas": "numero,historico_alteracoes"}).status_code == 400
+    assert client.get("/api/protocolo/export", params={"formato": "pdf"}).status_code == 400
+    assert client.get("/api/protocolo/export", params={"status": "Inexistente"}).status_code == 400
+    r = client.get("/api/protocolo/export", params={"formato": "xlsx", "numero": "43000"})
+    if xlsx_disponivel():
+        assert r.status_code == 200 and r.content[:2] == b"PK"
+    else:
+        assert r.status_code == 501
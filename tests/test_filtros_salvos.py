@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import filtros_coll, atualizar_contagens_filtros
+
+def _criar(client, numero, status):
+    r = client.post("/api/protocolo", json={
+        "numero": numero, "nome_requerente": "Filtro Salvo", "sem_cpf": True, "titulo": "Escritura filtro45",
+        "data_criacao": "2024-06-03", "status": status, "categoria": "RGI", "responsavel": "Ana"
+    })
+    assert r.status_code == 200, r.text
+
+def test_salva_valida_executa_e_reconta_filtro(client):
+    for i in range(3):
+        _criar(client, f"4500{i}", "Pendente")
+    _criar(client, "45009", "Concluído")
+
+    tela = {"palavra": "filtro45", "status": ["Pendente"], "categoria": [], "numero": "", "sort_by": "numero",
+            "sort_dir": "asc", "per_page": "2", "periodo_relativo": ""}
+    r = client.post("/api/filtros/salvar", json={"nome": "Pendentes 45", "usuario": "user45", "filtros": tela})
+    assert r.status_code == 200 and r.json()["total"] == 3
+    fid = r.json()["id"]
+    assert filtros_coll.find_one({"nome": "Pendentes 45"})["consulta"] == {"status": ["Pendente"], "q": "filtro45"}
+
+    r = client.get(f"/api/filtros/{fid}/executar", params={"usuario": "user45"})
+    assert r.status_code == 200
+    dados = r.json()
+    assert dados["total"] == 3 and dados["pages"] == 2
+    assert [p["numero"] for p in dados["items"]] == ["45000", "45001"]
+    assert client.get(f"/api/filtros/{fid}/executar", params={"usuario": "outro"}).status_code == 404
+
+    # Contagem vencida é refeita em background
+    _criar(client, "45003", "Pendente")
+    filtros_coll.update_one({"nome": "Pendentes 45"}, {"$set": {"total_atualizado_dt": datetime.now(timezone.utc) - timedelta(hours=1)}})
+    rel = atualizar_contagens_filtros()
+    assert rel["recontados"] >= 1 and rel["contagem_ms"] >= 0 and rel["mais_lento_id"]
+    [f] = client.get("/api/filtros", params={"usuario": "user45"}).json()
+    assert f["total"] == 4 and f["filtros"]["palavra"] == "filtro45"
+
+    # Sem uso recente: fica de fora da recontagem; listar não grava nada, executar volta a usar
+    antigo = datetime.now(timezone.utc) - timedelta(days=30)
+    filtros_coll.update_one({"nome": "Pendentes 45"}, {"$set": {"usado_dt": antigo, "total_atualizado_dt": antigo}})
+    atualizar_contagens_filtros()
+    antes = filtros_coll.find_one({"nome": "Pendentes 45"})
+    assert antes["total_atualizado_dt"] < datetime.now() - timedelta(days=1)
+    client.get("/api/filtros", params={"usuario": "user45"})
+    assert filtros_coll.find_one({"nome": "Pendentes 45"}) == antes
+    assert client.get(f"/api/filtros/{antes['_id']}/executar", params={"usuario": "user45"}).status_code == 200
+    depois = filtros_coll.find_one({"nome": "Pendentes 45"})
+    assert depois["usado_dt"] > datetime.now() - timedelta(days=1) and depois["total"] == 4
+    assert "usuario_1_data_atualizacao_-1" in filtros_coll.index_information()
+
+def test_filtro_invalido_e_recusado_ao_salvar(client):
+    for filtros in ({"status": ["Arquivado"]}, {"data_inicio": "03/06/2024"}, {"campo_x": "1"}):
+        r = client.post("/api/filtros/salvar", json={"nome": "Ruim", "usuario": "user45", "filtros": filtros})
+        assert r.status_code == 400, filtros
+    assert filtros_coll.count_documents({"nome": "Ruim"}) == 0
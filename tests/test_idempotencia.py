@@ -0,0 +1,35 @@
+from backend.main import protocolos_coll
+
+PAYLOAD = {
+    "numero": "29001",
+    "nome_requerente": "Fulano Idempotente",
+    "cpf": "62819482112",
+    "titulo": "Registro",
+    "data_criacao": "2025-03-03",
+    "status": "Pendente",
+    "categoria": "RTD",
+    "responsavel": "Operador",
+}
+
+def test_reenvio_de_inclusao_devolve_resposta_original(client):
+    headers = {"Idempotency-Key": "inc-29001"}
+    r1 = client.post("/api/protocolo", json=PAYLOAD, headers=headers)
+    assert r1.status_code == 200, r1.text
+    r2 = client.post("/api/protocolo", json=PAYLOAD, headers=headers)
+    assert r2.status_code == 200
+    assert r2.json() == r1.json()
+    assert r2.headers.get("Idempotent-Replay") == "true"
+    assert protocolos_coll.count_documents({"numero": "29001"}) == 1
+
+    # Mesma chave com outro conteúdo é rejeitada
+    r3 = client.post("/api/protocolo", json={**PAYLOAD, "titulo": "Outro"}, headers=headers)
+    assert r3.status_code == 422
+
+def test_reenvio_de_edicao_nao_duplica_historico(client):
+    pid = str(protocolos_coll.find_one({"numero": "29001"})["_id"])
+    body = {"titulo": "Registro Alterado", "ultima_alteracao_nome": "Operador"}
+    headers = {"Idempotency-Key": "edit-29001"}
+    assert client.put(f"/api/protocolo/{pid}", json=body, headers=headers).status_code == 200
+    assert client.put(f"/api/protocolo/{pid}", json=body, headers=headers).status_code == 200
+    historico = protocolos_coll.find_one({"numero": "29001"})["historico_alteracoes"]
+    assert [h["acao"] for h in historico] == ["criar", "editar"]
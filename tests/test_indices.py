@@ -0,0 +1,112 @@
+import json
+
+import mongomock
+from pymongo.errors import OperationFailure
+
+from backend.indices import carregar_especificacao, sincronizar_indices
+from backend.main import create_indexes, protocolos_coll, usuarios_coll
+
+class ColecaoComoServidor:
+    """mongomock aceita dois índices iguais com nomes diferentes; o mongod recusa (código 85)."""
+
+    def __init__(self, colecao):
+        self._colecao = colecao
+
+    def __getattr__(self, nome):
+        return getattr(self._colecao, nome)
+
+    def create_index(self, chaves, **opcoes):
+        for existente, info in self._colecao.index_information().items():
+            mesmas_opcoes = all(info.get(k) == opcoes.get(k) for k in ("unique", "partialFilterExpression", "sparse"))
+            if existente != opcoes.get("name") and [tuple(c) for c in info["key"]] == list(chaves) and mesmas_opcoes:
+                raise OperationFailure("Index already exists with a different name", code=85)
+        return self._colecao.create_index(chaves, **opcoes)
+
+def _espec(tmp_path, colecao, indices, remover=True):
+    caminho = tmp_path / f"{colecao}.json"
+    caminho.write_text(json.dumps({"colecoes": {colecao: {"remover_nao_listados": remover, "indices": indices}}}), encoding="utf-8")
+    return carregar_especificacao(str(caminho))[colecao]
+
+def test_sincroniza_cria_recria_e_remove_pelo_arquivo(tmp_path):
+    colecao = ColecaoComoServidor(mongomock.MongoClient().db.indices46)
+    colecao.create_index([("status", 1)])
+    colecao.create_index([("prazo_dt", 1)])
+    caminho = tmp_path / "indices.json"
+    caminho.write_text(json.dumps({"colecoes": {"indices46": {"remover_nao_listados": True, "indices": [
+        {"chaves": [["numero", 1]], "unique": True},
+        {"chaves": [["prazo_dt", 1]], "partialFilterExpression": {"status": "Em andamento"}},
+    ]}}}), encoding="utf-8")
+    espec = carregar_especificacao(str(caminho))["indices46"]
+
+    rel = sincronizar_indices(colecao, espec)
+    assert rel["criados"] == ["numero_1"] and rel["recriados"] == ["prazo_dt_1"] and rel["removidos"] == ["status_1"]
+    assert not rel["manuais"] and not rel["erros"]
+    # O novo fica sob o nome alternativo: nunca há momento sem índice em prazo_dt
+    nomes = colecao.index_information()
+    assert "prazo_dt_1" not in nomes
+    assert nomes["prazo_dt_1__novo"]["partialFilterExpression"] == {"status": "Em andamento"}
+    rel = sincronizar_indices(colecao, espec)
+    assert rel["mantidos"] == ["numero_1", "prazo_dt_1"] and not rel["removidos"]
+
+    # A próxima mudança volta para o nome do arquivo
+    espec = _espec(tmp_path, "indices46", [
+        {"chaves": [["numero", 1]], "unique": True},
+        {"chaves": [["prazo_dt", 1]], "partialFilterExpression": {"status": "Pendente"}},
+    ])
+    rel = sincronizar_indices(colecao, espec)
+    assert rel["recriados"] == ["prazo_dt_1"] and not rel["manuais"] and not rel["erros"]
+    nomes = colecao.index_information()
+    assert "prazo_dt_1__novo" not in nomes and nomes["prazo_dt_1"]["partialFilterExpression"] == {"status": "Pendente"}
+
+def test_troca_interrompida_e_nomes_alternativos_na_remocao(tmp_path):
+    colecao = ColecaoComoServidor(mongomock.MongoClient().db.indices46c)
+    # Troca interrompida: o novo já existe sob o alternativo, o antigo não saiu
+    colecao.create_index([("prazo_dt", 1)], name="prazo_dt_1")
+    colecao.create_index([("prazo_dt", 1)], name="prazo_dt_1__novo", partialFilterExpression={"status": "Pendente"})
+    colecao.create_index([("antigo", 1)], name="antigo_1__novo")
+    espec = _espec(tmp_path, "indices46c", [{"chaves": [["prazo_dt", 1]], "partialFilterExpression": {"status": "Pendente"}}])
+
+    rel = sincronizar_indices(colecao, espec)
+    assert rel["mantidos"] == ["prazo_dt_1"] and rel["removidos"] == ["prazo_dt_1"]
+    # Nome alternativo fora do arquivo não é removido automaticamente
+    assert [m.split(":")[0] for m in rel["manuais"]] == ["antigo_1__novo"]
+    assert set(colecao.index_information()) == {"_id_", "prazo_dt_1__novo", "antigo_1__novo"}
+
+def test_indice_unico_nunca_e_removido_e_troca_falha_mantem_o_antigo(tmp_path):
+    colecao = mongomock.MongoClient().db.indices46b
+    colecao.create_index([("numero", 1)], unique=True)
+    colecao.create_index([("cpf", 1)], unique=True)
+    colecao.create_index([("codigo", 1)])
+    colecao.insert_many([{"numero": "1", "cpf": "a", "codigo": "x"}, {"numero": "2", "cpf": "b", "codigo": "x"}])
+    caminho = tmp_path / "indices.json"
+    caminho.write_text(json.dumps({"colecoes": {"c": {"remover_nao_listados": True, "indices": [
+        {"chaves": [["numero", 1]], "unique": True, "partialFilterExpression": {"numero": {"$exists": True}}},
+        {"chaves": [["codigo", 1]], "unique": True},
+    ]}}}), encoding="utf-8")
+    espec = carregar_especificacao(str(caminho))["c"]
+
+    rel = sincronizar_indices(colecao, espec)
+    nomes = colecao.index_information()
+    # Único com outra definição e único fora do arquivo: só relatados
+    assert {m.split(":")[0] for m in rel["manuais"]} == {"numero_1", "cpf_1"}
+    assert nomes["numero_1"]["unique"] and nomes["cpf_1"]["unique"]
+    # Novo unique não constrói (duplicatas): o índice antigo continua
+    assert rel["recriados"] == [] and rel["erros"] and rel["erros"][0].startswith("codigo_1")
+    assert "codigo_1" in nomes and "codigo_1__novo" not in nomes
+
+def test_indices_redundantes_de_protocolos_saem_e_consultor_exige_admin(client):
+    create_indexes()
+    nomes = set(protocolos_coll.index_information())
+    assert "status_1_data_criacao_dt_-1" in nomes and "em_andamento_data_criacao_dt_categoria" in nomes
+    assert not nomes & {"status_1", "categoria_1", "exig1_data_retirada_dt_1", "data_concluido_dt_1"}
+
+    assert client.get("/api/admin/indices", params={"usuario": "comum46"}).status_code == 403
+    usuarios_coll.update_one({"usuario": "adm46"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    r = client.get("/api/admin/indices", params={"usuario": "adm46"})
+    assert r.status_code == 200
+    dados = r.json()
+    assert {i["nome"] for i in dados["indices"]} == nomes
+    assert all(i["gerenciado"] for i in dados["indices"] if i["nome"] != "_id_")
+    assert {c["consulta"] for c in dados["consultas"]} >= {"busca_padrao", "atrasados"}
+    r = client.post("/api/admin/indices/sincronizar", params={"usuario": "adm46"})
+    assert r.status_code == 200 and not r.json()["erros"]
@@ -0,0 +1,33 @@
+import backend.main as m
+
+def test_health_reporta_indexing_ate_o_esquema_ficar_pronto(client):
+    m._esquema_estado.update(estado="indexando", etapa="protocolos", etapas_concluidas=1)
+    r = client.get("/api/health")
+    assert r.status_code == 200
+    dados = r.json()
+    assert dados["status"] == "indexing" and dados["esquema"]["etapa"] == "protocolos"
+
+    m.esquema_coll.delete_many({})
+    rel = m.executar_inicializacao_esquema()
+    assert rel["status"] == "ok" and rel["indices_aplicados"] is True
+    assert m.esquema_atualizado()
+    assert m._esquema_estado["etapas_concluidas"] == m._esquema_estado["etapas_total"]
+    assert client.get("/api/health").json()["status"] == "ok"
+
+    # Mesma assinatura: não reconstrói os índices no próximo start
+    assert m.executar_inicializacao_esquema()["indices_aplicados"] is False
+
+def test_falha_em_indice_nao_grava_assinatura_e_mantem_nao_pronto(monkeypatch, client):
+    m.esquema_coll.update_one({"_id": "esquema"}, {"$set": {"assinatura": "antiga"}}, upsert=True)
+    monkeypatch.setattr(m, "create_indexes", lambda: ["[MongoDB] Aviso ao criar índice de usuário: E11000 duplicate key"])
+
+    rel = m.executar_inicializacao_esquema()
+    assert rel["status"] == "erro" and "E11000" in rel["erro"]
+    assert m._esquema_estado["estado"] == "erro"
+    assert not m.esquema_atualizado()
+    assert client.get("/api/health/ready").status_code == 503
+
+    monkeypatch.undo()
+    assert m.executar_inicializacao_esquema()["status"] == "ok"
+    assert m.esquema_atualizado()
+    assert client.get("/api/health/ready").status_code == 200
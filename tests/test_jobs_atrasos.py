@@ -0,0 +1,58 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import backend.main as main
+
+class _ColecaoLenta:
+    """Envolve a coleção real e atrasa find/count, simulando uma varredura demorada."""
+    def __init__(self, coll, atraso):
+        self._coll = coll
+        self._atraso = atraso
+
+    def find(self, *args, **kwargs):
+        time.sleep(self._atraso)
+        return self._coll.find(*args, **kwargs)
+
+    def count_documents(self, *args, **kwargs):
+        time.sleep(self._atraso)
+        return self._coll.count_documents(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self._coll, nome)
+
+def test_verificacao_de_atrasos_nao_bloqueia_event_loop(monkeypatch):
+    monkeypatch.setattr(main.repositorio, "protocolos", _ColecaoLenta(main.repositorio.protocolos, 0.5))
+
+    async def cenario():
+        atrasos = []
+
+        async def sonda():
+            for _ in range(25):
+                t = time.perf_counter()
+                await asyncio.sleep(0.01)
+                atrasos.append(time.perf_counter() - t - 0.01)
+
+        relatorio, _ = await asyncio.gather(main.verificar_atrasos_automatico(), sonda())
+        return relatorio, max(atrasos)
+
+    relatorio, pior_atraso = asyncio.run(cenario())
+    assert relatorio["status"] == "ok"
+    assert relatorio["duracao_ms"] >= 500
+    assert pior_atraso < 0.1
+
+def test_execucao_gera_relatorio_consultavel(client):
+    main.protocolos_coll.insert_one({
+        "numero": "31001", "status": "Em andamento", "categoria": "RGI",
+        "data_criacao": "2020-01-02", "data_criacao_dt": datetime(2020, 1, 2, tzinfo=timezone.utc),
+        "prazo_dt": datetime(2020, 2, 13, tzinfo=timezone.utc),
+    })
+    main.executar_verificacao_atrasos()
+    main.usuarios_coll.update_one({"usuario": "adm31"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    assert client.get("/api/admin/jobs/execucoes", params={"usuario": "nao_admin31"}).status_code == 403
+    r = client.get("/api/admin/jobs/execucoes", params={"usuario": "adm31", "job": "verificar_atrasos", "limite": 1})
+    assert r.status_code == 200
+    ultimo = r.json()[0]
+    assert ultimo["status"] == "ok"
+    assert ultimo["atrasados"] >= 1
+    assert "duracao_ms" in ultimo
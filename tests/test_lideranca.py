@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import tentar_lideranca, liberar_lideranca, lideranca_coll, usuarios_coll
+
+def test_apenas_um_lider_e_failover_quando_lease_vence():
+    assert tentar_lideranca("teste", "worker-a") is True
+    assert tentar_lideranca("teste", "worker-b") is False
+    # Heartbeat do líder renova o lease
+    assert tentar_lideranca("teste", "worker-a") is True
+
+    # Líder morreu: o lease vence sem renovação e outro worker assume
+    lideranca_coll.update_one({"_id": "teste"}, {"$set": {"expira_dt": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    assert tentar_lideranca("teste", "worker-b") is True
+    assert tentar_lideranca("teste", "worker-a") is False
+
+def test_liberar_lideranca_permite_nova_eleicao():
+    assert tentar_lideranca("teste2", "worker-a") is True
+    liberar_lideranca("teste2", "worker-b")  # não é o dono: nada muda
+    assert tentar_lideranca("teste2", "worker-b") is False
+    liberar_lideranca("teste2", "worker-a")
+    assert tentar_lideranca("teste2", "worker-b") is True
+
+def test_status_lideranca_so_para_admin(client):
+    usuarios_coll.update_one({"usuario": "adm32"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    assert client.get("/api/admin/lideranca", params={"usuario": "nao_admin32"}).status_code == 403
+    r = client.get("/api/admin/lideranca", params={"usuario": "adm32"})
+    assert r.status_code == 200 and "instancia" in r.json()
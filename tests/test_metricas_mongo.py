@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from backend.main import metricas_mongo, usuarios_coll
+from backend.metricas_mongo import MetricasMongo
+
+def test_listener_acompanha_pool_e_latencia_por_comando():
+    m = MetricasMongo()
+    for _ in range(3):
+        m.connection_created(SimpleNamespace())
+        m.connection_check_out_started(SimpleNamespace())
+    for espera in (0.001, 0.002):
+        m.connection_checked_out(SimpleNamespace(duration=espera))
+    m.connection_check_out_failed(SimpleNamespace(duration=5.0, reason="timeout"))
+    m.connection_checked_in(SimpleNamespace())
+    for micros in (1000, 3000):
+        m.succeeded(SimpleNamespace(command_name="find", duration_micros=micros))
+    m.failed(SimpleNamespace(command_name="insert", duration_micros=500))
+
+    dados = m.instantaneo()
+    pool = dados["pool"]
+    assert pool["conexoes_abertas"] == 3 and pool["conexoes_em_uso"] == 1 and pool["max_em_uso"] == 2
+    assert pool["max_aguardando"] == 3 and pool["aguardando_checkout"] == 0
+    assert pool["checkouts_falhos"] == {"timeout": 1}
+    assert pool["espera_checkout"]["total"] == 3 and pool["espera_checkout"]["max_ms"] == 5000.0
+    assert dados["comandos"]["find"]["total"] == 2 and dados["comandos"]["find"]["media_ms"] == 2.0
+    assert dados["comandos"]["insert"]["falhas"] == 1
+
+    m.zerar()
+    dados = m.instantaneo()
+    assert dados["comandos"] == {} and dados["pool"]["espera_checkout"]["total"] == 0
+    # Medidores do pool continuam refletindo as conexões existentes
+    assert dados["pool"]["conexoes_abertas"] == 3 and dados["pool"]["conexoes_em_uso"] == 1
+    assert dados["pool"]["max_em_uso"] == 1
+
+def test_endpoint_publica_configuracao_e_metricas(client):
+    usuarios_coll.update_one({"usuario": "adm49"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    assert client.get("/api/admin/mongo/metricas", params={"usuario": "nao_admin49"}).status_code == 403
+    assert client.post("/api/admin/mongo/metricas/zerar", params={"usuario": "nao_admin49"}).status_code == 403
+
+    metricas_mongo.succeeded(SimpleNamespace(command_name="ping", duration_micros=250))
+    r = client.get("/api/admin/mongo/metricas", params={"usuario": "adm49"})
+    assert r.status_code == 200
+    dados = r.json()
+    assert dados["config"]["maxPoolSize"] >= 40 and "waitQueueTimeoutMS" in dados["config"]
+    assert dados["comandos"]["ping"]["total"] >= 1
+
+    r = client.post("/api/admin/mongo/metricas/zerar", params={"usuario": "adm49"})
+    assert r.status_code == 200 and r.json()["comandos"]["ping"]["total"] >= 1
+    assert "ping" not in client.get("/api/admin/mongo/metricas", params={"usuario": "adm49"}).json()["comandos"]
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+from backend.main import notificar_admins_atrasos, notificacoes_coll
+
+def test_um_alerta_por_admin_por_dia():
+    agora = datetime(2025, 6, 2, 9, 0, tzinfo=timezone.utc)
+    assert notificar_admins_atrasos(["adm33a", "adm33b"], "msg", agora) == (2, 0)
+    # Segunda execução no mesmo dia (ex.: outro worker) não duplica
+    assert notificar_admins_atrasos(["adm33a", "adm33b", "adm33c"], "msg", agora) == (1, 2)
+    assert notificacoes_coll.count_documents({"usuario": "adm33a", "tipo": "alerta_atrasos"}) == 1
+
+    amanha = datetime(2025, 6, 3, 9, 0, tzinfo=timezone.utc)
+    assert notificar_admins_atrasos(["adm33a"], "msg", amanha) == (1, 0)
+
+def test_notificacoes_sem_dia_nao_sao_afetadas_pelo_indice():
+    notificacoes_coll.insert_one({"usuario": "adm33a", "tipo": "info", "mensagem": "a"})
+    notificacoes_coll.insert_one({"usuario": "adm33a", "tipo": "info", "mensagem": "b"})
+    assert notificacoes_coll.count_documents({"usuario": "adm33a", "tipo": "info"}) == 2
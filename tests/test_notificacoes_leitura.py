@@ -0,0 +1,31 @@
+from backend.main import notificacoes_coll, NOTIFICACOES_LIDAS_RETENCAO_DIAS
+
+def _seed(usuario):
+    ids = notificacoes_coll.insert_many([
+        {"usuario": usuario, "tipo": "alerta_atrasos", "mensagem": "a", "lida": False},
+        {"usuario": usuario, "tipo": "info", "mensagem": "b", "lida": False},
+        {"usuario": usuario, "tipo": "info", "mensagem": "c", "lida": False},
+    ]).inserted_ids
+    return [str(i) for i in ids]
+
+def test_marcar_em_lote_por_ids_por_tipo_e_todas(client):
+    ids = _seed("ler36")
+    r = client.put("/api/notificacoes/ler", json={"usuario": "ler36", "ids": ids[1:2]})
+    assert r.json() == {"ok": True, "marcadas": 1}
+    r = client.put("/api/notificacoes/ler", json={"usuario": "ler36", "tipo": "alerta_atrasos"})
+    assert r.json()["marcadas"] == 1
+    r = client.put("/api/notificacoes/ler", json={"usuario": "ler36"})
+    assert r.json()["marcadas"] == 1
+    lidas = list(notificacoes_coll.find({"usuario": "ler36"}))
+    assert all(n["lida"] and n.get("lida_em_dt") for n in lidas)
+
+def test_lote_nao_afeta_outro_usuario_e_valida_ids(client):
+    _seed("ler36b")
+    client.put("/api/notificacoes/ler", json={"usuario": "ler36c"})
+    assert notificacoes_coll.count_documents({"usuario": "ler36b", "lida": False}) == 3
+    assert client.put("/api/notificacoes/ler", json={"usuario": "ler36b", "ids": ["x"]}).status_code == 400
+
+def test_indice_ttl_de_lidas():
+    info = notificacoes_coll.index_information()["lida_em_dt_1"]
+    assert info["expireAfterSeconds"] == NOTIFICACOES_LIDAS_RETENCAO_DIAS * 24 * 3600
+    assert info["partialFilterExpression"] == {"lida": True}
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import notificacoes_coll, migrar_datas_notificacoes
+
+def _seed(usuario, n):
+    base = datetime(2025, 7, 1, 12, 0, tzinfo=timezone.utc)
+    notificacoes_coll.insert_many([
+        {"usuario": usuario, "tipo": "info", "mensagem": f"m{i}", "lida": i % 2 == 0,
+         # Duas notificações por instante para exercitar o desempate por _id
+         "data_criacao_dt": base + timedelta(minutes=i // 2)}
+        for i in range(n)
+    ])
+
+def test_paginacao_por_cursor_percorre_tudo_sem_repetir(client):
+    _seed("pag35", 7)
+    vistos, cursor = [], None
+    while True:
+        params = {"usuario": "pag35", "limite": 3}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/notificacoes", params=params)
+        assert r.status_code == 200
+        pagina = r.json()
+        assert len(pagina["items"]) <= 3
+        vistos += [n["mensagem"] for n in pagina["items"]]
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            break
+    assert sorted(vistos) == sorted(f"m{i}" for i in range(7))
+    assert len(vistos) == 7
+    assert vistos[0] in ("m5", "m6")  # mais recentes primeiro
+
+def test_filtro_lida_e_contagem_nao_lidas(client):
+    _seed("pag35b", 5)
+    r = client.get("/api/notificacoes", params={"usuario": "pag35b", "lida": "false"})
+    assert {n["mensagem"] for n in r.json()["items"]} == {"m1", "m3"}
+    r = client.get("/api/notificacoes/nao-lidas/contagem", params={"usuario": "pag35b"})
+    assert r.json() == {"nao_lidas": 2}
+
+def test_cursor_invalido_e_backfill_de_data(client):
+    assert client.get("/api/notificacoes", params={"usuario": "x", "cursor": "lixo"}).status_code == 400
+    res = notificacoes_coll.insert_one({"usuario": "pag35c", "tipo": "info", "mensagem": "antiga", "lida": False})
+    assert migrar_datas_notificacoes() >= 1
+    assert notificacoes_coll.find_one({"_id": res.inserted_id})["data_criacao_dt"] is not None
+
+def test_paginacao_com_notificacoes_antigas_sem_data(client):
+    _seed("pag35d", 3)
+    # Anteriores ao backfill: sem data_criacao_dt, vêm depois das datadas
+    notificacoes_coll.insert_many([
+        {"usuario": "pag35d", "tipo": "info", "mensagem": f"antiga{i}", "lida": False} for i in range(3)
+    ])
+    vistos, cursor = [], None
+    while True:
+        params = {"usuario": "pag35d", "limite": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/notificacoes", params=params)
+        assert r.status_code == 200, r.text
+        vistos += [n["mensagem"] for n in r.json()["items"]]
+        cursor = r.json()["proximo_cursor"]
+        if not cursor:
+            break
+    assert vistos == ["m2", "m1", "m0", "antiga2", "antiga1", "antiga0"]
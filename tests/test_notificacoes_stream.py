@@ -0,0 +1,46 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from backend.main import (
+    NotificacoesBroadcaster, broadcaster_notificacoes, notificar_admins_atrasos,
+    notificacoes_coll, _relay_consulta
+)
+
+def test_broadcaster_entrega_publicacao_de_outra_thread_sem_duplicar():
+    async def cenario():
+        b = NotificacoesBroadcaster()
+        fila = b.assinar("sse34a")
+        outra = b.assinar("sse34b")
+        doc = {"_id": "abc", "usuario": "sse34a", "mensagem": "oi"}
+        t = threading.Thread(target=lambda: (b.publicar(doc), b.publicar(doc)))
+        t.start(); t.join()
+        recebida = await asyncio.wait_for(fila.get(), timeout=1)
+        await asyncio.sleep(0.01)
+        assert fila.empty() and outra.empty()
+        b.cancelar("sse34a", fila)
+        b.cancelar("sse34b", outra)
+        assert b.total_assinantes == 0
+        return recebida
+    recebida = asyncio.run(cenario())
+    assert recebida["id"] == "abc" and recebida["mensagem"] == "oi"
+
+def test_alerta_de_atrasos_e_relay_publicam_para_assinante():
+    async def cenario():
+        fila = broadcaster_notificacoes.assinar("sse34adm")
+        try:
+            agora = datetime.now(timezone.utc)
+            await asyncio.to_thread(notificar_admins_atrasos, ["sse34adm"], "atrasos", agora)
+            notif = await asyncio.wait_for(fila.get(), timeout=1)
+            # Inserção feita "por outro worker" chega pelo relay por consulta
+            notificacoes_coll.insert_one({"usuario": "sse34adm", "tipo": "info", "mensagem": "externa"})
+            await asyncio.to_thread(_relay_consulta, agora)
+            externa = await asyncio.wait_for(fila.get(), timeout=1)
+            await asyncio.sleep(0.01)
+            assert fila.empty()
+            return notif, externa
+        finally:
+            broadcaster_notificacoes.cancelar("sse34adm", fila)
+    notif, externa = asyncio.run(cenario())
+    assert notif["tipo"] == "alerta_atrasos" and notif["lida"] is False
+    assert externa["mensagem"] == "externa"
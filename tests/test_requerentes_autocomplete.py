@@ -0,0 +1,30 @@
+from backend.main import salvar_requerente, normalizar_nome_busca
+
+def test_normalizar_nome_busca():
+    assert normalizar_nome_busca("  José   da  CONCEIÇÃO ") == "jose da conceicao"
+
+def test_autocomplete_por_nome_e_cpf(client):
+    salvar_requerente("08301661305", "Tabelionato Ávila", novo_protocolo=True)
+    salvar_requerente("08301661305", "Tabelionato Ávila", novo_protocolo=True)
+    salvar_requerente("18609139034", "Tabacaria Central", novo_protocolo=True)
+
+    r = client.get("/api/requerentes/autocomplete", params={"q": "tab"})
+    assert r.status_code == 200
+    nomes = [i["nome_requerente"] for i in r.json()]
+    # Ordem do índice (nome_busca): sem ordenação em memória
+    assert nomes[:2] == ["Tabacaria Central", "Tabelionato Ávila"]
+
+    r = client.get("/api/requerentes/autocomplete", params={"q": "TABEL"})
+    assert [i["cpf"] for i in r.json()] == ["08301661305"]
+
+    r = client.get("/api/requerentes/autocomplete", params={"q": "186.091"})
+    assert [i["cpf"] for i in r.json()] == ["18609139034"]
+
+    # Prefixo curto demais não consulta o banco
+    assert client.get("/api/requerentes/autocomplete", params={"q": "t"}).json() == []
+
+def test_autocomplete_reflete_edicao_do_requerente(client):
+    salvar_requerente("99603082430", "Imobiliaria Norte")
+    assert client.get("/api/requerentes/autocomplete", params={"q": "imobiliaria n"}).json()
+    salvar_requerente("99603082430", "Imobiliaria Sul")
+    assert client.get("/api/requerentes/autocomplete", params={"q": "imobiliaria n"}).json() == []
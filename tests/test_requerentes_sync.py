@@ -0,0 +1,67 @@
+from backend.main import protocolos_coll, requerentes_sync_coll, usuarios_coll, processar_fila_requerentes
+
+CPF = "153.509.460-56"
+CPF_PURO = "15350946056"
+
+def _payload(numero, nome):
+    return {
+        "numero": numero,
+        "nome_requerente": nome,
+        "cpf": CPF,
+        "whatsapp": "+55(24)99999-0000",
+        "titulo": "Registro",
+        "data_criacao": "2025-02-03",
+        "status": "Pendente",
+        "categoria": "RGI",
+        "responsavel": "Operador",
+    }
+
+def test_edicao_enfileira_e_worker_propaga_por_cpf(client):
+    r = client.post("/api/protocolo", json=_payload("26001", "BANCO ALFA"))
+    assert r.status_code == 200, r.text
+    r = client.post("/api/protocolo", json=_payload("26002", "BANCO ALFA"))
+    assert r.status_code == 200, r.text
+    pid = r.json()["id"]
+    processar_fila_requerentes()
+
+    # Duas edições seguidas geram um único job (coalescido) para o CPF
+    client.put(f"/api/protocolo/{pid}", json={"nome_requerente": "BANCO ALFA S/A", "ultima_alteracao_nome": "Operador"})
+    client.put(f"/api/protocolo/{pid}", json={"whatsapp": "+55(24)98888-1111", "ultima_alteracao_nome": "Operador"})
+    assert requerentes_sync_coll.count_documents({"cpf": CPF_PURO}) == 1
+
+    # Antes do worker o outro protocolo ainda não foi tocado
+    assert protocolos_coll.find_one({"numero": "26001"})["nome_requerente"] == "BANCO ALFA"
+
+    usuarios_coll.update_one({"usuario": "adm26"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    assert client.get("/api/admin/sync-requerentes/status", params={"usuario": "nao_admin26"}).status_code == 403
+    status = client.get("/api/admin/sync-requerentes/status", params={"usuario": "adm26"}).json()
+    assert status["pendentes"] == 1
+    assert status["lag_segundos"] >= 0
+
+    assert processar_fila_requerentes() == 1
+    outro = protocolos_coll.find_one({"numero": "26001"})
+    assert outro["nome_requerente"] == "BANCO ALFA S/A"
+    assert outro["whatsapp"] == "+55(24)98888-1111"
+
+    status = client.get("/api/admin/sync-requerentes/status", params={"usuario": "adm26"}).json()
+    assert status["pendentes"] == 0 and status["lag_segundos"] == 0
+
+def test_requerente_e_fonte_da_verdade_para_autopreenchimento(client):
+    from backend.main import requerentes_coll
+    r = client.post("/api/protocolo", json={**_payload("27001", "CARTORIO BETA"), "cpf": "111.444.777-35"})
+    assert r.status_code == 200, r.text
+    pid = r.json()["id"]
+    client.put(f"/api/protocolo/{pid}", json={"nome_requerente": "CARTORIO BETA LTDA", "ultima_alteracao_nome": "Operador"})
+
+    # A edição atualiza o cadastro imediatamente, mesmo antes do worker rodar
+    assert requerentes_coll.find_one({"cpf": "11144477735"})["nome_requerente"] == "CARTORIO BETA LTDA"
+    r = client.get("/api/protocolo/nome_requerente_por_cpf", params={"cpf": "111.444.777-35"})
+    assert r.json()["nome_requerente"] == "CARTORIO BETA LTDA"
+
+def test_autopreenchimento_cadastra_cpf_legado(client):
+    from backend.main import requerentes_coll
+    protocolos_coll.insert_one({"numero": "27002", "cpf": "52601815906", "nome_requerente": "LEGADO", "whatsapp": ""})
+    requerentes_coll.delete_many({"cpf": "52601815906"})
+    r = client.get("/api/protocolo/nome_requerente_por_cpf", params={"cpf": "52601815906"})
+    assert r.json()["nome_requerente"] == "LEGADO"
+    assert requerentes_coll.find_one({"cpf": "52601815906"}) is not None
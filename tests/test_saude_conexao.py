@@ -0,0 +1,30 @@
+import asyncio
+import random
+
+import backend.main as m
+
+def test_backoff_exponencial_com_jitter_e_teto():
+    random.seed(48)
+    for tentativa in range(12):
+        teto = min(m.MONGO_BACKOFF_MAX_SECONDS, m.MONGO_BACKOFF_BASE_SECONDS * 2 ** tentativa)
+        esperas = [m.espera_backoff(tentativa) for _ in range(200)]
+        assert all(0 <= e <= teto for e in esperas)
+        assert max(esperas) > teto / 2  # jitter cobre o intervalo, não é fixo
+    assert m.espera_backoff(40) <= m.MONGO_BACKOFF_MAX_SECONDS
+    assert m.espera_backoff(5000) <= m.MONGO_BACKOFF_MAX_SECONDS  # queda longa: sem OverflowError
+
+def test_liveness_e_readiness_separados(client):
+    assert asyncio.run(m.aguardar_conexao_mongodb(max_tentativas=1)) is True
+    estado_anterior = dict(m._esquema_estado)
+    try:
+        m._esquema_estado["estado"] = "indexando"
+        assert client.get("/api/health/live").status_code == 200
+        r = client.get("/api/health/ready")
+        assert r.status_code == 503 and r.json()["status"] == "indexing"
+        saude = client.get("/api/health").json()
+        assert saude["live"] is True and saude["ready"] is False and saude["conexao"]["conectado"] is True
+
+        m._esquema_estado["estado"] = "pronto"
+        assert client.get("/api/health/ready").status_code == 200
+    finally:
+        m._esquema_estado.update(estado_anterior)
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.main import protocolos_coll, usuarios_coll, categorias_coll, add_business_days, as_utc
+
+def _incluir(client, numero, data_criacao, categoria):
+    r = client.post("/api/protocolo", json={
+        "numero": numero, "nome_requerente": "Fulano Prazo", "sem_cpf": True, "titulo": "Registro",
+        "data_criacao": data_criacao, "status": "Em andamento", "categoria": categoria, "responsavel": "Operador",
+    })
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+def test_prazo_usa_sla_da_categoria_e_dias_uteis_com_feriados(client):
+    usuarios_coll.update_one({"usuario": "adm39"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    r = client.post("/api/categoria", params={"usuario": "adm39"}, json={"nome": "SLA39", "sla_dias_uteis": 5})
+    assert r.status_code == 200
+    _incluir(client, "39001", "2025-03-03", "SLA39")
+    # 03/03/2025 é Carnaval: 5 dias úteis depois = 05, 06, 07, 10 e 11/03
+    prazo = as_utc(protocolos_coll.find_one({"numero": "39001"})["prazo_dt"])
+    assert prazo == datetime(2025, 3, 11, tzinfo=timezone.utc)
+    atrasados = {p["numero"] for p in client.get("/api/protocolo/atencao", params={"categoria": "SLA39"}).json()}
+    assert "39001" in atrasados
+
+def test_mudanca_de_sla_e_de_categoria_recalculam_prazo(client):
+    usuarios_coll.update_one({"usuario": "adm39"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    client.post("/api/categoria", params={"usuario": "adm39"}, json={"nome": "SLA39B", "sla_dias_uteis": 1})
+    hoje = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    criacao = hoje - timedelta(days=7)
+    pid = _incluir(client, "39002", criacao.strftime("%Y-%m-%d"), "SLA39B")
+    assert "39002" in {p["numero"] for p in client.get("/api/protocolo/atencao").json()}
+
+    cat_id = str(categorias_coll.find_one({"nome": "SLA39B"})["_id"])
+    r = client.put(f"/api/categoria/{cat_id}", params={"usuario": "adm39"},
+                   json={"nome": "SLA39B", "descricao": "", "sla_dias_uteis": 200})
+    assert r.status_code == 200
+    doc = protocolos_coll.find_one({"numero": "39002"})
+    assert as_utc(doc["prazo_dt"]) == add_business_days(criacao, 200)
+    assert "39002" not in {p["numero"] for p in client.get("/api/protocolo/atencao").json()}
+
+    # Troca de categoria no protocolo usa o SLA da nova categoria (padrão: 30)
+    r = client.put(f"/api/protocolo/{pid}", json={"categoria": "RGI", "ultima_alteracao_nome": "t"})
+    assert r.status_code == 200
+    assert as_utc(protocolos_coll.find_one({"numero": "39002"})["prazo_dt"]) == add_business_days(criacao, 30)
+
+def test_sla_padrao_limpar_e_renomear(monkeypatch, client):
+    import backend.main as m
+    usuarios_coll.update_one({"usuario": "adm39"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    client.post("/api/categoria", params={"usuario": "adm39"}, json={"nome": "SLA39C"})
+    cat_id = str(categorias_coll.find_one({"nome": "SLA39C"})["_id"])
+    cat = next(c for c in client.get("/api/categorias").json() if c["id"] == cat_id)
+    assert cat["sla_dias_uteis"] is None and cat["sla_padrao"] == 30
+
+    recalculos = []
+    monkeypatch.setattr(m, "_apos_alterar_sla", lambda *cats: recalculos.append(cats))
+    url = f"/api/categoria/{cat_id}"
+    # Salvar sem mexer no SLA não grava o padrão nem recalcula
+    client.put(url, params={"usuario": "adm39"}, json={"nome": "SLA39C", "descricao": "x", "sla_dias_uteis": None})
+    assert "sla_dias_uteis" not in categorias_coll.find_one({"nome": "SLA39C"}) and recalculos == []
+
+    client.put(url, params={"usuario": "adm39"}, json={"nome": "SLA39C", "descricao": "x", "sla_dias_uteis": 10})
+    client.put(url, params={"usuario": "adm39"}, json={"nome": "SLA39C", "descricao": "y", "sla_dias_uteis": 10})
+    assert recalculos == [("SLA39C",)]
+
+    # Renomear: protocolos com o nome antigo perdem o SLA, recalcula pelos dois nomes
+    client.put(url, params={"usuario": "adm39"}, json={"nome": "SLA39D", "descricao": "y", "sla_dias_uteis": 10})
+    assert recalculos[-1] == ("SLA39C", "SLA39D")
+
+    # Limpar o campo volta ao padrão
+    client.put(url, params={"usuario": "adm39"}, json={"nome": "SLA39D", "descricao": "y", "sla_dias_uteis": ""})
+    assert "sla_dias_uteis" not in categorias_coll.find_one({"nome": "SLA39D"})
+    assert recalculos[-1] == ("SLA39D",)
+
+def test_feriado_recalcula_prazos_abertos_e_pede_aging_em_background(client):
+    from backend.main import calcular_prazo, executar_aging_protocolos, job_solicitado
+
+    usuarios_coll.update_one({"usuario": "adm39"}, {"$set": {"tipo": "admin"}}, upsert=True)
+    criacao = datetime(2019, 5, 6, tzinfo=timezone.utc)
+    original = calcular_prazo(criacao, "RGI")
+    for numero, status, data in (("39101", "Pendente", criacao), ("39102", "Concluído", criacao),
+                                 ("39103", "Exigência", datetime(2019, 1, 2, tzinfo=timezone.utc))):
+        protocolos_coll.insert_one({"numero": numero, "status": status, "categoria": "RGI",
+                                    "data_criacao_dt": data, "prazo_dt": calcular_prazo(data, "RGI")})
+    antes_39103 = protocolos_coll.find_one({"numero": "39103"})["prazo_dt"]
+
+    # 20/05/2019 (segunda) vira feriado: dentro do prazo de 39101 e 39102, depois do de 39103
+    assert client.post("/api/feriado", params={"usuario": "adm39"}, json={"data": "2019-05-20"}).status_code == 200
+    prazo = lambda n: as_utc(protocolos_coll.find_one({"numero": n})["prazo_dt"])
+    assert prazo("39101") == add_business_days(original, 1)  # Pendente também tem o prazo em dia
+    assert prazo("39102") == original and prazo("39103") == as_utc(antes_39103)
+    # O aging não roda na requisição: fica pedido ao líder
+    assert job_solicitado("aging_protocolos")
+    executar_aging_protocolos()
+    assert not job_solicitado("aging_protocolos")
+
+    # Reaberto, o protocolo encerrado ganha o prazo do calendário atual
+    pid = protocolos_coll.find_one({"numero": "39102"})["_id"]
+    r = client.put(f"/api/protocolo/{pid}", json={"status": "Pendente", "ultima_alteracao_nome": "t"})
+    assert r.status_code == 200 and prazo("39102") == add_business_days(original, 1)
+
+    assert client.delete("/api/feriado/2019-05-20", params={"usuario": "adm39"}).status_code == 200
+    assert prazo("39101") == original
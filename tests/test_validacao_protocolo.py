@@ -0,0 +1,35 @@
+import pytest
+from pydantic import ValidationError
+from backend.main import ProtocoloModel
+
+BASE = {
+    "numero": "30001",
+    "nome_requerente": "Fulano",
+    "cpf": "529.982.247-25",
+    "titulo": "Registro",
+    "data_criacao": "2025-01-10",
+    "status": " Pendente ",
+    "categoria": "IDT",
+    "responsavel": "Operador",
+}
+
+def test_modelo_normaliza_campos_uma_unica_vez():
+    p = ProtocoloModel(**BASE)
+    assert p.cpf == "52998224725"
+    assert p.status == "Pendente"
+    assert p.categoria == "RTD"
+    assert p.data_criacao_dt.isoformat() == "2025-01-10T00:00:00+00:00"
+
+def test_modelo_sem_cpf_descarta_cpf():
+    assert ProtocoloModel(**{**BASE, "sem_cpf": True, "cpf": ""}).cpf == ""
+
+@pytest.mark.parametrize("campo,valor", [
+    ("cpf", "529.982.247-24"),
+    ("status", "Arquivado"),
+    ("categoria", "INEXISTENTE"),
+    ("data_criacao", "10/01/2025"),
+    ("data_criacao", "2999-01-01"),
+])
+def test_modelo_rejeita_valores_invalidos(campo, valor):
+    with pytest.raises(ValidationError):
+        ProtocoloModel(**{**BASE, campo: valor})